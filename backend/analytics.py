@@ -0,0 +1,128 @@
+"""
+Vectorized completion analytics (heatmaps, rates and trends) built on NumPy
+"""
+
+from datetime import datetime, timedelta
+import numpy as np
+from streaks import period_bounds
+
+MS_PER_DAY = 86400000
+WEEKDAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Named ranges accepted by /api/stats/history (numbers of days are accepted too)
+RANGE_DAYS = {
+    'week': 7,
+    'month': 30,
+    'quarter': 90,
+    'year': 365
+}
+MAX_RANGE_DAYS = 5 * 366
+
+def parse_range(value, default='year'):
+    """Turn a range query value into a number of days, or None if invalid"""
+    value = (value or default).strip().lower()
+    if value in RANGE_DAYS:
+        return RANGE_DAYS[value]
+    if value.endswith('d'):
+        value = value[:-1]
+    try:
+        days = int(value)
+    except ValueError:
+        return None
+    if days < 1 or days > MAX_RANGE_DAYS:
+        return None
+    return days
+
+def to_epoch_ms(value):
+    """Milliseconds since the epoch for a naive UTC datetime"""
+    return int((value - datetime(1970, 1, 1)).total_seconds() * 1000)
+
+def daily_counts(timestamps_ms, start, days):
+    """Bin completion timestamps (int64 ms) into per-day counts starting at `start`"""
+    offsets = (np.asarray(timestamps_ms, dtype=np.int64) - to_epoch_ms(start)) // MS_PER_DAY
+    offsets = offsets[(offsets >= 0) & (offsets < days)]
+    return np.bincount(offsets, minlength=days)
+
+def period_offsets(start, days, frequency):
+    """Period number (0 for the period containing `start`) of each of `days` days from `start`"""
+    dates = np.datetime64(start.date(), 'D') + np.arange(days)
+    if frequency == 'weekly':
+        # 1970-01-01 was a Thursday, so +3 puts ISO weeks (Monday start) on multiples of 7
+        ids = (dates.astype(np.int64) + 3) // 7
+    elif frequency == 'monthly':
+        ids = dates.astype('datetime64[M]').astype(np.int64)
+    else:
+        ids = dates.astype(np.int64)
+    return ids - ids[0] if days else ids
+
+def history_start(start, frequency='daily'):
+    """Where to start fetching completions so the window's first period is counted in full"""
+    return period_bounds(frequency, start)[0]
+
+def moving_average(values, window):
+    """Trailing moving average; the first window-1 entries average what is available"""
+    if len(values) == 0:
+        return np.zeros(0)
+    sums = np.cumsum(values, dtype=np.float64)
+    sums[window:] = sums[window:] - sums[:-window]
+    sizes = np.minimum(np.arange(1, len(values) + 1), window)
+    return sums / sizes
+
+def history_summary(timestamps_ms, start, days, target_count=1, active_from=None, frequency='daily'):
+    """Compute heatmap, completion rate, best weekday and trends in one pass.
+
+    `start` is the midnight (UTC) of the first day of the window and
+    `active_from` the first day that counts towards the completion rate
+    (e.g. the habit's creation date). Weekly and monthly habits meet their
+    target per period, so `timestamps_ms` should reach back to
+    `history_start(start, frequency)`. Their completion rate is the share of
+    periods met, and the period in progress counts only once it is met.
+    """
+    lead = (start - history_start(start, frequency)).days
+    all_counts = daily_counts(timestamps_ms, start - timedelta(days=lead), lead + days)
+    counts = all_counts[lead:]
+    target_count = max(1, target_count)
+
+    # Days before the habit existed do not count against the rate
+    first_active = 0
+    if active_from is not None:
+        first_active = min(max((active_from - start).days, 0), days)
+
+    if frequency in ('weekly', 'monthly'):
+        # Every day of a period shares the period's outcome
+        periods = period_offsets(start - timedelta(days=lead), lead + days, frequency)
+        period_met = np.bincount(periods, weights=all_counts) >= target_count
+        met = period_met[periods][lead:].astype(np.float64)
+        rated = period_met[periods[lead + first_active]:] if first_active < days else period_met[:0]
+        if len(rated) and not rated[-1]:
+            rated = rated[:-1]
+        completion_rate = float(rated.mean()) if len(rated) else 0.0
+    else:
+        met = (counts >= target_count).astype(np.float64)
+        active_met = met[first_active:]
+        completion_rate = float(active_met.mean()) if len(active_met) else 0.0
+
+    weekdays = (np.arange(days) + start.weekday()) % 7
+    weekday_counts = np.bincount(weekdays, weights=counts, minlength=7)
+    best_weekday = WEEKDAY_NAMES[int(weekday_counts.argmax())] if counts.any() else None
+
+    # Weekly completion rate trend; a trailing partial week is averaged on its own
+    full_weeks = days // 7
+    weekly = met[:full_weeks * 7].reshape(full_weeks, 7).mean(axis=1)
+    if days % 7:
+        weekly = np.append(weekly, met[full_weeks * 7:].mean())
+
+    return {
+        'start': start.date().isoformat(),
+        'end': (start + timedelta(days=days - 1)).date().isoformat(),
+        'days': days,
+        'frequency': frequency,
+        'heatmap': counts.tolist(),
+        'total_completions': int(counts.sum()),
+        'completion_rate': round(completion_rate, 4),
+        'best_weekday': best_weekday,
+        'weekday_counts': weekday_counts.astype(np.int64).tolist(),
+        'moving_average_7d': np.round(moving_average(met, 7), 4).tolist(),
+        'moving_average_30d': np.round(moving_average(met, 30), 4).tolist(),
+        'weekly_completion_rate': np.round(weekly, 4).tolist()
+    }
@@ -2,22 +2,31 @@
 Main Flask application - modular version
 """
 
+import time
+import click
 from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, jwt_required
-from datetime import timedelta
-import os
 from dotenv import load_dotenv
-import google.generativeai as genai
+from config import load_config, configure_gemini, cors_origins, CORS_ALLOW_HEADERS, CORS_EXPOSE_HEADERS
 
 # Import database module
-from database import init_db, create_indexes, migrate_user_stats
+from database import (
+    init_db, get_collections, create_indexes, migrate_user_stats, rebuild_daily_rollups,
+    recompute_habit_streaks, purge_deleted_habits, archive_old_records
+)
+from ratelimit import create_rate_limiter
+from responses import FastJSONProvider, configure_compression
 
 # Import route blueprints
 from routes.auth import auth_bp
 from routes.habits import habits_bp
 from routes.ai import ai_bp
 from routes.stats import stats_bp
+from routes.export import export_bp
+from routes.importer import import_bp
+from routes.dashboard import dashboard_bp
+from routes.events import events_bp
 
 # Load environment variables
 load_dotenv()
@@ -25,45 +34,45 @@ load_dotenv()
 def create_app():
     """Application factory function"""
     app = Flask(__name__)
+    app.json = FastJSONProvider(app)
     
     # Configuration
-    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
-    app.config['MONGO_URI'] = os.getenv('MONGO_URI', 'mongodb://localhost:27017/habit_tracker')
-    app.config['JWT_SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
-    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=7)
-    app.config['JWT_ALGORITHM'] = 'HS256'
+    load_config(app)
 
     # Initialize extensions
     init_db(app)
     jwt = JWTManager(app)
+    app.extensions['rate_limiter'] = create_rate_limiter(app.config, get_collections()['rate_limits'])
     # Configure CORS for frontend origin with credentials and preflight support
     
     # near CORS config
-    frontend_origin = os.getenv('FRONTEND_ORIGIN', 'http://localhost:3000')
     CORS(
         app,
-        resources={r"/api/*": {"origins": [frontend_origin, "http://localhost:3000"]}},
+        resources={r"/api/*": {"origins": cors_origins()}},
         supports_credentials=True,
         methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        allow_headers=["Content-Type", "Authorization"],
-        expose_headers=["Content-Type"],
+        allow_headers=CORS_ALLOW_HEADERS,
+        expose_headers=CORS_EXPOSE_HEADERS,
     )
 
+    # gzip/brotli for large responses, negotiated per request
+    configure_compression(app)
+
     # Avoid automatic 308 redirects between trailing and non-trailing slash
     app.url_map.strict_slashes = False
 
     # Configure Gemini AI
-    gemini_api_key = os.getenv('GEMINI_API_KEY')
-    if gemini_api_key and gemini_api_key != 'your_gemini_api_key_here':
-        genai.configure(api_key=gemini_api_key)
-    else:
-        print("Warning: GEMINI_API_KEY not set. AI features will be disabled.")
+    configure_gemini()
 
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix='/api')
     app.register_blueprint(habits_bp, url_prefix='/api/habits')
     app.register_blueprint(ai_bp, url_prefix='/api/ai')
     app.register_blueprint(stats_bp, url_prefix='/api/stats')
+    app.register_blueprint(export_bp, url_prefix='/api/export')
+    app.register_blueprint(import_bp, url_prefix='/api/import')
+    app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
+    app.register_blueprint(events_bp, url_prefix='/api/events')
 
     # Alias for /api/streak to match frontend calls (maps to stats endpoint)
     @app.route('/api/streak', methods=['GET'])
@@ -73,6 +82,45 @@ def create_app():
         from routes.stats import get_global_streak as _get_global_streak
         return _get_global_streak()
 
+    # Maintenance commands (run with `flask --app app <command>`)
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups_command():
+        """Regenerate daily rollups from raw habit completions"""
+        rebuild_daily_rollups()
+
+    @app.cli.command('recompute-streaks')
+    @click.option('--batch-size', default=500, show_default=True, help='Habits per batch')
+    def recompute_streaks_command(batch_size):
+        """Repair current/longest streaks of every habit from completion history"""
+        recompute_habit_streaks(batch_size=batch_size)
+
+    @app.cli.command('purge-deleted')
+    @click.option('--batch-size', default=1000, show_default=True, help='Completions deleted per batch')
+    @click.option('--pause', default=0.05, show_default=True, help='Seconds to sleep between batches')
+    @click.option('--watch', default=0, show_default=True, help='Keep running, polling every N seconds')
+    def purge_deleted_command(batch_size, pause, watch):
+        """Remove soft-deleted habits and their completions in throttled batches"""
+        while True:
+            purge_deleted_habits(batch_size=batch_size, pause=pause)
+            if not watch:
+                break
+            time.sleep(watch)
+
+    @app.cli.command('archive-old-data')
+    @click.option('--batch-size', default=1000, show_default=True, help='Records moved per batch')
+    def archive_old_data_command(batch_size):
+        """Move old completions and chat messages into archive collections"""
+        archive_old_records(batch_size=batch_size)
+
+    @app.cli.command('send-reminders')
+    @click.option('--workers', default=1, show_default=True, help='Worker processes (users split by id hash)')
+    @click.option('--sink', default=None, help='Notification sink: log or webhook (default: REMINDER_SINK)')
+    @click.option('--batch-size', default=100, show_default=True, help='Users per notification batch')
+    def send_reminders_command(workers, sink, batch_size):
+        """Remind users about daily habits that have not reached their target today"""
+        from reminders import run_reminders
+        run_reminders(workers=workers, sink_name=sink, batch_size=batch_size)
+
     # Basic routes
     @app.route('/api/test', methods=['GET'])
     def test():
@@ -0,0 +1,92 @@
+"""
+ASGI application - async alternative to app.py (Quart + Motor)
+
+Serves the same auth, habits, stats, dashboard, AI and live event routes on an
+event loop, where an open event stream costs a coroutine rather than a thread:
+
+    uvicorn asgi:app --workers 4
+"""
+
+from dotenv import load_dotenv
+
+# Load environment variables before the route modules read them
+load_dotenv()
+
+from quart import Quart, jsonify
+from quart_cors import cors
+from config import load_config, configure_gemini, cors_origins, mongo_client_options, CORS_ALLOW_HEADERS, CORS_EXPOSE_HEADERS
+from database import configure_archive
+from database_async import init_async_db, configure_events
+from ratelimit import create_rate_limiter
+from jwt_async import jwt_required
+
+# Import route blueprints
+from routes_async.auth import auth_bp
+from routes_async.habits import habits_bp
+from routes_async.ai import ai_bp
+from routes_async.stats import stats_bp
+from routes_async.dashboard import dashboard_bp
+from routes_async.events import events_bp
+
+def create_asgi_app():
+    """Application factory function for the ASGI app"""
+    app = Quart(__name__)
+    
+    # Configuration
+    load_config(app)
+    configure_archive(app.config)
+
+    # Open the Motor client (and the limiter's shared buckets, event bus) on the serving loop
+    @app.before_serving
+    async def connect_db():
+        db = init_async_db(app.config['MONGO_URI'], **mongo_client_options(app.config))
+        app.extensions['rate_limiter'] = create_rate_limiter(app.config, db.rate_limits, use_async=True)
+        configure_events(app.config)
+
+    app = cors(
+        app,
+        allow_origin=cors_origins(),
+        allow_credentials=True,
+        allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+        allow_headers=CORS_ALLOW_HEADERS,
+        expose_headers=CORS_EXPOSE_HEADERS,
+    )
+
+    # Avoid automatic 308 redirects between trailing and non-trailing slash
+    app.url_map.strict_slashes = False
+
+    # Configure Gemini AI
+    configure_gemini()
+
+    # Register blueprints
+    app.register_blueprint(auth_bp, url_prefix='/api')
+    app.register_blueprint(habits_bp, url_prefix='/api/habits')
+    app.register_blueprint(ai_bp, url_prefix='/api/ai')
+    app.register_blueprint(stats_bp, url_prefix='/api/stats')
+    app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
+    app.register_blueprint(events_bp, url_prefix='/api/events')
+
+    # Alias for /api/streak to match frontend calls (maps to stats endpoint)
+    @app.route('/api/streak', methods=['GET'])
+    @jwt_required()
+    async def streak_alias():
+        from routes_async.stats import get_global_streak as _get_global_streak
+        return await _get_global_streak.__wrapped__()
+
+    # Basic routes
+    @app.route('/api/test', methods=['GET'])
+    async def test():
+        return jsonify({'message': 'Backend is working!'})
+
+    @app.route('/api/jwt-config', methods=['GET'])
+    async def jwt_config():
+        return jsonify({
+            'jwt_secret_set': bool(app.config.get('JWT_SECRET_KEY')),
+            'jwt_algorithm': app.config.get('JWT_ALGORITHM', 'HS256'),
+            'secret_key_length': len(app.config.get('SECRET_KEY', ''))
+        })
+
+    return app
+
+# Create the app instance
+app = create_asgi_app()
@@ -0,0 +1,74 @@
+"""
+Benchmark: stats history summaries over 5 years of completions for 50 habits.
+
+Compares the NumPy path in analytics.history_summary with a plain Python
+loop over completion timestamps. Run from backend/:
+
+    python benchmarks/bench_history.py
+"""
+
+import os
+import sys
+import time
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import history_summary, to_epoch_ms, MS_PER_DAY
+
+HABITS = 50
+DAYS = 5 * 365
+
+def make_habit_timestamps(rng, start):
+    """Roughly 1-3 completions on ~70% of days"""
+    base = to_epoch_ms(start)
+    stamps = []
+    for day in range(DAYS):
+        if rng.random() < 0.7:
+            for _ in range(rng.randint(1, 3)):
+                stamps.append(base + day * MS_PER_DAY + rng.randrange(MS_PER_DAY))
+    return stamps
+
+def python_summary(timestamps_ms, start, days, target_count=1):
+    """Reference implementation iterating timestamps one by one"""
+    base = to_epoch_ms(start)
+    counts = Counter()
+    for t in timestamps_ms:
+        offset = (t - base) // MS_PER_DAY
+        if 0 <= offset < days:
+            counts[offset] += 1
+    met = [1 if counts[d] >= target_count else 0 for d in range(days)]
+    weekday_counts = [0] * 7
+    for d in range(days):
+        weekday_counts[(start + timedelta(days=d)).weekday()] += counts[d]
+    moving = []
+    for d in range(days):
+        window = met[max(0, d - 6):d + 1]
+        moving.append(sum(window) / len(window))
+    return sum(met) / days, weekday_counts, moving
+
+def main():
+    rng = random.Random(42)
+    start = datetime.combine(datetime.utcnow().date() - timedelta(days=DAYS - 1), datetime.min.time())
+    data = [make_habit_timestamps(rng, start) for _ in range(HABITS)]
+    total = sum(len(d) for d in data)
+    print(f"{HABITS} habits, {DAYS} days, {total} completions")
+
+    t0 = time.perf_counter()
+    for stamps in data:
+        python_summary(stamps, start, DAYS)
+    python_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for stamps in data:
+        history_summary(stamps, start, DAYS)
+    numpy_s = time.perf_counter() - t0
+
+    print(f"python loop: {python_s * 1000:8.1f} ms ({python_s / HABITS * 1000:.2f} ms/habit)")
+    print(f"numpy:       {numpy_s * 1000:8.1f} ms ({numpy_s / HABITS * 1000:.2f} ms/habit)")
+    print(f"speedup:     {python_s / numpy_s:8.1f}x")
+
+if __name__ == '__main__':
+    main()
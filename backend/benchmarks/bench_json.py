@@ -0,0 +1,113 @@
+"""
+Benchmark: response serialization and compression.
+
+Compares the old path against the FastJSONProvider path for the largest
+payloads (chat history, habit list, an export's worth of completions). The
+old path converts every ObjectId/datetime in Python, then runs Flask's
+default provider (stdlib json with sorted keys). The new path hands raw
+documents to responses.dumps_bytes. It then times gzip and brotli (when
+installed) on the encoded bodies. Run from backend/:
+
+    python benchmarks/bench_json.py [--messages 1000 --habits 200 --completions 20000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+import responses
+
+def make_messages(rng, count):
+    now = datetime.utcnow()
+    return [{
+        '_id': ObjectId(),
+        'role': rng.choice(['user', 'assistant']),
+        'text': 'Keep going, you are doing great with your habits today. ' * rng.randint(1, 6),
+        'created_at': now - timedelta(minutes=count - i)
+    } for i in range(count)]
+
+def make_habits(rng, count):
+    now = datetime.utcnow()
+    return [{
+        '_id': ObjectId(),
+        'title': f'Habit {i}',
+        'description': 'Describe the habit in a sentence or two.',
+        'frequency': rng.choice(['daily', 'weekly', 'monthly']),
+        'target_count': rng.randint(1, 8),
+        'current_streak': rng.randint(0, 50),
+        'longest_streak': rng.randint(0, 200),
+        'created_at': now - timedelta(days=rng.randint(0, 900)),
+        'today_completions': rng.randint(0, 3),
+        'is_completed_today': rng.random() < 0.5
+    } for i in range(count)]
+
+def make_completions(rng, count):
+    now = datetime.utcnow()
+    habit_ids = [ObjectId() for _ in range(20)]
+    return [{
+        '_id': ObjectId(),
+        'habit_id': rng.choice(habit_ids),
+        'completed_at': now - timedelta(minutes=rng.randint(0, 500000)),
+        'notes': ''
+    } for _ in range(count)]
+
+def convert(doc):
+    """What the routes did by hand before the provider handled these types"""
+    out = {}
+    for key, value in doc.items():
+        if isinstance(value, ObjectId):
+            value = str(value)
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        out['id' if key == '_id' else key] = value
+    return out
+
+def time_it(fn, rounds):
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        result = fn()
+    return (time.perf_counter() - t0) / rounds, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--habits', type=int, default=200)
+    parser.add_argument('--completions', type=int, default=20000)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    default_provider = DefaultJSONProvider(Flask(__name__))
+    print(f"JSON backend: {'orjson' if responses.orjson else 'stdlib json'}; "
+          f"brotli: {'yes' if responses.brotli else 'not installed'}")
+
+    payloads = (
+        ('chat history', make_messages(rng, args.messages)),
+        ('habit list', make_habits(rng, args.habits)),
+        ('completions', make_completions(rng, args.completions)),
+    )
+    for name, docs in payloads:
+        old_time, old_body = time_it(
+            lambda: default_provider.dumps([convert(doc) for doc in docs]).encode('utf-8'), args.rounds
+        )
+        new_time, new_body = time_it(lambda: responses.dumps_bytes(docs), args.rounds)
+        print(f"{name:13s} {len(docs):6d} docs  encode {old_time * 1e3:8.2f} -> {new_time * 1e3:7.2f} ms "
+              f"({old_time / new_time:4.1f}x)  {len(new_body):9d} bytes")
+
+        for encoding in ('gzip', 'br'):
+            if encoding == 'br' and responses.brotli is None:
+                continue
+            compress_time, compressed = time_it(lambda: responses.compress(new_body, encoding), args.rounds)
+            print(f"{'':13s} {encoding:4s} {compress_time * 1e3:8.2f} ms  {len(compressed):9d} bytes "
+                  f"({len(compressed) / len(new_body):5.1%})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark: full documents vs projected __slots__ records.
+
+For each read shape used by the routes (habit titles for the AI prompts,
+habit list, activity dates for streaks) it compares the BSON bytes a full
+document costs against the projected one, and the time to decode a batch
+into dicts vs records. Pass --mongo-uri to also time real find() calls and
+count the bytes the server returns. Run from backend/:
+
+    python benchmarks/bench_projection.py [--mongo-uri mongodb://localhost:27017/habit_tracker]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bson
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+from records import (
+    record_type, projection, HABIT_TITLE_FIELDS, HABIT_LIST_FIELDS, HABIT_INSIGHT_FIELDS
+)
+
+ACTIVITY_DATE_FIELDS = ('activity_date',)
+
+def make_habits(rng, user_id, count):
+    now = datetime.utcnow()
+    return [{
+        '_id': ObjectId(),
+        'title': f'Habit {i} ' + 'x' * rng.randint(5, 40),
+        'description': 'Describe the habit in a sentence or two. ' * rng.randint(1, 6),
+        'frequency': rng.choice(['daily', 'weekly', 'monthly']),
+        'target_count': rng.randint(1, 8),
+        'current_streak': rng.randint(0, 50),
+        'longest_streak': rng.randint(0, 200),
+        'created_at': now - timedelta(days=rng.randint(0, 900)),
+        'user_id': user_id,
+        'deleted_at': None
+    } for i in range(count)]
+
+def make_activity(user_id, days):
+    start = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    return [{
+        '_id': ObjectId(),
+        'user_id': user_id,
+        'activity_date': start - timedelta(days=d),
+        'created_at': start - timedelta(days=d) + timedelta(hours=20)
+    } for d in range(days)]
+
+def project(doc, fields):
+    """What the server returns for projection(fields)"""
+    return {f: doc[f] for f in fields}
+
+def time_decode(blob, cls, rounds):
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        docs = bson.decode_all(blob)
+        if cls is not None:
+            docs = [cls(doc) for doc in docs]
+    return (time.perf_counter() - t0) / rounds
+
+def compare(name, docs, fields, rounds):
+    full_blob = b''.join(bson.encode(doc) for doc in docs)
+    lean_blob = b''.join(bson.encode(project(doc, fields)) for doc in docs)
+    full_time = time_decode(full_blob, None, rounds)
+    lean_time = time_decode(lean_blob, record_type(fields), rounds)
+    print(f"{name:22s} {len(docs):6d} docs  bytes {len(full_blob):9d} -> {len(lean_blob):9d} "
+          f"({len(lean_blob) / len(full_blob):5.1%})  decode {full_time * 1e3:7.2f} -> {lean_time * 1e3:7.2f} ms")
+
+def compare_mongo(name, collection, query, fields, rounds):
+    def run(spec):
+        raw = collection.with_options(codec_options=bson.CodecOptions(document_class=RawBSONDocument))
+        size = sum(len(doc.raw) for doc in raw.find(query, spec))
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            docs = list(collection.find(query, spec))
+            if spec is not None:
+                docs = [cls(doc) for doc in docs]
+        return size, (time.perf_counter() - t0) / rounds
+    cls = record_type(fields)
+    full_size, full_time = run(None)
+    lean_size, lean_time = run(projection(fields))
+    print(f"mongo {name:16s} bytes {full_size:9d} -> {lean_size:9d}  "
+          f"find {full_time * 1e3:7.2f} -> {lean_time * 1e3:7.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--habits', type=int, default=200)
+    parser.add_argument('--days', type=int, default=3 * 365)
+    parser.add_argument('--rounds', type=int, default=200)
+    parser.add_argument('--mongo-uri')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    user_id = ObjectId()
+    habits = make_habits(rng, user_id, args.habits)
+    activity = make_activity(user_id, args.days)
+
+    compare('habit titles (AI)', habits, HABIT_TITLE_FIELDS, args.rounds)
+    compare('habit insight (AI)', habits, HABIT_INSIGHT_FIELDS, args.rounds)
+    compare('habit list', habits, HABIT_LIST_FIELDS, args.rounds)
+    compare('activity dates', activity, ACTIVITY_DATE_FIELDS, args.rounds)
+
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        db = MongoClient(args.mongo_uri).get_default_database()
+        habit_col, activity_col = db.habits_projection_bench, db.activity_projection_bench
+        habit_col.drop()
+        activity_col.drop()
+        habit_col.insert_many(habits)
+        activity_col.insert_many(activity)
+        rounds = max(1, args.rounds // 10)
+        query = {'user_id': user_id}
+        compare_mongo('habit titles', habit_col, query, HABIT_TITLE_FIELDS, rounds)
+        compare_mongo('habit list', habit_col, query, HABIT_LIST_FIELDS, rounds)
+        compare_mongo('activity dates', activity_col, query, ACTIVITY_DATE_FIELDS, rounds)
+        habit_col.drop()
+        activity_col.drop()
+
+if __name__ == '__main__':
+    main()
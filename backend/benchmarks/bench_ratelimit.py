@@ -0,0 +1,64 @@
+"""
+Benchmark: overhead of the AI rate limiter per request.
+
+Measures RateLimiter.hit() (user bucket + global bucket) on the in-memory
+backend, single-threaded and with contending threads. Pass --mongo-uri to
+also measure the shared MongoDB backend. Run from backend/:
+
+    python benchmarks/bench_ratelimit.py [--mongo-uri mongodb://localhost:27017/habit_tracker]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ratelimit import RateLimiter, MemoryBackend, MongoBackend
+
+# Generous limits so every hit takes the full allow path
+USER_LIMIT = '1000000/second'
+GLOBAL_LIMIT = '1000000/second'
+
+def run(limiter, hits, threads, users):
+    def worker(offset):
+        for i in range(hits):
+            limiter.hit('ai', f'user-{(offset + i) % users}')
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    t0 = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    total = hits * threads
+    return total, elapsed
+
+def report(name, total, elapsed):
+    print(f"{name:32s} {total:8d} hits  {elapsed / total * 1e6:8.2f} us/hit  {total / elapsed:10.0f} hits/s")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hits', type=int, default=200000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--mongo-uri')
+    args = parser.parse_args()
+
+    limiter = RateLimiter(MemoryBackend(), USER_LIMIT, GLOBAL_LIMIT)
+    report('memory, 1 thread', *run(limiter, args.hits, 1, args.users))
+    report('memory, 8 threads', *run(limiter, args.hits // 8, 8, args.users))
+
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        collection = MongoClient(args.mongo_uri).get_default_database().rate_limits_bench
+        collection.drop()
+        limiter = RateLimiter(MongoBackend(collection), USER_LIMIT, GLOBAL_LIMIT)
+        hits = min(args.hits, 5000)
+        report('mongo, 1 thread', *run(limiter, hits, 1, args.users))
+        report('mongo, 8 threads', *run(limiter, hits // 8, 8, args.users))
+        collection.drop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark: analytics reads on secondaries with causal read-your-writes.
+
+Needs a replica set. Each round writes a completion on the primary inside a
+causally consistent session, then reads it back on the secondaries in the
+same session, the way a mutation followed by an analytics view does. It
+counts reads that missed their own write (expected 0 with causal sessions;
+run with --no-causal to see the lag without them) and compares read latency
+on the primary and the secondaries. Run from backend/:
+
+    python benchmarks/bench_read_routing.py --mongo-uri "mongodb://localhost:27017,localhost:27018,localhost:27019/habit_tracker?replicaSet=rs0"
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from pymongo import MongoClient
+from pymongo.read_preferences import Primary, SecondaryPreferred
+
+def run(client, collection, preference, rounds, causal):
+    habit_id = ObjectId()
+    reader = collection.with_options(read_preference=preference)
+    missed = 0
+    read_time = 0.0
+    for i in range(rounds):
+        with client.start_session(causal_consistency=causal) as session:
+            collection.insert_one(
+                {'habit_id': habit_id, 'completed_at': datetime.utcnow(), 'n': i}, session=session
+            )
+            t0 = time.perf_counter()
+            seen = reader.count_documents({'habit_id': habit_id}, session=session)
+            read_time += time.perf_counter() - t0
+            if seen < i + 1:
+                missed += 1
+    return missed, read_time / rounds
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mongo-uri', required=True)
+    parser.add_argument('--rounds', type=int, default=500)
+    parser.add_argument('--max-staleness', type=int, default=90)
+    parser.add_argument('--no-causal', action='store_true')
+    args = parser.parse_args()
+
+    client = MongoClient(args.mongo_uri)
+    collection = client.get_default_database().read_routing_bench
+    collection.drop()
+    collection.create_index('habit_id')
+    causal = not args.no_causal
+
+    for name, preference in (
+        ('primary', Primary()),
+        ('secondaryPreferred', SecondaryPreferred(max_staleness=args.max_staleness))
+    ):
+        missed, latency = run(client, collection, preference, args.rounds, causal)
+        print(f"{name:18s} causal={causal!s:5s} reads {latency * 1e3:6.2f} ms  "
+              f"missed own write {missed}/{args.rounds}")
+    collection.drop()
+
+if __name__ == '__main__':
+    main()
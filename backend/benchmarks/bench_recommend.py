@@ -0,0 +1,68 @@
+"""
+Benchmark: local habit recommendations.
+
+Times recommend_habits() for common queries (exact keyword hits), misspelled
+queries (fuzzy matches) and unmatched queries (the ones that go to Gemini),
+first on the curated catalog and again after it has learned a batch of
+generated habits. Run from backend/:
+
+    python benchmarks/bench_recommend.py [--learned 500]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recommendations import HabitCatalog, CATALOG
+
+COMMON = [
+    'I want to sleep better', 'drink more water', 'reduce stress and anxiety',
+    'be more productive at work', 'learn spanish', 'save money', 'get fit',
+]
+FUZZY = ['meditaton', 'save mony', 'runing every morning', 'journalling', 'excercise']
+UNMATCHED = ['zzqx', 'qwerty uiop', 'xylophone zebra']
+
+def time_queries(catalog, queries, rounds, existing):
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for query in queries:
+            catalog.recommend(query, existing)
+    return (time.perf_counter() - t0) / (rounds * len(queries))
+
+def report(name, catalog, rounds, existing):
+    print(f"{name:18s} {len(catalog):5d} entries", end='')
+    for label, queries in (('common', COMMON), ('fuzzy', FUZZY), ('unmatched', UNMATCHED)):
+        print(f"  {label} {time_queries(catalog, queries, rounds, existing) * 1e6:7.1f} us", end='')
+    print()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=2000)
+    parser.add_argument('--learned', type=int, default=500)
+    args = parser.parse_args()
+
+    existing = ['Drink Water', 'Read', 'Meditate']
+    catalog = HabitCatalog(CATALOG)
+
+    # The first call for a misspelled word pays for the fuzzy search; later ones hit the cache
+    t0 = time.perf_counter()
+    for query in FUZZY:
+        catalog.recommend(query, existing)
+    print(f"cold fuzzy         {(time.perf_counter() - t0) / len(FUZZY) * 1e6:7.1f} us per query")
+
+    report('curated', catalog, args.rounds, existing)
+
+    for i in range(args.learned):
+        catalog.learn(f'topic{i} practice', [{
+            'title': f'Generated Habit {i}',
+            'description': f'Practice topic{i} for ten minutes',
+            'frequency': 'daily',
+            'target_count': 1
+        }])
+    report('after learning', catalog, args.rounds, existing)
+
+if __name__ == '__main__':
+    main()
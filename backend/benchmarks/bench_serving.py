@@ -0,0 +1,117 @@
+"""
+Benchmark: requests per second of one sync (gunicorn) vs one async (uvicorn) worker.
+
+Start each server with a single worker against the same MongoDB, e.g.
+
+    gunicorn -w 1 -b 127.0.0.1:5000 app:app
+    uvicorn asgi:app --workers 1 --port 5001
+
+then run the same load profile against both:
+
+    python benchmarks/bench_serving.py --url http://127.0.0.1:5000
+    python benchmarks/bench_serving.py --url http://127.0.0.1:5001
+
+The profile is a read-heavy dashboard mix (habits, stats, streak, history)
+with a completion every tenth request, issued by N keep-alive clients.
+"""
+
+import argparse
+import http.client
+import json
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+PROFILE = [
+    ('GET', '/api/habits'),
+    ('GET', '/api/stats'),
+    ('GET', '/api/streak'),
+    ('GET', '/api/habits'),
+    ('GET', '/api/stats/history?range=month'),
+    ('GET', '/api/habits'),
+    ('GET', '/api/stats'),
+    ('GET', '/api/streak'),
+    ('GET', '/api/ai/chat/history'),
+    ('POST', '/api/habits/{habit_id}/complete'),
+]
+
+def request(conn, method, path, token=None, body=None):
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+    resp = conn.getresponse()
+    data = resp.read()
+    return resp.status, data
+
+def setup(host, port):
+    """Register a throwaway user with a few high-target habits"""
+    conn = http.client.HTTPConnection(host, port)
+    name = f'bench-{uuid.uuid4().hex[:10]}'
+    status, data = request(conn, 'POST', '/api/register',
+                           body={'username': name, 'email': f'{name}@example.com', 'password': 'bench'})
+    if status != 201:
+        raise SystemExit(f'register failed: {status} {data[:200]}')
+    token = json.loads(data)['access_token']
+    habit_ids = []
+    for i in range(5):
+        status, data = request(conn, 'POST', '/api/habits', token,
+                               {'title': f'Bench habit {i}', 'frequency': 'daily', 'target_count': 1000000})
+        habit_ids.append(json.loads(data)['id'])
+    conn.close()
+    return token, habit_ids
+
+def client(host, port, token, habit_ids, deadline, latencies, errors, offset):
+    conn = http.client.HTTPConnection(host, port)
+    i = offset
+    while time.perf_counter() < deadline:
+        method, path = PROFILE[i % len(PROFILE)]
+        path = path.format(habit_id=habit_ids[i % len(habit_ids)])
+        body = {} if method == 'POST' else None
+        t0 = time.perf_counter()
+        try:
+            status, _ = request(conn, method, path, token, body)
+            if status >= 400:
+                errors.append(status)
+        except (OSError, http.client.HTTPException):
+            errors.append('conn')
+            conn.close()
+            conn = http.client.HTTPConnection(host, port)
+        latencies.append(time.perf_counter() - t0)
+        i += 1
+    conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=20.0)
+    args = parser.parse_args()
+
+    target = urlparse(args.url)
+    token, habit_ids = setup(target.hostname, target.port)
+
+    latencies, errors = [], []
+    deadline = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(target=client, args=(target.hostname, target.port, token, habit_ids,
+                                              deadline, latencies, errors, n))
+        for n in range(args.clients)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    print(f"{args.url}: {len(latencies)} requests in {elapsed:.1f}s with {args.clients} clients")
+    print(f"  throughput: {len(latencies) / elapsed:.1f} req/s")
+    print(f"  latency:    p50 {p(0.50):.1f} ms, p95 {p(0.95):.1f} ms, p99 {p(0.99):.1f} ms")
+    print(f"  errors:     {len(errors)}")
+
+if __name__ == '__main__':
+    main()
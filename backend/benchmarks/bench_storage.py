@@ -0,0 +1,79 @@
+"""
+Benchmark: the completion and dashboard helpers on the embedded storage backends.
+
+Runs the writes of one habit completion (completion, rollup, activity, stats)
+and the reads of one dashboard load (habits, rollups, activity dates, stats)
+against the in-memory and SQLite-file backends, all in-process. Run from
+backend/:
+
+    python benchmarks/bench_storage.py [--sqlite-path /tmp/bench.db]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import SQLiteStorage
+from records import HABIT_LIST_FIELDS
+
+def seed(store, users, habits):
+    user_ids, habit_ids = [], []
+    for u in range(users):
+        user = store.create_user(f'bench-{u}', f'bench-{u}@example.com', 'bench')
+        user_ids.append(user['_id'])
+        habit_ids.append([
+            store.create_habit(user['_id'], f'Habit {h}', '', 'daily', 3)['_id'] for h in range(habits)
+        ])
+    return user_ids, habit_ids
+
+def complete(store, user_id, habit_id, today):
+    store.create_habit_completion(habit_id, '')
+    store.record_completion_rollup(user_id, habit_id, today, met=True)
+    store.record_user_daily_activity(user_id, today)
+    store.update_user_stats(user_id, {'total_completions': 1})
+    store.raise_longest_daily_streak(user_id, 1)
+
+def load_dashboard(store, user_id, today):
+    store.get_user_habits(user_id, HABIT_LIST_FIELDS)
+    store.get_user_daily_rollups(user_id, today - timedelta(days=31), today + timedelta(days=1))
+    store.get_user_activity_dates(user_id)
+    store.get_or_create_user_stats(user_id)
+
+def run(name, store, users, habits, ops):
+    user_ids, habit_ids = seed(store, users, habits)
+    today = datetime.utcnow()
+
+    t0 = time.perf_counter()
+    for i in range(ops):
+        u = i % users
+        complete(store, user_ids[u], habit_ids[u][i % habits], today)
+    write_time = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for i in range(ops):
+        load_dashboard(store, user_ids[i % users], today)
+    read_time = time.perf_counter() - t0
+
+    print(f"{name:10s} completions {ops / write_time:9.0f}/s ({write_time / ops * 1e6:7.1f} us)  "
+          f"dashboard loads {ops / read_time:9.0f}/s ({read_time / ops * 1e6:7.1f} us)")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--habits', type=int, default=5)
+    parser.add_argument('--ops', type=int, default=5000)
+    parser.add_argument('--sqlite-path')
+    args = parser.parse_args()
+
+    run('memory', SQLiteStorage(':memory:'), args.users, args.habits, args.ops)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.sqlite_path or os.path.join(tmp, 'bench.db')
+        run('sqlite', SQLiteStorage(path), args.users, args.habits, args.ops)
+
+if __name__ == '__main__':
+    main()
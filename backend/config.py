@@ -0,0 +1,118 @@
+"""
+Shared configuration for the Flask (WSGI) and Quart (ASGI) apps
+"""
+
+import os
+from datetime import timedelta
+import google.generativeai as genai
+
+def load_config(app):
+    """Apply environment-driven settings to a Flask or Quart app"""
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
+    app.config['MONGO_URI'] = os.getenv('MONGO_URI', 'mongodb://localhost:27017/habit_tracker')
+    app.config['JWT_SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=7)
+    app.config['JWT_ALGORITHM'] = 'HS256'
+
+    # MongoDB client pool, timeouts (milliseconds; unset means the driver default) and wire compression
+    app.config['MONGO_MAX_POOL_SIZE'] = int(os.getenv('MONGO_MAX_POOL_SIZE', '100'))
+    app.config['MONGO_MIN_POOL_SIZE'] = int(os.getenv('MONGO_MIN_POOL_SIZE', '0'))
+    app.config['MONGO_MAX_IDLE_TIME_MS'] = _optional_int('MONGO_MAX_IDLE_TIME_MS')
+    app.config['MONGO_WAIT_QUEUE_TIMEOUT_MS'] = _optional_int('MONGO_WAIT_QUEUE_TIMEOUT_MS')
+    app.config['MONGO_CONNECT_TIMEOUT_MS'] = _optional_int('MONGO_CONNECT_TIMEOUT_MS')
+    app.config['MONGO_SERVER_SELECTION_TIMEOUT_MS'] = _optional_int('MONGO_SERVER_SELECTION_TIMEOUT_MS')
+    app.config['MONGO_SOCKET_TIMEOUT_MS'] = _optional_int('MONGO_SOCKET_TIMEOUT_MS')
+    app.config['MONGO_COMPRESSORS'] = os.getenv('MONGO_COMPRESSORS', '')  # e.g. zstd,snappy,zlib
+
+    # Read-only analytics views (insights, stats history, chat history) may read from
+    # secondaries no more than ANALYTICS_MAX_STALENESS_SECONDS behind (90 at least)
+    app.config['ANALYTICS_READ_PREFERENCE'] = os.getenv('ANALYTICS_READ_PREFERENCE', 'primary')
+    app.config['ANALYTICS_MAX_STALENESS_SECONDS'] = int(os.getenv('ANALYTICS_MAX_STALENESS_SECONDS', '90'))
+
+    # Storage for the Flask app: mongo, sqlite (SQLITE_PATH file) or memory (in-process, lost on exit)
+    app.config['STORAGE_BACKEND'] = os.getenv('STORAGE_BACKEND', 'mongo')
+    app.config['SQLITE_PATH'] = os.getenv('SQLITE_PATH', 'habit_tracker.db')
+
+    # Completions and chat messages older than these many days move to archive collections
+    app.config['ARCHIVE_COMPLETIONS_AFTER_DAYS'] = int(os.getenv('ARCHIVE_COMPLETIONS_AFTER_DAYS', '730'))
+    app.config['ARCHIVE_CHAT_AFTER_DAYS'] = int(os.getenv('ARCHIVE_CHAT_AFTER_DAYS', '180'))
+
+    # AI rate limits: token buckets written as "<requests>/<second|minute|hour|day>"
+    app.config['RATE_LIMIT_ENABLED'] = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() != 'false'
+    app.config['RATE_LIMIT_BACKEND'] = os.getenv('RATE_LIMIT_BACKEND', 'memory')  # memory or mongo
+    app.config['AI_USER_RATE_LIMIT'] = os.getenv('AI_USER_RATE_LIMIT', '10/minute')
+    app.config['AI_GLOBAL_RATE_LIMIT'] = os.getenv('AI_GLOBAL_RATE_LIMIT', '300/minute')
+
+    # Coalesce user_stats and daily activity writes in memory and flush them in bulk
+    app.config['WRITE_BEHIND_ENABLED'] = os.getenv('WRITE_BEHIND_ENABLED', 'false').lower() == 'true'
+    app.config['WRITE_BEHIND_FLUSH_INTERVAL'] = float(os.getenv('WRITE_BEHIND_FLUSH_INTERVAL', '0.5'))  # seconds
+    app.config['WRITE_BEHIND_MAX_PENDING'] = int(os.getenv('WRITE_BEHIND_MAX_PENDING', '500'))
+
+    # Live change events (/api/events): memory (per process) or mongo (shared across workers)
+    app.config['EVENTS_BACKEND'] = os.getenv('EVENTS_BACKEND', 'memory')
+    app.config['EVENTS_QUEUE_SIZE'] = int(os.getenv('EVENTS_QUEUE_SIZE', '100'))  # per open stream
+    app.config['EVENTS_HEARTBEAT'] = float(os.getenv('EVENTS_HEARTBEAT', '15'))  # seconds
+    app.config['EVENTS_MAX_STREAM_SECONDS'] = float(os.getenv('EVENTS_MAX_STREAM_SECONDS', '300'))
+    app.config['EVENTS_TOKEN_TTL_SECONDS'] = int(os.getenv('EVENTS_TOKEN_TTL_SECONDS', '60'))  # stream tokens
+    app.config['EVENTS_MAX_STREAMS_PER_USER'] = int(os.getenv('EVENTS_MAX_STREAMS_PER_USER', '5'))  # per process
+    # Open streams per Flask worker process (each holds a thread); not applied in asgi.py
+    app.config['EVENTS_MAX_STREAMS'] = int(os.getenv('EVENTS_MAX_STREAMS', '32'))
+
+    # Compress responses of at least COMPRESS_MIN_SIZE bytes (brotli if installed and accepted, else gzip)
+    app.config['COMPRESS_ENABLED'] = os.getenv('COMPRESS_ENABLED', 'true').lower() != 'false'
+    app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+    app.config['COMPRESS_GZIP_LEVEL'] = int(os.getenv('COMPRESS_GZIP_LEVEL', '6'))
+    app.config['COMPRESS_BROTLI_QUALITY'] = int(os.getenv('COMPRESS_BROTLI_QUALITY', '4'))
+
+    # Stored responses for Idempotency-Key retries expire after this many hours
+    app.config['IDEMPOTENCY_TTL_HOURS'] = float(os.getenv('IDEMPOTENCY_TTL_HOURS', '24'))
+    # A key held by a request that never finished (e.g. its worker died) frees up after this many seconds
+    app.config['IDEMPOTENCY_LEASE_SECONDS'] = float(os.getenv('IDEMPOTENCY_LEASE_SECONDS', '60'))
+
+def _optional_int(name):
+    value = os.getenv(name)
+    return int(value) if value else None
+
+# Config key -> MongoClient keyword
+MONGO_CLIENT_OPTIONS = {
+    'MONGO_MAX_POOL_SIZE': 'maxPoolSize',
+    'MONGO_MIN_POOL_SIZE': 'minPoolSize',
+    'MONGO_MAX_IDLE_TIME_MS': 'maxIdleTimeMS',
+    'MONGO_WAIT_QUEUE_TIMEOUT_MS': 'waitQueueTimeoutMS',
+    'MONGO_CONNECT_TIMEOUT_MS': 'connectTimeoutMS',
+    'MONGO_SERVER_SELECTION_TIMEOUT_MS': 'serverSelectionTimeoutMS',
+    'MONGO_SOCKET_TIMEOUT_MS': 'socketTimeoutMS'
+}
+
+def mongo_client_options(config):
+    """MongoClient keyword arguments for the configured pool, timeouts and compression"""
+    options = {
+        option: config[key]
+        for key, option in MONGO_CLIENT_OPTIONS.items()
+        if config.get(key) is not None
+    }
+    if config.get('MONGO_COMPRESSORS'):
+        options['compressors'] = config['MONGO_COMPRESSORS']
+    return options
+
+def cors_origins():
+    """Frontend origins allowed to call /api/*"""
+    frontend_origin = os.getenv('FRONTEND_ORIGIN', 'http://localhost:3000')
+    return [frontend_origin, "http://localhost:3000"]
+
+# Request headers the frontend may send
+CORS_ALLOW_HEADERS = ["Content-Type", "Authorization", "Idempotency-Key", "Causal-Fence"]
+
+# Response headers the frontend may read
+CORS_EXPOSE_HEADERS = [
+    "Content-Type", "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "Retry-After",
+    "Idempotent-Replayed", "Causal-Fence"
+]
+
+def configure_gemini():
+    """Configure Gemini AI if an API key is set"""
+    gemini_api_key = os.getenv('GEMINI_API_KEY')
+    if gemini_api_key and gemini_api_key != 'your_gemini_api_key_here':
+        genai.configure(api_key=gemini_api_key)
+    else:
+        print("Warning: GEMINI_API_KEY not set. AI features will be disabled.")
@@ -3,33 +3,293 @@ MongoDB database operations and helper functions
 """
 
 from flask_pymongo import PyMongo
-from bson import ObjectId
-from bson.errors import InvalidId
+from pymongo import DeleteOne, InsertOne, UpdateOne, UpdateMany, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.read_preferences import PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
+from bson import ObjectId, decode as bson_decode, encode as bson_encode
+from bson.errors import InvalidBSON, InvalidId
 from datetime import datetime, timedelta
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps, partial
+from itsdangerous import BadSignature, Signer
+import base64
+import uuid
+import contextvars
+import threading
+import time
 from werkzeug.security import generate_password_hash
+from streaks import compute_streaks, longest_daily_run
+from storage import create_storage
+from writebehind import create_write_buffer
+from events import create_event_bus
+from records import find_records
+from partitions import reminder_bucket, partition_buckets
+from config import mongo_client_options
 
 # Global mongo instance (will be initialized in main app)
 mongo = None
 
+# Embedded storage (see storage.py); None means MongoDB
+storage = None
+
+# Optional write-behind buffer for user_stats and daily activity (see writebehind.py)
+write_buffer = None
+
+# Live change events for /api/events (see events.py)
+event_bus = None
+
+# Read preference of analytics views; None keeps every read on the primary
+analytics_read_preference = None
+
+# The causally consistent session of the current request (see causal_session)
+_request_session = contextvars.ContextVar('request_session', default=None)
+_request_analytics = contextvars.ContextVar('request_analytics', default=False)
+
+# Latest (cluster time, operation time) seen per user, so the next session waits for it.
+# This process's copy; clients also carry theirs in the Causal-Fence header to other workers.
+CAUSAL_FENCE_HEADER = 'Causal-Fence'
+MAX_CAUSAL_FENCES = 10000
+_causal_fences = OrderedDict()
+_causal_fences_lock = threading.Lock()
+
+# Records older than these many days live in the *_archive collections
+archive_horizons = {
+    'habit_completions': 730,
+    'ai_chat_messages': 180
+}
+
 def init_db(app):
     """Initialize the database with the Flask app"""
-    global mongo
-    mongo = PyMongo(app)
+    global mongo, storage
+    mongo = PyMongo(app, **mongo_client_options(app.config))
+    storage = create_storage(app.config)
+    configure_read_routing(app.config)
+    configure_archive(app.config)
+    configure_write_behind(app.config)
+    configure_events(app.config)
+    app.after_request(_send_causal_fence)
     return mongo
 
+def storage_backed(fn):
+    """Route a helper to the method of the same name on the embedded storage, when one is configured"""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if storage is not None:
+            return getattr(storage, fn.__name__)(*args, **kwargs)
+        return fn(*args, **kwargs)
+    return wrapper
+
+def configure_archive(config):
+    """Read archive horizons from app config"""
+    archive_horizons['habit_completions'] = int(config.get('ARCHIVE_COMPLETIONS_AFTER_DAYS', 730))
+    archive_horizons['ai_chat_messages'] = int(config.get('ARCHIVE_CHAT_AFTER_DAYS', 180))
+
+def configure_write_behind(config):
+    """Enable the write-behind buffer when WRITE_BEHIND_ENABLED is set"""
+    global write_buffer
+    # The buffer coalesces Mongo round trips; embedded storage has none to save
+    write_buffer = create_write_buffer(config, get_collections) if storage is None else None
+
+READ_PREFERENCES = {
+    'primaryPreferred': PrimaryPreferred,
+    'secondary': Secondary,
+    'secondaryPreferred': SecondaryPreferred,
+    'nearest': Nearest
+}
+
+def configure_read_routing(config):
+    """Route analytics reads per ANALYTICS_READ_PREFERENCE (only with MongoDB)"""
+    global analytics_read_preference
+    mode = config.get('ANALYTICS_READ_PREFERENCE', 'primary')
+    if mode != 'primary' and mode not in READ_PREFERENCES:
+        raise ValueError(f"Unknown analytics read preference: {mode}")
+    max_staleness = int(config.get('ANALYTICS_MAX_STALENESS_SECONDS', 90))
+    if max_staleness < 90:
+        # The server's heartbeat granularity makes smaller bounds invalid
+        raise ValueError("ANALYTICS_MAX_STALENESS_SECONDS must be at least 90")
+    if mode == 'primary' or storage is not None:
+        analytics_read_preference = None
+    else:
+        analytics_read_preference = READ_PREFERENCES[mode](max_staleness=max_staleness)
+
+class SessionCollection:
+    """A collection whose operations all run in one client session"""
+
+    SESSION_METHODS = {
+        'find', 'find_one', 'find_one_and_update', 'find_one_and_delete', 'count_documents',
+        'aggregate', 'distinct', 'insert_one', 'insert_many', 'update_one', 'update_many',
+        'replace_one', 'delete_one', 'delete_many', 'bulk_write'
+    }
+
+    def __init__(self, collection, session):
+        self.collection = collection
+        self.session = session
+
+    def __getattr__(self, name):
+        attr = getattr(self.collection, name)
+        if name in self.SESSION_METHODS:
+            return partial(attr, session=self.session)
+        return attr
+
+def _remember_fence(user_id, session):
+    if session.operation_time is None:
+        return None  # Standalone servers report no operation time
+    with _causal_fences_lock:
+        fence = _causal_fences.pop(user_id, None)
+        if fence is None or fence[1] < session.operation_time:
+            fence = (session.cluster_time, session.operation_time)
+        _causal_fences[user_id] = fence
+        if len(_causal_fences) > MAX_CAUSAL_FENCES:
+            _causal_fences.popitem(last=False)
+    return fence
+
+def _fence_signer():
+    from flask import current_app
+    return Signer(current_app.config['SECRET_KEY'], salt='causal-fence')
+
+def _client_fence(user_id):
+    """The fence the client sent back from its last write, if valid and its own"""
+    from flask import request
+    token = request.headers.get(CAUSAL_FENCE_HEADER)
+    if not token:
+        return None
+    try:
+        doc = bson_decode(base64.urlsafe_b64decode(_fence_signer().unsign(token)))
+    except (BadSignature, ValueError, InvalidBSON):
+        return None
+    if doc.get('user_id') != user_id:
+        return None
+    return doc['cluster_time'], doc['operation_time']
+
+def _send_causal_fence(response):
+    """Hand the request's write fence to the client (after_request; set only with secondary reads)"""
+    from flask import g
+    fence = g.pop('causal_fence', None)
+    if fence is not None:
+        user_id, (cluster_time, operation_time) = fence
+        doc = {'user_id': user_id, 'cluster_time': cluster_time, 'operation_time': operation_time}
+        response.headers[CAUSAL_FENCE_HEADER] = _fence_signer().sign(
+            base64.urlsafe_b64encode(bson_encode(doc))
+        ).decode('ascii')
+    return response
+
+@contextmanager
+def causal_context(user_id, analytics=False):
+    """Run a block in a causally consistent session that starts after the user's latest write.
+
+    The latest write is the later of this process's and the one the client sent
+    in the Causal-Fence header, so reads observe it even on a secondary of another
+    worker. A block that writes (not `analytics`) hands its fence back in the
+    response header. Keep blocks short; the session stays checked out until the
+    block ends. Without secondary reads configured this is a no-op.
+    """
+    if analytics_read_preference is None:
+        yield
+        return
+    from flask import g
+    with mongo.cx.start_session(causal_consistency=True) as session:
+        with _causal_fences_lock:
+            fence = _causal_fences.get(user_id)
+        client_fence = _client_fence(user_id)
+        if client_fence and (fence is None or fence[1] < client_fence[1]):
+            fence = client_fence
+        if fence:
+            session.advance_cluster_time(fence[0])
+            session.advance_operation_time(fence[1])
+        session_token = _request_session.set(session)
+        analytics_token = _request_analytics.set(analytics)
+        try:
+            yield
+        finally:
+            _request_session.reset(session_token)
+            _request_analytics.reset(analytics_token)
+            fence = _remember_fence(user_id, session)
+            if fence is not None and not analytics:
+                g.causal_fence = (user_id, fence)
+
+def causal_session(analytics=False):
+    """Run a Flask view (placed under @jwt_required()) in causal_context for its user.
+
+    With `analytics`, the view's reads use ANALYTICS_READ_PREFERENCE. Views that
+    wait on outside services should use causal_context around their database
+    work instead, so no session is held during the call.
+    """
+    def wrapper(fn):
+        @wraps(fn)
+        def decorated(*args, **kwargs):
+            if analytics_read_preference is None:
+                return fn(*args, **kwargs)
+            from flask_jwt_extended import get_jwt_identity
+            with causal_context(get_jwt_identity(), analytics):
+                return fn(*args, **kwargs)
+        return decorated
+    return wrapper
+
+def configure_events(config):
+    """Set up the event bus behind /api/events"""
+    global event_bus
+    event_bus = create_event_bus(config, get_collections)
+
+def subscribe_events(user_id):
+    """Open a subscription to a user's live change events"""
+    return event_bus.subscribe(user_id)
+
+def unsubscribe_events(subscription):
+    """Close a subscription from subscribe_events"""
+    event_bus.unsubscribe(subscription)
+
+def publishes(build_event):
+    """After a write, publish build_event(result, *args) -> (user_id, event) or None to live streams"""
+    def wrapper(fn):
+        @wraps(fn)
+        def decorated(*args, **kwargs):
+            result = fn(*args, **kwargs)
+            if event_bus is not None:
+                published = build_event(result, *args, **kwargs)
+                if published:
+                    event_bus.publish(*published)
+            return result
+        return decorated
+    return wrapper
+
+def archive_cutoff(name):
+    """Records of `name` created before this datetime may have been archived"""
+    return _day_start(datetime.utcnow()) - timedelta(days=archive_horizons[name])
+
 # Database Collections (initialized after mongo)
 def get_collections():
-    """Get all database collections"""
+    """Get all database collections (bound to the request's causal session, if any)"""
+    collections = _base_collections()
+    session = _request_session.get()
+    if session is None:
+        return collections
+    if _request_analytics.get():
+        collections = {
+            name: collection.with_options(read_preference=analytics_read_preference)
+            for name, collection in collections.items()
+        }
+    return {name: SessionCollection(collection, session) for name, collection in collections.items()}
+
+def _base_collections():
     return {
         'users': mongo.db.users,
         'habits': mongo.db.habits,
         'habit_completions': mongo.db.habit_completions,
+        'habit_completions_archive': mongo.db.habit_completions_archive,
         'user_daily_activity': mongo.db.user_daily_activity,
         'ai_chat_messages': mongo.db.ai_chat_messages,
-        'user_stats': mongo.db.user_stats
+        'ai_chat_messages_archive': mongo.db.ai_chat_messages_archive,
+        'user_stats': mongo.db.user_stats,
+        'user_daily_rollups': mongo.db.user_daily_rollups,
+        'reminder_log': mongo.db.reminder_log,
+        'rate_limits': mongo.db.rate_limits,
+        'habit_events': mongo.db.habit_events,
+        'idempotency_keys': mongo.db.idempotency_keys
     }
 
 # User Operations
+@storage_backed
 def create_user(username, email, password):
     """Create a new user document"""
     collections = get_collections()
@@ -43,16 +303,19 @@ def create_user(username, email, password):
     user_doc['_id'] = result.inserted_id
     return user_doc
 
+@storage_backed
 def get_user_by_username(username):
     """Get user by username"""
     collections = get_collections()
     return collections['users'].find_one({'username': username})
 
+@storage_backed
 def get_user_by_email(email):
     """Get user by email"""
     collections = get_collections()
     return collections['users'].find_one({'email': email})
 
+@storage_backed
 def get_user_by_id(user_id):
     """Get user by ID"""
     collections = get_collections()
@@ -61,7 +324,42 @@ def get_user_by_id(user_id):
     except InvalidId:
         return None
 
+# Live Events (published by the write helpers below)
+HABIT_EVENT_FIELDS = ('title', 'description', 'frequency', 'target_count', 'current_streak', 'longest_streak')
+
+def _habit_created_event(habit, user_id, *args, **kwargs):
+    event = {'type': 'habit.created', 'habit_id': str(habit['_id'])}
+    event.update((field, habit[field]) for field in HABIT_EVENT_FIELDS)
+    event['created_at'] = habit['created_at'].isoformat()
+    return user_id, event
+
+def _habit_updated_event(updated, habit_id, user_id, updates):
+    if not updated:
+        return None
+    event = {'type': 'habit.updated', 'habit_id': str(habit_id)}
+    event.update((field, updates[field]) for field in HABIT_EVENT_FIELDS if field in updates)
+    return user_id, event
+
+def _habit_deleted_event(deleted, habit_id, user_id):
+    return (user_id, {'type': 'habit.deleted', 'habit_id': str(habit_id)}) if deleted else None
+
+def _habit_completed_event(count, user_id, habit_id, completed_at, met=False):
+    if count is None:
+        return None
+    return user_id, {
+        'type': 'habit.completed',
+        'habit_id': str(habit_id),
+        'day': _day_start(completed_at).date().isoformat(),
+        'today_completions': count,
+        'is_completed_today': bool(met)
+    }
+
+def _streak_event(result, user_id, streak):
+    return user_id, {'type': 'streak', 'current_streak': streak}
+
 # Habit Operations
+@publishes(_habit_created_event)
+@storage_backed
 def create_habit(user_id, title, description, frequency, target_count):
     """Create a new habit document"""
     collections = get_collections()
@@ -73,59 +371,111 @@ def create_habit(user_id, title, description, frequency, target_count):
         'current_streak': 0,
         'longest_streak': 0,
         'created_at': datetime.utcnow(),
-        'user_id': ObjectId(user_id)
+        'user_id': ObjectId(user_id),
+        'reminder_bucket': reminder_bucket(user_id)
     }
     result = collections['habits'].insert_one(habit_doc)
     habit_doc['_id'] = result.inserted_id
     return habit_doc
 
-def get_user_habits(user_id):
-    """Get all habits for a user"""
+@storage_backed
+def get_user_habits(user_id, fields=None):
+    """Get all (non-deleted) habits for a user; with `fields`, only those fields as records"""
     collections = get_collections()
     try:
-        return list(collections['habits'].find({'user_id': ObjectId(user_id)}))
+        query = {'user_id': ObjectId(user_id), 'deleted_at': None}
     except InvalidId:
         return []
+    if fields:
+        return find_records(collections['habits'], query, fields)
+    return list(collections['habits'].find(query))
 
+@storage_backed
 def get_habit_by_id(habit_id, user_id):
     """Get habit by ID and user ID"""
     collections = get_collections()
     try:
         return collections['habits'].find_one({
             '_id': ObjectId(habit_id),
-            'user_id': ObjectId(user_id)
+            'user_id': ObjectId(user_id),
+            'deleted_at': None
         })
     except InvalidId:
         return None
 
+@publishes(_habit_updated_event)
+@storage_backed
 def update_habit(habit_id, user_id, updates):
     """Update a habit document"""
     collections = get_collections()
     try:
         result = collections['habits'].update_one(
-            {'_id': ObjectId(habit_id), 'user_id': ObjectId(user_id)},
+            {'_id': ObjectId(habit_id), 'user_id': ObjectId(user_id), 'deleted_at': None},
             {'$set': updates}
         )
         return result.modified_count > 0
     except InvalidId:
         return False
 
+@publishes(_habit_deleted_event)
+@storage_backed
 def delete_habit(habit_id, user_id):
-    """Delete a habit and its completions"""
+    """Soft-delete a habit; its completions are removed later by purge_deleted_habits"""
     collections = get_collections()
     try:
-        # Delete habit completions first
-        collections['habit_completions'].delete_many({'habit_id': ObjectId(habit_id)})
-        # Delete habit
-        result = collections['habits'].delete_one({
-            '_id': ObjectId(habit_id),
-            'user_id': ObjectId(user_id)
-        })
-        return result.deleted_count > 0
+        result = collections['habits'].update_one(
+            {'_id': ObjectId(habit_id), 'user_id': ObjectId(user_id), 'deleted_at': None},
+            {'$set': {'deleted_at': datetime.utcnow()}}
+        )
+        return result.modified_count > 0
     except InvalidId:
         return False
 
+@storage_backed
+def purge_deleted_habits(batch_size=1000, pause=0.05):
+    """Remove soft-deleted habits with their completions and derived counters.
+
+    Completions go in small batches with a pause between them, so a habit
+    with years of history never holds locks or I/O for long.
+    """
+    collections = get_collections()
+    purged = 0
+    last_id = None
+    while True:
+        # Short pages by _id, so no cursor stays open across the pauses and times out
+        page_filter = {'deleted_at': {'$ne': None}}
+        if last_id is not None:
+            page_filter['_id'] = {'$gt': last_id}
+        page = list(collections['habits'].find(page_filter, {'user_id': 1}).sort('_id', 1).limit(batch_size))
+        if not page:
+            break
+        last_id = page[-1]['_id']
+        for habit in page:
+            _purge_habit(collections, habit, batch_size, pause)
+            purged += 1
+    if purged:
+        print(f"Purged {purged} deleted habits")
+    return purged
+
+def _purge_habit(collections, habit, batch_size, pause):
+    for name in ('habit_completions', 'habit_completions_archive'):
+        while True:
+            ids = [row['_id'] for row in collections[name].find(
+                {'habit_id': habit['_id']}, {'_id': 1}
+            ).limit(batch_size)]
+            if not ids:
+                break
+            collections[name].delete_many({'_id': {'$in': ids}})
+            if pause:
+                time.sleep(pause)
+
+    # Derived state goes once the raw completions are gone
+    remove_habit_from_rollups(habit['_id'], habit['user_id'])
+    collections['reminder_log'].delete_many({'habit_id': habit['_id']})
+    collections['habits'].delete_one({'_id': habit['_id']})
+
 # Habit Completion Operations
+@storage_backed
 def create_habit_completion(habit_id, notes):
     """Create a habit completion document"""
     collections = get_collections()
@@ -137,6 +487,7 @@ def create_habit_completion(habit_id, notes):
     result = collections['habit_completions'].insert_one(completion_doc)
     return result.inserted_id
 
+@storage_backed
 def get_habit_completions_today(habit_id):
     """Get habit completions for today"""
     collections = get_collections()
@@ -149,14 +500,20 @@ def get_habit_completions_today(habit_id):
         'completed_at': {'$gte': start_of_day, '$lte': end_of_day}
     })
 
+@storage_backed
 def get_habit_completions_period(habit_id, start_date, end_date):
-    """Get habit completions for a period"""
+    """Get habit completions for a period (including archived ones if it reaches that far)"""
     collections = get_collections()
-    return collections['habit_completions'].count_documents({
+    query = {
         'habit_id': ObjectId(habit_id),
         'completed_at': {'$gte': start_date, '$lt': end_date}
-    })
+    }
+    count = collections['habit_completions'].count_documents(query)
+    if start_date < archive_cutoff('habit_completions'):
+        count += collections['habit_completions_archive'].count_documents(query)
+    return count
 
+@storage_backed
 def get_habit_completions_yesterday(habit_id):
     """Check if habit was completed yesterday"""
     collections = get_collections()
@@ -169,7 +526,28 @@ def get_habit_completions_yesterday(habit_id):
         'completed_at': {'$gte': start_of_day, '$lte': end_of_day}
     })
 
+@storage_backed
+def get_completion_timestamps(habit_ids, start_date, end_date):
+    """Get completion times (epoch milliseconds) for habits in [start_date, end_date)"""
+    collections = get_collections()
+    pipeline = [
+        {'$match': {
+            'habit_id': {'$in': [ObjectId(h) for h in habit_ids]},
+            'completed_at': {'$gte': start_date, '$lt': end_date}
+        }},
+        {'$project': {'_id': 0, 't': {'$toLong': '$completed_at'}}}
+    ]
+    names = ['habit_completions']
+    if start_date < archive_cutoff('habit_completions'):
+        names.insert(0, 'habit_completions_archive')
+    return [
+        row['t']
+        for name in names
+        for row in collections[name].aggregate(pipeline, batchSize=10000)
+    ]
+
 # Daily Activity Operations
+@storage_backed
 def record_user_daily_activity(user_id, activity_date):
     """Record user daily activity (idempotent)"""
     collections = get_collections()
@@ -179,6 +557,10 @@ def record_user_daily_activity(user_id, activity_date):
             activity_datetime = activity_date
         else:  # It's a date object
             activity_datetime = datetime.combine(activity_date, datetime.min.time())
+
+        if write_buffer:
+            write_buffer.add_activity(user_id, activity_datetime)
+            return
             
         collections['user_daily_activity'].update_one(
             {'user_id': ObjectId(user_id), 'activity_date': activity_datetime},
@@ -193,21 +575,327 @@ def record_user_daily_activity(user_id, activity_date):
         )
     except Exception as e:
         print(f"Error recording daily activity: {e}")
-        pass
 
+@storage_backed
+def get_user_activity_dates(user_id):
+    """Set of dates the user was active on (only the date field is fetched)"""
+    collections = get_collections()
+    try:
+        rows = collections['user_daily_activity'].find(
+            {'user_id': ObjectId(user_id)}, {'_id': 0, 'activity_date': 1}
+        )
+        dates = {row['activity_date'].date() for row in rows}
+    except InvalidId:
+        return set()
+    if write_buffer:
+        dates.update(day.date() for day in write_buffer.pending_activity_dates(user_id))
+    return dates
+
+@storage_backed
 def get_user_daily_activities(user_id):
-    """Get all user daily activities"""
+    """Get all user daily activities (including days still in the write-behind buffer)"""
+    collections = get_collections()
+    try:
+        rows = list(collections['user_daily_activity'].find({'user_id': ObjectId(user_id)}))
+    except InvalidId:
+        return []
+    if write_buffer:
+        stored = {row['activity_date'] for row in rows}
+        rows.extend(
+            {'user_id': ObjectId(user_id), 'activity_date': day}
+            for day in write_buffer.pending_activity_dates(user_id) - stored
+        )
+    return rows
+
+# Daily Rollup Operations
+def _day_start(value):
+    """Normalize a date or datetime to midnight (UTC) as a datetime"""
+    if isinstance(value, datetime):
+        value = value.date()
+    return datetime.combine(value, datetime.min.time())
+
+@publishes(_habit_completed_event)
+@storage_backed
+def record_completion_rollup(user_id, habit_id, completed_at, met=False):
+    """Increment the (user, day) rollup for one completion of a habit; returns the habit's count that day"""
+    collections = get_collections()
+    try:
+        hid = str(ObjectId(habit_id))
+        update = {
+            '$inc': {f'counts.{hid}': 1, 'total': 1},
+            '$set': {'updated_at': datetime.utcnow()}
+        }
+        if met:
+            update['$set'][f'met.{hid}'] = True
+        rollup = collections['user_daily_rollups'].find_one_and_update(
+            {'user_id': ObjectId(user_id), 'day': _day_start(completed_at)},
+            update,
+            projection={'_id': 0, f'counts.{hid}': 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return rollup['counts'][hid]
+    except InvalidId:
+        return None
+
+@storage_backed
+def get_user_daily_rollups(user_id, start_date, end_date):
+    """Get a user's rollups for days in [start_date, end_date)"""
+    collections = get_collections()
+    try:
+        return list(collections['user_daily_rollups'].find(
+            {
+                'user_id': ObjectId(user_id),
+                'day': {'$gte': _day_start(start_date), '$lt': _day_start(end_date)}
+            },
+            {'_id': 0, 'day': 1, 'counts': 1, 'met': 1}
+        ))
+    except InvalidId:
+        return []
+
+def sum_rollup_counts(rollups, habit_id, start_date, end_date):
+    """Sum a habit's completions over already-fetched rollups in [start_date, end_date)"""
+    hid = str(habit_id)
+    return sum(
+        row.get('counts', {}).get(hid, 0)
+        for row in rollups
+        if start_date <= row['day'] < end_date
+    )
+
+@storage_backed
+def get_user_habit_totals(user_id):
+    """Get all-time completion totals per habit id (as str) from the rollups"""
     collections = get_collections()
     try:
-        return list(collections['user_daily_activity'].find({'user_id': ObjectId(user_id)}))
+        pipeline = [
+            {'$match': {'user_id': ObjectId(user_id)}},
+            {'$project': {'counts': {'$objectToArray': '$counts'}}},
+            {'$unwind': '$counts'},
+            {'$group': {'_id': '$counts.k', 'total': {'$sum': '$counts.v'}}}
+        ]
+        return {row['_id']: row['total'] for row in collections['user_daily_rollups'].aggregate(pipeline)}
     except InvalidId:
+        return {}
+
+@storage_backed
+def remove_habit_from_rollups(habit_id, user_id):
+    """Remove a habit's counters from all of a user's rollups"""
+    collections = get_collections()
+    hid = str(ObjectId(habit_id))
+    collections['user_daily_rollups'].update_many(
+        {'user_id': ObjectId(user_id), f'counts.{hid}': {'$exists': True}},
+        {'$unset': {f'counts.{hid}': '', f'met.{hid}': ''}}
+    )
+
+@storage_backed
+def rebuild_daily_rollups(user_id=None):
+    """Regenerate daily rollups from raw habit_completions (all users or one)"""
+    collections = get_collections()
+    user_filter = {'_id': ObjectId(user_id)} if user_id else {}
+    rebuilt = 0
+    for user in collections['users'].find(user_filter, {'_id': 1}):
+        uid = user['_id']
+        targets = {
+            h['_id']: h.get('target_count', 1)
+            for h in collections['habits'].find({'user_id': uid, 'deleted_at': None}, {'target_count': 1})
+        }
+        days = {}
+        if targets:
+            pipeline = [
+                {'$match': {'habit_id': {'$in': list(targets)}}},
+                {'$group': {
+                    '_id': {
+                        'habit_id': '$habit_id',
+                        'day': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$completed_at'}}
+                    },
+                    'count': {'$sum': 1}
+                }}
+            ]
+            for name in ('habit_completions_archive', 'habit_completions'):
+                for row in collections[name].aggregate(pipeline, allowDiskUse=True):
+                    day = datetime.strptime(row['_id']['day'], '%Y-%m-%d')
+                    hid = str(row['_id']['habit_id'])
+                    doc = days.setdefault(day, {'counts': {}, 'met': {}, 'total': 0})
+                    doc['counts'][hid] = doc['counts'].get(hid, 0) + row['count']
+                    doc['total'] += row['count']
+            for doc in days.values():
+                for hid, count in doc['counts'].items():
+                    if count >= targets[ObjectId(hid)]:
+                        doc['met'][hid] = True
+
+        now = datetime.utcnow()
+        collections['user_daily_rollups'].delete_many({'user_id': uid})
+        if days:
+            collections['user_daily_rollups'].bulk_write([
+                UpdateOne(
+                    {'user_id': uid, 'day': day},
+                    {'$set': dict(doc, updated_at=now)},
+                    upsert=True
+                )
+                for day, doc in days.items()
+            ], ordered=False)
+        rebuilt += len(days)
+    print(f"Rebuilt {rebuilt} daily rollups")
+    return rebuilt
+
+# Streak Maintenance
+@storage_backed
+def recompute_habit_streaks(batch_size=500, user_id=None):
+    """Recompute current/longest streaks for all habits (or one user's) in batches"""
+    collections = get_collections()
+    habit_filter = {'user_id': ObjectId(user_id)} if user_id else {}
+    habit_filter['deleted_at'] = None
+    today = datetime.utcnow().date()
+    updated = 0
+    last_id = None
+
+    while True:
+        page_filter = dict(habit_filter)
+        if last_id is not None:
+            page_filter['_id'] = {'$gt': last_id}
+        batch = list(collections['habits'].find(
+            page_filter, {'frequency': 1, 'target_count': 1}
+        ).sort('_id', 1).limit(batch_size))
+        if not batch:
+            break
+        last_id = batch[-1]['_id']
+
+        # One sorted scan of the batch's completions, grouped by habit as it streams
+        timestamps = {h['_id']: [] for h in batch}
+        for name in ('habit_completions_archive', 'habit_completions'):
+            cursor = collections[name].find(
+                {'habit_id': {'$in': list(timestamps)}},
+                {'_id': 0, 'habit_id': 1, 'completed_at': 1}
+            ).sort([('habit_id', 1), ('completed_at', 1)]).batch_size(10000)
+            for row in cursor:
+                timestamps[row['habit_id']].append(row['completed_at'])
+
+        ops = []
+        for habit in batch:
+            current, longest = compute_streaks(
+                timestamps[habit['_id']],
+                habit.get('frequency', 'daily'),
+                habit.get('target_count', 1),
+                today
+            )
+            ops.append(UpdateOne(
+                {'_id': habit['_id']},
+                {'$set': {'current_streak': current, 'longest_streak': longest}}
+            ))
+        collections['habits'].bulk_write(ops, ordered=False)
+        updated += len(ops)
+
+    print(f"Recomputed streaks for {updated} habits")
+    return updated
+
+# Reminder Operations
+@storage_backed
+def iter_daily_habits(partition=0, partitions=1):
+    """Stream (user_id, habit_id, title, target_count) of one partition's daily habits, grouped by user"""
+    collections = get_collections()
+    query = {'frequency': 'daily', 'deleted_at': None}
+    if partitions > 1:
+        query['reminder_bucket'] = {'$in': partition_buckets(partition, partitions)}
+    cursor = collections['habits'].find(
+        query, {'user_id': 1, 'title': 1, 'target_count': 1}
+    ).sort('user_id', 1).batch_size(5000)
+    for habit in cursor:
+        yield habit['user_id'], habit['_id'], habit['title'], habit.get('target_count', 1)
+
+@storage_backed
+def backfill_reminder_buckets(batch_size=1000):
+    """Store reminder_bucket on habits created before the field existed"""
+    collections = get_collections()
+    user_ids = collections['habits'].distinct('user_id', {'reminder_bucket': {'$exists': False}})
+    for i in range(0, len(user_ids), batch_size):
+        collections['habits'].bulk_write([
+            UpdateMany(
+                {'user_id': uid, 'reminder_bucket': {'$exists': False}},
+                {'$set': {'reminder_bucket': reminder_bucket(uid)}}
+            ) for uid in user_ids[i:i + batch_size]
+        ], ordered=False)
+    return len(user_ids)
+
+@storage_backed
+def get_rollups_for_day(user_ids, day):
+    """Get {user_id: counts} from the rollups of several users for one day"""
+    collections = get_collections()
+    cursor = collections['user_daily_rollups'].find(
+        {'user_id': {'$in': list(user_ids)}, 'day': _day_start(day)},
+        {'_id': 0, 'user_id': 1, 'counts': 1}
+    )
+    return {row['user_id']: row.get('counts', {}) for row in cursor}
+
+@storage_backed
+def get_claimed_reminders(user_ids, day):
+    """Get the (user_id, habit_id) pairs already claimed for a reminder on a day"""
+    collections = get_collections()
+    cursor = collections['reminder_log'].find(
+        {'user_id': {'$in': list(user_ids)}, 'day': _day_start(day)},
+        {'_id': 0, 'user_id': 1, 'habit_id': 1}
+    )
+    return {(row['user_id'], row['habit_id']) for row in cursor}
+
+@storage_backed
+def claim_reminders(pairs, day):
+    """Claim (user_id, habit_id) pairs for a day; returns only the pairs this call won.
+
+    The unique (user_id, habit_id, day) index makes the claim the idempotency
+    point: a pair is claimed once, so a restarted run never sends it again.
+    """
+    if not pairs:
         return []
+    collections = get_collections()
+    now = datetime.utcnow()
+    docs = [
+        {'user_id': uid, 'habit_id': hid, 'day': _day_start(day), 'status': 'claimed', 'created_at': now}
+        for uid, hid in pairs
+    ]
+    try:
+        collections['reminder_log'].insert_many(docs, ordered=False)
+        return list(pairs)
+    except BulkWriteError as e:
+        lost = {err['index'] for err in e.details.get('writeErrors', []) if err.get('code') == 11000}
+        failed = {err['index'] for err in e.details.get('writeErrors', [])} - lost
+        if failed:
+            print(f"Reminder claim errors: {len(failed)}")
+        return [pair for i, pair in enumerate(pairs) if i not in lost and i not in failed]
+
+@storage_backed
+def mark_reminders_sent(pairs, day):
+    """Mark claimed reminders as delivered"""
+    if not pairs:
+        return
+    collections = get_collections()
+    now = datetime.utcnow()
+    collections['reminder_log'].bulk_write([
+        UpdateOne(
+            {'user_id': uid, 'habit_id': hid, 'day': _day_start(day)},
+            {'$set': {'status': 'sent', 'sent_at': now}}
+        )
+        for uid, hid in pairs
+    ], ordered=False)
+
+@storage_backed
+def release_reminders(pairs, day):
+    """Drop unsent claims (e.g. after the sink failed) so a later run sends them"""
+    if not pairs:
+        return
+    collections = get_collections()
+    collections['reminder_log'].bulk_write([
+        DeleteOne({'user_id': uid, 'habit_id': hid, 'day': _day_start(day), 'status': 'claimed'})
+        for uid, hid in pairs
+    ], ordered=False)
 
 # User Stats Operations
+@storage_backed
 def get_or_create_user_stats(user_id):
     """Get or create user stats document"""
     collections = get_collections()
     try:
+        if write_buffer:
+            # Read-your-writes: land this user's buffered increments first
+            write_buffer.flush_user(user_id)
         stats = collections['user_stats'].find_one({'user_id': ObjectId(user_id)})
         if not stats:
             stats_doc = {
@@ -223,10 +911,14 @@ def get_or_create_user_stats(user_id):
     except InvalidId:
         return None
 
+@storage_backed
 def update_user_stats(user_id, updates):
     """Update user stats"""
     collections = get_collections()
     try:
+        if write_buffer:
+            write_buffer.add_stats(user_id, updates)
+            return
         collections['user_stats'].update_one(
             {'user_id': ObjectId(user_id)},
             {'$inc': updates},
@@ -235,7 +927,82 @@ def update_user_stats(user_id, updates):
     except InvalidId:
         pass
 
+@publishes(_streak_event)
+@storage_backed
+def raise_longest_daily_streak(user_id, streak):
+    """Raise the stored longest daily streak to the current streak `streak` (never lowers it)"""
+    collections = get_collections()
+    try:
+        if write_buffer:
+            write_buffer.raise_longest(user_id, streak)
+            return
+        collections['user_stats'].update_one(
+            {'user_id': ObjectId(user_id)},
+            {'$max': {'longest_daily_streak': streak}},
+            upsert=True
+        )
+    except InvalidId:
+        pass
+
+# Idempotency Keys
+@storage_backed
+def get_idempotency_record(key):
+    """Unexpired record of an idempotency key (status None while the first request runs)"""
+    collections = get_collections()
+    return collections['idempotency_keys'].find_one({'_id': key, 'expires_at': {'$gt': datetime.utcnow()}})
+
+@storage_backed
+def claim_idempotency_key(key, fingerprint, lease_seconds):
+    """Reserve a free (or expired) key for a request; returns the claim token, or None when another request holds it
+
+    The claim only lasts `lease_seconds`, so a worker that dies mid-request
+    blocks retries briefly; save_idempotent_response extends it to the full TTL.
+    """
+    collections = get_collections()
+    now = datetime.utcnow()
+    claim = uuid.uuid4().hex
+    try:
+        # An unexpired record fails the filter, so the upsert collides with its _id
+        collections['idempotency_keys'].update_one(
+            {'_id': key, 'expires_at': {'$lte': now}},
+            {'$set': {
+                'fingerprint': fingerprint,
+                'claim': claim,
+                'status': None,
+                'body': None,
+                'content_type': None,
+                'created_at': now,
+                'expires_at': now + timedelta(seconds=lease_seconds)
+            }},
+            upsert=True
+        )
+        return claim
+    except DuplicateKeyError:
+        return None
+
+@storage_backed
+def save_idempotent_response(key, claim, status, body, content_type, ttl_seconds):
+    """Store the response of the request holding `claim` on `key` for replays during the next `ttl_seconds`"""
+    collections = get_collections()
+    # Matching the claim leaves the key alone if a retry reclaimed it after the lease ran out
+    collections['idempotency_keys'].update_one(
+        {'_id': key, 'claim': claim},
+        {'$set': {
+            'status': status,
+            'body': body,
+            'content_type': content_type,
+            'expires_at': datetime.utcnow() + timedelta(seconds=ttl_seconds)
+        }}
+    )
+
+@storage_backed
+def release_idempotency_key(key, claim):
+    """Drop a claim whose request failed without a response, so a retry runs again"""
+    collections = get_collections()
+    collections['idempotency_keys'].delete_one({'_id': key, 'claim': claim, 'status': None})
+
 # AI Chat Operations
+@storage_backed
 def create_ai_chat_message(user_id, role, text):
     """Create an AI chat message"""
     collections = get_collections()
@@ -249,33 +1016,249 @@ def create_ai_chat_message(user_id, role, text):
     message_doc['_id'] = result.inserted_id
     return message_doc
 
-def get_ai_chat_history(user_id):
-    """Get AI chat history for a user"""
+@storage_backed
+def get_ai_chat_history(user_id, limit=None):
+    """Get AI chat history for a user (oldest first), optionally only the latest `limit` messages.
+
+    The archive is only read when the live collection does not hold enough
+    messages to answer the request.
+    """
     collections = get_collections()
     try:
-        return list(collections['ai_chat_messages'].find(
-            {'user_id': ObjectId(user_id)}
-        ).sort('created_at', 1))
+        query = {'user_id': ObjectId(user_id)}
     except InvalidId:
         return []
+    messages = list(collections['ai_chat_messages'].find(query).sort('created_at', -1).limit(limit or 0))
+    if limit is None or len(messages) < limit:
+        remaining = 0 if limit is None else limit - len(messages)
+        messages += collections['ai_chat_messages_archive'].find(query).sort('created_at', -1).limit(remaining)
+    messages.reverse()
+    return messages
+
+# Export Operations
+EXPORT_BATCH_SIZE = 1000
+
+@storage_backed
+def iter_user_habits(user_id, batch_size=EXPORT_BATCH_SIZE):
+    """Stream a user's (non-deleted) habits from a server-side cursor"""
+    collections = get_collections()
+    return collections['habits'].find(
+        {'user_id': ObjectId(user_id), 'deleted_at': None}
+    ).sort('_id', 1).batch_size(batch_size)
+
+@storage_backed
+def iter_habit_completions(habit_ids, batch_size=EXPORT_BATCH_SIZE):
+    """Stream completions of several habits, archived ones first"""
+    collections = get_collections()
+    habit_ids = [ObjectId(h) for h in habit_ids]
+    for name in ('habit_completions_archive', 'habit_completions'):
+        yield from collections[name].find(
+            {'habit_id': {'$in': habit_ids}}
+        ).sort([('habit_id', 1), ('completed_at', 1)]).batch_size(batch_size)
+
+@storage_backed
+def iter_user_daily_activities(user_id, batch_size=EXPORT_BATCH_SIZE):
+    """Stream a user's daily activity dates"""
+    collections = get_collections()
+    return collections['user_daily_activity'].find(
+        {'user_id': ObjectId(user_id)}, {'_id': 0, 'activity_date': 1}
+    ).sort('activity_date', 1).batch_size(batch_size)
+
+@storage_backed
+def iter_ai_chat_messages(user_id, batch_size=EXPORT_BATCH_SIZE):
+    """Stream a user's chat messages oldest first, archived ones first"""
+    collections = get_collections()
+    for name in ('ai_chat_messages_archive', 'ai_chat_messages'):
+        yield from collections[name].find(
+            {'user_id': ObjectId(user_id)}
+        ).sort('created_at', 1).batch_size(batch_size)
+
+# Import Operations
+@storage_backed
+def bulk_insert_habits(habit_docs):
+    """Insert prepared habit documents in one ordered bulk write"""
+    if not habit_docs:
+        return 0
+    collections = get_collections()
+    for doc in habit_docs:
+        doc.setdefault('reminder_bucket', reminder_bucket(doc['user_id']))
+    result = collections['habits'].bulk_write([InsertOne(doc) for doc in habit_docs], ordered=True)
+    return result.inserted_count
+
+@storage_backed
+def bulk_insert_completions(completion_docs):
+    """Insert prepared completion documents in one unordered bulk write"""
+    if not completion_docs:
+        return 0
+    collections = get_collections()
+    result = collections['habit_completions'].bulk_write(
+        [InsertOne(doc) for doc in completion_docs], ordered=False
+    )
+    return result.inserted_count
+
+@storage_backed
+def backdate_habits(habit_ids):
+    """Move the created_at of habits back to their earliest completion, where that is earlier"""
+    if not habit_ids:
+        return 0
+    collections = get_collections()
+    first_completions = collections['habit_completions'].aggregate([
+        {'$match': {'habit_id': {'$in': list(habit_ids)}}},
+        {'$group': {'_id': '$habit_id', 'first': {'$min': '$completed_at'}}}
+    ])
+    ops = [UpdateOne({'_id': row['_id']}, {'$min': {'created_at': row['first']}}) for row in first_completions]
+    if ops:
+        collections['habits'].bulk_write(ops, ordered=False)
+    return len(ops)
+
+def _count_met_habit_days(collections, uid):
+    # Rollups of habits awaiting purge are dropped by a rebuild, so they never count
+    live = {str(h['_id']) for h in collections['habits'].find({'user_id': uid, 'deleted_at': None}, {'_id': 1})}
+    return sum(
+        len(live.intersection(row['met'])) for row in collections['user_daily_rollups'].find(
+            {'user_id': uid, 'met': {'$exists': True, '$ne': {}}}, {'_id': 0, 'met': 1}
+        )
+    )
+
+@storage_backed
+def refresh_user_aggregates(user_id):
+    """Recompute a user's rollups, habit streaks, daily activity and longest daily streak.
+
+    Returns how many met habit-days the rebuilt rollups gained, which is what
+    total_completions counts.
+    """
+    collections = get_collections()
+    uid = ObjectId(user_id)
+    met_before = _count_met_habit_days(collections, uid)
+    rebuild_daily_rollups(uid)
+    met_added = max(0, _count_met_habit_days(collections, uid) - met_before)
+    recompute_habit_streaks(user_id=uid)
+
+    # A day counts as active once any habit met its target on it
+    active_days = [
+        row['day'] for row in collections['user_daily_rollups'].find(
+            {'user_id': uid, 'met': {'$exists': True, '$ne': {}}}, {'_id': 0, 'day': 1}
+        ).sort('day', 1)
+    ]
+    now = datetime.utcnow()
+    if active_days:
+        collections['user_daily_activity'].bulk_write([
+            UpdateOne(
+                {'user_id': uid, 'activity_date': day},
+                {'$setOnInsert': {'user_id': uid, 'activity_date': day, 'created_at': now}},
+                upsert=True
+            )
+            for day in active_days
+        ], ordered=False)
+
+    longest = longest_daily_run(sorted(get_user_activity_dates(uid)))
+    get_or_create_user_stats(uid)
+    collections['user_stats'].update_one(
+        {'user_id': uid, 'longest_daily_streak': {'$not': {'$gte': longest}}},
+        {'$set': {'longest_daily_streak': longest}}
+    )
+    return met_added
+
+# Archival
+def _ensure_rollups(batch, rebuilt):
+    """Rebuild the rollups of users whose rollups do not yet count these completions"""
+    collections = get_collections()
+    owners = {
+        h['_id']: h['user_id'] for h in collections['habits'].find(
+            {'_id': {'$in': list({doc['habit_id'] for doc in batch})}, 'deleted_at': None},
+            {'user_id': 1}
+        )
+    }
+    needed = {}
+    for doc in batch:
+        uid = owners.get(doc['habit_id'])
+        if uid is not None and uid not in rebuilt:
+            needed.setdefault(uid, set()).add((_day_start(doc['completed_at']), str(doc['habit_id'])))
+    if not needed:
+        return
+    days = {day for pairs in needed.values() for day, _ in pairs}
+    covered = {
+        (row['user_id'], row['day'], hid)
+        for row in collections['user_daily_rollups'].find(
+            {'user_id': {'$in': list(needed)}, 'day': {'$in': list(days)}},
+            {'_id': 0, 'user_id': 1, 'day': 1, 'counts': 1}
+        )
+        for hid in row.get('counts', {})
+    }
+    for uid, pairs in needed.items():
+        if any((uid, day, hid) not in covered for day, hid in pairs):
+            rebuild_daily_rollups(uid)
+        rebuilt.add(uid)
+
+def _archive_collection(name, time_field, batch_size, prepare=None):
+    """Move records older than the archive cutoff into `<name>_archive` in batches"""
+    collections = get_collections()
+    live = collections[name]
+    archive = collections[f'{name}_archive']
+    cutoff = archive_cutoff(name)
+    moved = 0
+    while True:
+        batch = list(live.find({time_field: {'$lt': cutoff}}).limit(batch_size))
+        if not batch:
+            break
+        if prepare:
+            prepare(batch)
+        # Copy first, then delete: an interrupted run leaves copies that the
+        # next run skips on the unique _id, never a lost record
+        try:
+            archive.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            if any(err.get('code') != 11000 for err in e.details.get('writeErrors', [])):
+                raise
+        live.delete_many({'_id': {'$in': [doc['_id'] for doc in batch]}})
+        moved += len(batch)
+    return moved
+
+@storage_backed
+def archive_old_records(batch_size=1000):
+    """Move old completions and chat messages into their archive collections.
+
+    Completions are only archived once the daily rollups count them; users
+    whose rollups miss a completion in a batch are rebuilt first.
+    """
+    rebuilt = set()
+    moved_completions = _archive_collection(
+        'habit_completions', 'completed_at', batch_size, partial(_ensure_rollups, rebuilt=rebuilt)
+    )
+    moved_messages = _archive_collection('ai_chat_messages', 'created_at', batch_size)
+    print(f"Archived {moved_completions} completions and {moved_messages} chat messages")
+    return moved_completions, moved_messages
 
 # Database Indexes and Migration
+@storage_backed
 def create_indexes():
     """Create database indexes for better performance"""
     collections = get_collections()
     try:
         collections['users'].create_index('username', unique=True)
         collections['users'].create_index('email', unique=True)
-        collections['habits'].create_index('user_id')
+        collections['habits'].create_index([('user_id', 1), ('deleted_at', 1)])
+        collections['habits'].create_index([('frequency', 1), ('reminder_bucket', 1), ('user_id', 1)])
+        collections['habits'].create_index('deleted_at', sparse=True)
         collections['habit_completions'].create_index('habit_id')
         collections['habit_completions'].create_index('completed_at')
+        collections['habit_completions'].create_index([('habit_id', 1), ('completed_at', 1)])
         collections['user_daily_activity'].create_index([('user_id', 1), ('activity_date', 1)], unique=True)
-        collections['ai_chat_messages'].create_index('user_id')
+        collections['ai_chat_messages'].create_index([('user_id', 1), ('created_at', 1)])
+        collections['ai_chat_messages'].create_index('created_at')
+        collections['ai_chat_messages_archive'].create_index([('user_id', 1), ('created_at', 1)])
+        collections['habit_completions_archive'].create_index([('habit_id', 1), ('completed_at', 1)])
         collections['user_stats'].create_index('user_id', unique=True)
+        collections['user_daily_rollups'].create_index([('user_id', 1), ('day', 1)], unique=True)
+        collections['reminder_log'].create_index([('user_id', 1), ('habit_id', 1), ('day', 1)], unique=True)
+        collections['reminder_log'].create_index('created_at', expireAfterSeconds=7 * 24 * 3600)
+        collections['rate_limits'].create_index('ts', expireAfterSeconds=24 * 3600)
+        collections['idempotency_keys'].create_index('expires_at', expireAfterSeconds=0)
         print("Database indexes created successfully")
     except Exception as e:
         print(f"Index creation warning: {e}")
 
+@storage_backed
 def migrate_user_stats():
     """Populate UserStats with existing data"""
     collections = get_collections()
@@ -294,6 +1277,7 @@ def migrate_user_stats():
         total_completions = 0
         for habit in user_habits:
             total_completions += collections['habit_completions'].count_documents({'habit_id': habit['_id']})
+            total_completions += collections['habit_completions_archive'].count_documents({'habit_id': habit['_id']})
         
         # Calculate longest daily streak from UserDailyActivity
         activity_rows = list(collections['user_daily_activity'].find({'user_id': user_id}))
@@ -0,0 +1,423 @@
+"""
+Async MongoDB helpers (Motor) mirroring database.py for the ASGI app
+"""
+
+import asyncio
+import uuid
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime, timedelta
+from functools import wraps
+from inspect import isawaitable
+from werkzeug.security import generate_password_hash
+from database import (
+    _day_start, archive_cutoff, _habit_created_event, _habit_updated_event,
+    _habit_deleted_event, _habit_completed_event, _streak_event
+)
+from events import create_event_bus
+from partitions import reminder_bucket
+
+# Global async client (will be initialized in the ASGI app)
+client = None
+db = None
+event_bus = None
+
+def init_async_db(mongo_uri, **client_options):
+    """Initialize the Motor client from a MongoDB URI (the database comes from the URI)"""
+    global client, db
+    client = AsyncIOMotorClient(mongo_uri, **client_options)
+    db = client.get_default_database()
+    return db
+
+def get_collections():
+    """Get all database collections"""
+    return {
+        'users': db.users,
+        'habits': db.habits,
+        'habit_completions': db.habit_completions,
+        'habit_completions_archive': db.habit_completions_archive,
+        'user_daily_activity': db.user_daily_activity,
+        'ai_chat_messages': db.ai_chat_messages,
+        'ai_chat_messages_archive': db.ai_chat_messages_archive,
+        'user_stats': db.user_stats,
+        'user_daily_rollups': db.user_daily_rollups,
+        'habit_events': db.habit_events,
+        'idempotency_keys': db.idempotency_keys
+    }
+
+def configure_events(config):
+    """Set up the event bus behind the ASGI /api/events (after init_async_db)"""
+    global event_bus
+    event_bus = create_event_bus(config, get_collections, use_async=True)
+
+def subscribe_events(user_id):
+    """Open a subscription to a user's live change events (read with `await get()`)"""
+    return event_bus.subscribe(user_id, asyncio.get_running_loop())
+
+def unsubscribe_events(subscription):
+    """Close a subscription from subscribe_events"""
+    event_bus.unsubscribe(subscription)
+
+def publishes(build_event):
+    """database.publishes for coroutines; uses the same event builders"""
+    def wrapper(fn):
+        @wraps(fn)
+        async def decorated(*args, **kwargs):
+            result = await fn(*args, **kwargs)
+            if event_bus is not None:
+                published = build_event(result, *args, **kwargs)
+                if published:
+                    sent = event_bus.publish(*published)
+                    if isawaitable(sent):
+                        await sent
+            return result
+        return decorated
+    return wrapper
+
+# User Operations
+async def create_user(username, email, password):
+    """Create a new user document"""
+    collections = get_collections()
+    user_doc = {
+        'username': username,
+        'email': email,
+        'password_hash': generate_password_hash(password),
+        'created_at': datetime.utcnow()
+    }
+    result = await collections['users'].insert_one(user_doc)
+    user_doc['_id'] = result.inserted_id
+    return user_doc
+
+async def get_user_by_username(username):
+    """Get user by username"""
+    collections = get_collections()
+    return await collections['users'].find_one({'username': username})
+
+async def get_user_by_email(email):
+    """Get user by email"""
+    collections = get_collections()
+    return await collections['users'].find_one({'email': email})
+
+async def get_user_by_id(user_id):
+    """Get user by ID"""
+    collections = get_collections()
+    try:
+        return await collections['users'].find_one({'_id': ObjectId(user_id)})
+    except InvalidId:
+        return None
+
+# Habit Operations
+@publishes(_habit_created_event)
+async def create_habit(user_id, title, description, frequency, target_count):
+    """Create a new habit document"""
+    collections = get_collections()
+    habit_doc = {
+        'title': title,
+        'description': description,
+        'frequency': frequency,
+        'target_count': target_count,
+        'current_streak': 0,
+        'longest_streak': 0,
+        'created_at': datetime.utcnow(),
+        'user_id': ObjectId(user_id),
+        'reminder_bucket': reminder_bucket(user_id)
+    }
+    result = await collections['habits'].insert_one(habit_doc)
+    habit_doc['_id'] = result.inserted_id
+    return habit_doc
+
+async def get_user_habits(user_id):
+    """Get all (non-deleted) habits for a user"""
+    collections = get_collections()
+    try:
+        return await collections['habits'].find({'user_id': ObjectId(user_id), 'deleted_at': None}).to_list(None)
+    except InvalidId:
+        return []
+
+async def get_habit_by_id(habit_id, user_id):
+    """Get habit by ID and user ID"""
+    collections = get_collections()
+    try:
+        return await collections['habits'].find_one({
+            '_id': ObjectId(habit_id),
+            'user_id': ObjectId(user_id),
+            'deleted_at': None
+        })
+    except InvalidId:
+        return None
+
+@publishes(_habit_updated_event)
+async def update_habit(habit_id, user_id, updates):
+    """Update a habit document"""
+    collections = get_collections()
+    try:
+        result = await collections['habits'].update_one(
+            {'_id': ObjectId(habit_id), 'user_id': ObjectId(user_id), 'deleted_at': None},
+            {'$set': updates}
+        )
+        return result.modified_count > 0
+    except InvalidId:
+        return False
+
+@publishes(_habit_deleted_event)
+async def delete_habit(habit_id, user_id):
+    """Soft-delete a habit; its completions are removed later by purge_deleted_habits"""
+    collections = get_collections()
+    try:
+        result = await collections['habits'].update_one(
+            {'_id': ObjectId(habit_id), 'user_id': ObjectId(user_id), 'deleted_at': None},
+            {'$set': {'deleted_at': datetime.utcnow()}}
+        )
+        return result.modified_count > 0
+    except InvalidId:
+        return False
+
+# Habit Completion Operations
+async def create_habit_completion(habit_id, notes):
+    """Create a habit completion document"""
+    collections = get_collections()
+    completion_doc = {
+        'habit_id': ObjectId(habit_id),
+        'completed_at': datetime.utcnow(),
+        'notes': notes
+    }
+    result = await collections['habit_completions'].insert_one(completion_doc)
+    return result.inserted_id
+
+async def get_habit_completions_today(habit_id):
+    """Get habit completions for today"""
+    start_of_day = _day_start(datetime.utcnow())
+    return await get_habit_completions_period(habit_id, start_of_day, start_of_day + timedelta(days=1))
+
+async def get_habit_completions_period(habit_id, start_date, end_date):
+    """Get habit completions for a period (including archived ones if it reaches that far)"""
+    collections = get_collections()
+    query = {
+        'habit_id': ObjectId(habit_id),
+        'completed_at': {'$gte': start_date, '$lt': end_date}
+    }
+    count = await collections['habit_completions'].count_documents(query)
+    if start_date < archive_cutoff('habit_completions'):
+        count += await collections['habit_completions_archive'].count_documents(query)
+    return count
+
+async def get_completion_timestamps(habit_ids, start_date, end_date):
+    """Get completion times (epoch milliseconds) for habits in [start_date, end_date)"""
+    collections = get_collections()
+    pipeline = [
+        {'$match': {
+            'habit_id': {'$in': [ObjectId(h) for h in habit_ids]},
+            'completed_at': {'$gte': start_date, '$lt': end_date}
+        }},
+        {'$project': {'_id': 0, 't': {'$toLong': '$completed_at'}}}
+    ]
+    names = ['habit_completions']
+    if start_date < archive_cutoff('habit_completions'):
+        names.insert(0, 'habit_completions_archive')
+    timestamps = []
+    for name in names:
+        timestamps += [row['t'] async for row in collections[name].aggregate(pipeline, batchSize=10000)]
+    return timestamps
+
+# Daily Activity Operations
+async def record_user_daily_activity(user_id, activity_date):
+    """Record user daily activity (idempotent)"""
+    collections = get_collections()
+    try:
+        activity_datetime = _day_start(activity_date)
+        await collections['user_daily_activity'].update_one(
+            {'user_id': ObjectId(user_id), 'activity_date': activity_datetime},
+            {
+                '$set': {
+                    'user_id': ObjectId(user_id),
+                    'activity_date': activity_datetime,
+                    'created_at': datetime.utcnow()
+                }
+            },
+            upsert=True
+        )
+    except Exception as e:
+        print(f"Error recording daily activity: {e}")
+
+async def get_user_daily_activities(user_id):
+    """Get all user daily activities"""
+    collections = get_collections()
+    try:
+        return await collections['user_daily_activity'].find({'user_id': ObjectId(user_id)}).to_list(None)
+    except InvalidId:
+        return []
+
+# Daily Rollup Operations
+@publishes(_habit_completed_event)
+async def record_completion_rollup(user_id, habit_id, completed_at, met=False):
+    """Increment the (user, day) rollup for one completion of a habit; returns the habit's count that day"""
+    collections = get_collections()
+    try:
+        hid = str(ObjectId(habit_id))
+        update = {
+            '$inc': {f'counts.{hid}': 1, 'total': 1},
+            '$set': {'updated_at': datetime.utcnow()}
+        }
+        if met:
+            update['$set'][f'met.{hid}'] = True
+        rollup = await collections['user_daily_rollups'].find_one_and_update(
+            {'user_id': ObjectId(user_id), 'day': _day_start(completed_at)},
+            update,
+            projection={'_id': 0, f'counts.{hid}': 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return rollup['counts'][hid]
+    except InvalidId:
+        return None
+
+async def get_user_daily_rollups(user_id, start_date, end_date):
+    """Get a user's rollups for days in [start_date, end_date)"""
+    collections = get_collections()
+    try:
+        return await collections['user_daily_rollups'].find(
+            {
+                'user_id': ObjectId(user_id),
+                'day': {'$gte': _day_start(start_date), '$lt': _day_start(end_date)}
+            },
+            {'_id': 0, 'day': 1, 'counts': 1, 'met': 1}
+        ).to_list(None)
+    except InvalidId:
+        return []
+
+async def get_user_habit_totals(user_id):
+    """Get all-time completion totals per habit id (as str) from the rollups"""
+    collections = get_collections()
+    try:
+        pipeline = [
+            {'$match': {'user_id': ObjectId(user_id)}},
+            {'$project': {'counts': {'$objectToArray': '$counts'}}},
+            {'$unwind': '$counts'},
+            {'$group': {'_id': '$counts.k', 'total': {'$sum': '$counts.v'}}}
+        ]
+        return {row['_id']: row['total'] async for row in collections['user_daily_rollups'].aggregate(pipeline)}
+    except InvalidId:
+        return {}
+
+# User Stats Operations
+async def get_or_create_user_stats(user_id):
+    """Get or create user stats document"""
+    collections = get_collections()
+    try:
+        return await collections['user_stats'].find_one_and_update(
+            {'user_id': ObjectId(user_id)},
+            {'$setOnInsert': {
+                'total_habits_created': 0,
+                'total_completions': 0,
+                'longest_daily_streak': 0
+            }},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except InvalidId:
+        return None
+
+async def update_user_stats(user_id, updates):
+    """Update user stats"""
+    collections = get_collections()
+    try:
+        await collections['user_stats'].update_one(
+            {'user_id': ObjectId(user_id)},
+            {'$inc': updates},
+            upsert=True
+        )
+    except InvalidId:
+        pass
+
+@publishes(_streak_event)
+async def raise_longest_daily_streak(user_id, streak):
+    """Raise the stored longest daily streak to `streak` (never lowers it)"""
+    collections = get_collections()
+    try:
+        await collections['user_stats'].update_one(
+            {'user_id': ObjectId(user_id)},
+            {'$max': {'longest_daily_streak': streak}},
+            upsert=True
+        )
+    except InvalidId:
+        pass
+
+# Idempotency Keys
+async def get_idempotency_record(key):
+    """Unexpired record of an idempotency key (status None while the first request runs)"""
+    collections = get_collections()
+    return await collections['idempotency_keys'].find_one({'_id': key, 'expires_at': {'$gt': datetime.utcnow()}})
+
+async def claim_idempotency_key(key, fingerprint, lease_seconds):
+    """Reserve a free (or expired) key for `lease_seconds`; returns the claim token, or None when another request holds it"""
+    collections = get_collections()
+    now = datetime.utcnow()
+    claim = uuid.uuid4().hex
+    try:
+        # An unexpired record fails the filter, so the upsert collides with its _id
+        await collections['idempotency_keys'].update_one(
+            {'_id': key, 'expires_at': {'$lte': now}},
+            {'$set': {
+                'fingerprint': fingerprint,
+                'claim': claim,
+                'status': None,
+                'body': None,
+                'content_type': None,
+                'created_at': now,
+                'expires_at': now + timedelta(seconds=lease_seconds)
+            }},
+            upsert=True
+        )
+        return claim
+    except DuplicateKeyError:
+        return None
+
+async def save_idempotent_response(key, claim, status, body, content_type, ttl_seconds):
+    """Store the response of the request holding `claim` on `key` for replays during the next `ttl_seconds`"""
+    collections = get_collections()
+    # Matching the claim leaves the key alone if a retry reclaimed it after the lease ran out
+    await collections['idempotency_keys'].update_one(
+        {'_id': key, 'claim': claim},
+        {'$set': {
+            'status': status,
+            'body': body,
+            'content_type': content_type,
+            'expires_at': datetime.utcnow() + timedelta(seconds=ttl_seconds)
+        }}
+    )
+
+async def release_idempotency_key(key, claim):
+    """Drop a claim whose request failed without a response, so a retry runs again"""
+    collections = get_collections()
+    await collections['idempotency_keys'].delete_one({'_id': key, 'claim': claim, 'status': None})
+
+# AI Chat Operations
+async def create_ai_chat_message(user_id, role, text):
+    """Create an AI chat message"""
+    collections = get_collections()
+    message_doc = {
+        'user_id': ObjectId(user_id),
+        'role': role,
+        'text': text,
+        'created_at': datetime.utcnow()
+    }
+    result = await collections['ai_chat_messages'].insert_one(message_doc)
+    message_doc['_id'] = result.inserted_id
+    return message_doc
+
+async def get_ai_chat_history(user_id, limit=None):
+    """Get AI chat history for a user (oldest first), reading the archive only when needed"""
+    collections = get_collections()
+    try:
+        query = {'user_id': ObjectId(user_id)}
+    except InvalidId:
+        return []
+    messages = await collections['ai_chat_messages'].find(query).sort('created_at', -1).limit(limit or 0).to_list(None)
+    if limit is None or len(messages) < limit:
+        remaining = 0 if limit is None else limit - len(messages)
+        messages += await collections['ai_chat_messages_archive'].find(query).sort('created_at', -1).limit(remaining).to_list(None)
+    messages.reverse()
+    return messages
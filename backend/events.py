@@ -0,0 +1,276 @@
+"""
+Per-user live change events for the /api/events stream
+
+The write helpers in database.py publish small events (a habit's new
+`today_completions`, streak values, created/updated/deleted habits) to the
+user's subscribers, so open tabs and devices can patch their state instead of
+re-fetching everything.
+
+Backends:
+- memory: subscribers in this process only. Good for a single worker.
+- mongo: events are inserted into a capped collection and every worker tails
+  it, so a stream served by one worker sees writes made on another.
+
+Delivery is best effort. A subscriber that falls more than `queue_size` events
+behind is sent one `resync` event and should reload its state. Clients should
+also reload after reconnecting, since events are not replayed.
+
+Streams authenticate with a stream token rather than the access token, since
+EventSource can only send it in the URL. The token is signed with the app's
+SECRET_KEY under its own salt, expires after EVENTS_TOKEN_TTL_SECONDS and is
+accepted nowhere else.
+"""
+
+import asyncio
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+STREAM_TOKEN_SALT = 'habit-events-stream'
+
+def create_stream_token(secret_key, user_id):
+    """Token that opens the user's event stream (and nothing else)"""
+    return URLSafeTimedSerializer(secret_key, salt=STREAM_TOKEN_SALT).dumps(str(user_id))
+
+def read_stream_token(secret_key, token, max_age):
+    """User id of a valid stream token at most `max_age` seconds old, or None"""
+    try:
+        return URLSafeTimedSerializer(secret_key, salt=STREAM_TOKEN_SALT).loads(token, max_age=max_age)
+    except BadSignature:  # Includes expired tokens
+        return None
+
+class StreamLimitError(Exception):
+    """Too many open streams for the user or this process"""
+
+class Subscription:
+    """One open stream's queue of events"""
+
+    def __init__(self, user_id, queue_size):
+        self.user_id = str(user_id)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def put(self, event):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # The client has missed events; tell it to reload instead of queueing without bound
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Next event, a resync marker after an overflow, or None after `timeout` seconds"""
+        if self.overflowed:
+            self.overflowed = False
+            with self.queue.mutex:
+                self.queue.queue.clear()
+            return {'type': 'resync'}
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+class AsyncSubscription(Subscription):
+    """Subscription read from an event loop; events may be put from any thread"""
+
+    def __init__(self, user_id, queue_size, loop):
+        self.user_id = str(user_id)
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+        self.loop = loop
+
+    def put(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            pass  # The loop has closed
+
+    def _put(self, event):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout):
+        if self.overflowed:
+            self.overflowed = False
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            return {'type': 'resync'}
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class EventBus:
+    """In-process fan-out of events to the subscriptions of each user"""
+
+    def __init__(self, queue_size=100, max_streams_per_user=None, max_streams=None):
+        self.queue_size = queue_size
+        self.max_streams_per_user = max_streams_per_user
+        self.max_streams = max_streams
+        self._subscribers = {}  # user_id -> set of Subscription
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id, loop=None):
+        """Open a subscription; pass the running loop to read it with `await get()`"""
+        if loop is not None:
+            subscription = AsyncSubscription(user_id, self.queue_size, loop)
+        else:
+            subscription = Subscription(user_id, self.queue_size)
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id, set())
+            if self.max_streams_per_user and len(subscribers) >= self.max_streams_per_user:
+                raise StreamLimitError('Too many open event streams for this user')
+            if self.max_streams and self._count >= self.max_streams:
+                raise StreamLimitError('Too many open event streams')
+            subscribers.add(subscription)
+            self._subscribers[subscription.user_id] = subscribers
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers and subscription in subscribers:
+                subscribers.discard(subscription)
+                self._count -= 1
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def publish(self, user_id, event):
+        self.deliver(str(user_id), event)
+
+    def deliver(self, user_id, event):
+        """Hand an event to this process's subscriptions for `user_id`"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+class MongoEventBus(EventBus):
+    """EventBus whose events travel through a capped collection shared by all workers"""
+
+    def __init__(self, collection, collection_size=16 * 1024 * 1024, **kwargs):
+        super().__init__(**kwargs)
+        self.collection = collection
+        self.collection_size = collection_size
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def publish(self, user_id, event):
+        # Local subscribers receive it from the tailing thread like everyone else's
+        try:
+            self.collection.insert_one({'user_id': str(user_id), 'event': event, 'ts': datetime.utcnow()})
+        except PyMongoError as e:
+            print(f"Error publishing event: {e}")
+
+    def subscribe(self, user_id, loop=None):
+        self._ensure_thread()
+        return super().subscribe(user_id, loop)
+
+    def _ensure_thread(self):
+        # Started lazily (and again in forked workers) so it never runs before a fork
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._create_collection()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._tail, name='event-tail', daemon=True)
+            self._thread.start()
+
+    def _create_collection(self):
+        try:
+            self.collection.database.create_collection(
+                self.collection.name, capped=True, size=self.collection_size
+            )
+        except CollectionInvalid:
+            pass  # Already exists
+
+    def _tail(self):
+        # Only events published after this worker started tailing are delivered
+        last = self.collection.find_one({}, sort=[('$natural', -1)], projection={'_id': 1})
+        last_id = last['_id'] if last else None
+        while True:
+            try:
+                query = {'_id': {'$gt': last_id}} if last_id else {}
+                cursor = self.collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    # Each pass ends when the server's await times out with no new events
+                    for doc in cursor:
+                        last_id = doc['_id']
+                        self.deliver(doc['user_id'], doc['event'])
+            except Exception as e:
+                print(f"Event tail error: {e}")
+            # A tailable cursor on an empty collection (or after an error) dies at once
+            time.sleep(1)
+
+class AsyncMongoEventBus(EventBus):
+    """MongoEventBus for the ASGI app: Motor collection, tailed by a task on the serving loop"""
+
+    def __init__(self, collection, collection_size=16 * 1024 * 1024, **kwargs):
+        super().__init__(**kwargs)
+        self.collection = collection
+        self.collection_size = collection_size
+        self._task = None
+
+    async def publish(self, user_id, event):
+        try:
+            await self.collection.insert_one({'user_id': str(user_id), 'event': event, 'ts': datetime.utcnow()})
+        except PyMongoError as e:
+            print(f"Error publishing event: {e}")
+
+    def subscribe(self, user_id, loop=None):
+        loop = loop or asyncio.get_running_loop()
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._tail())
+        return super().subscribe(user_id, loop)
+
+    async def _tail(self):
+        try:
+            await self.collection.database.create_collection(
+                self.collection.name, capped=True, size=self.collection_size
+            )
+        except CollectionInvalid:
+            pass  # Already exists
+        last = await self.collection.find_one({}, sort=[('$natural', -1)], projection={'_id': 1})
+        last_id = last['_id'] if last else None
+        while True:
+            try:
+                query = {'_id': {'$gt': last_id}} if last_id else {}
+                cursor = self.collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    async for doc in cursor:
+                        last_id = doc['_id']
+                        self.deliver(doc['user_id'], doc['event'])
+            except Exception as e:
+                print(f"Event tail error: {e}")
+            await asyncio.sleep(1)
+
+def create_event_bus(config, collections_fn, use_async=False):
+    """Build the event bus from app config (use_async: for the ASGI app's Motor collections)"""
+    backend_name = config.get('EVENTS_BACKEND', 'memory')
+    options = {
+        'queue_size': int(config.get('EVENTS_QUEUE_SIZE', 100)),
+        'max_streams_per_user': int(config.get('EVENTS_MAX_STREAMS_PER_USER', 5)) or None,
+        # Streams hold a thread in the Flask app; on the event loop they are cheap
+        'max_streams': None if use_async else int(config.get('EVENTS_MAX_STREAMS', 32)) or None
+    }
+    if backend_name == 'mongo':
+        bus_class = AsyncMongoEventBus if use_async else MongoEventBus
+        return bus_class(collections_fn()['habit_events'], **options)
+    if backend_name == 'memory':
+        return EventBus(**options)
+    raise ValueError(f"Unknown events backend: {backend_name}")
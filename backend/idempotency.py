@@ -0,0 +1,120 @@
+"""
+Idempotency-Key support for non-idempotent POST endpoints
+
+A client that retries a request sends the same `Idempotency-Key` header.
+The first request with a key runs the view and stores its response. The
+stored record lives in the TTL-indexed `idempotency_keys` collection.
+Retries with the same key are answered from that record by one lookup on
+`_id` and do not run the view again. Keys are scoped to the user and expire
+after IDEMPOTENCY_TTL_HOURS.
+
+- Same key but a different method, path or body: 422.
+- Same key while the first request is still running: 409 with Retry-After.
+- A 5xx response or an exception is not stored, so a retry runs again.
+
+The running request holds the key for IDEMPOTENCY_LEASE_SECONDS only. Its
+stored response then keeps the key for the full TTL. A request whose worker
+died therefore blocks retries for about a minute, not a day.
+idempotency_async.py applies the same rules to the ASGI routes.
+"""
+
+import hashlib
+from functools import wraps
+from database import (
+    get_idempotency_record, claim_idempotency_key, save_idempotent_response, release_idempotency_key
+)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+def fingerprint(method, path, body):
+    """Hash of what makes two requests the same operation"""
+    digest = hashlib.sha256()
+    digest.update(method.encode())
+    digest.update(b'\0' + path.encode() + b'\0')
+    digest.update(body)
+    return digest.hexdigest()
+
+def request_fingerprint(request):
+    return fingerprint(request.method, request.path, request.get_data())
+
+def lease_and_ttl(config):
+    """(seconds a running request holds its key, seconds a stored response is kept)"""
+    return (
+        float(config.get('IDEMPOTENCY_LEASE_SECONDS', 60)),
+        float(config.get('IDEMPOTENCY_TTL_HOURS', 24)) * 3600
+    )
+
+def key_error(raw_key):
+    """(body, status) for an unusable Idempotency-Key header, or None"""
+    if len(raw_key) > MAX_KEY_LENGTH:
+        return {'error': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters'}, 400
+    return None
+
+def replay_error(record, request_fingerprint):
+    """(body, status, headers) when a claimed key cannot be replayed for this request, or None"""
+    if record['fingerprint'] != request_fingerprint:
+        return {'error': f'{IDEMPOTENCY_HEADER} was already used for a different request'}, 422, {}
+    if record['status'] is None:
+        return {'error': 'A request with this Idempotency-Key is still in progress'}, 409, {'Retry-After': '1'}
+    return None
+
+def log_save_error(key, error):
+    # The view has committed, so its response still goes out; a retry runs it again
+    print(f"Error storing idempotent response for {key}: {error}")
+
+def idempotent():
+    """Honor Idempotency-Key on a Flask view (placed under @jwt_required())"""
+    def wrapper(fn):
+        @wraps(fn)
+        def decorated(*args, **kwargs):
+            from flask import current_app, request, jsonify, make_response
+            from flask_jwt_extended import get_jwt_identity
+            raw_key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not raw_key:
+                return fn(*args, **kwargs)
+            error = key_error(raw_key)
+            if error:
+                body, status = error
+                return jsonify(body), status
+
+            key = f'{get_jwt_identity()}:{raw_key}'
+            request_hash = request_fingerprint(request)
+            record = get_idempotency_record(key)
+            if record is None:
+                lease_seconds, ttl_seconds = lease_and_ttl(current_app.config)
+                claim = claim_idempotency_key(key, request_hash, lease_seconds)
+                if claim:
+                    return _run_and_store(fn, args, kwargs, key, claim, ttl_seconds, make_response)
+                # Another request claimed the key first
+                record = get_idempotency_record(key) or {'fingerprint': request_hash, 'status': None}
+
+            error = replay_error(record, request_hash)
+            if error:
+                body, status, headers = error
+                return jsonify(body), status, headers
+            response = current_app.response_class(
+                record['body'], status=record['status'], content_type=record['content_type']
+            )
+            response.headers[REPLAYED_HEADER] = 'true'
+            return response
+        return decorated
+    return wrapper
+
+def _run_and_store(fn, args, kwargs, key, claim, ttl_seconds, make_response):
+    try:
+        response = make_response(fn(*args, **kwargs))
+    except Exception:
+        release_idempotency_key(key, claim)
+        raise
+    if response.status_code >= 500:
+        release_idempotency_key(key, claim)
+        return response
+    try:
+        save_idempotent_response(
+            key, claim, response.status_code, response.get_data(as_text=True), response.content_type, ttl_seconds
+        )
+    except Exception as e:
+        log_save_error(key, e)
+    return response
@@ -0,0 +1,65 @@
+"""
+Idempotency-Key support for the ASGI app's POST endpoints (see idempotency.py)
+"""
+
+from functools import wraps
+from quart import current_app, jsonify, make_response, request
+from jwt_async import get_jwt_identity
+from database_async import (
+    get_idempotency_record, claim_idempotency_key, save_idempotent_response, release_idempotency_key
+)
+from idempotency import (
+    IDEMPOTENCY_HEADER, REPLAYED_HEADER, fingerprint, lease_and_ttl, key_error, replay_error, log_save_error
+)
+
+def idempotent():
+    """Honor Idempotency-Key on a Quart view (placed under @jwt_required())"""
+    def wrapper(fn):
+        @wraps(fn)
+        async def decorated(*args, **kwargs):
+            raw_key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not raw_key:
+                return await fn(*args, **kwargs)
+            error = key_error(raw_key)
+            if error:
+                body, status = error
+                return jsonify(body), status
+
+            key = f'{get_jwt_identity()}:{raw_key}'
+            request_hash = fingerprint(request.method, request.path, await request.get_data())
+            record = await get_idempotency_record(key)
+            if record is None:
+                lease_seconds, ttl_seconds = lease_and_ttl(current_app.config)
+                claim = await claim_idempotency_key(key, request_hash, lease_seconds)
+                if claim:
+                    return await _run_and_store(fn, args, kwargs, key, claim, ttl_seconds)
+                # Another request claimed the key first
+                record = await get_idempotency_record(key) or {'fingerprint': request_hash, 'status': None}
+
+            error = replay_error(record, request_hash)
+            if error:
+                body, status, headers = error
+                return jsonify(body), status, headers
+            response = current_app.response_class(
+                record['body'], status=record['status'], content_type=record['content_type']
+            )
+            response.headers[REPLAYED_HEADER] = 'true'
+            return response
+        return decorated
+    return wrapper
+
+async def _run_and_store(fn, args, kwargs, key, claim, ttl_seconds):
+    try:
+        response = await make_response(await fn(*args, **kwargs))
+    except Exception:
+        await release_idempotency_key(key, claim)
+        raise
+    if response.status_code >= 500:
+        await release_idempotency_key(key, claim)
+        return response
+    try:
+        body = await response.get_data(as_text=True)
+        await save_idempotent_response(key, claim, response.status_code, body, response.content_type, ttl_seconds)
+    except Exception as e:
+        log_save_error(key, e)
+    return response
@@ -0,0 +1,59 @@
+"""
+JWT handling for the ASGI app, compatible with Flask-JWT-Extended access tokens
+"""
+
+import uuid
+from datetime import datetime, timezone
+from functools import wraps
+import jwt
+from quart import current_app, g, jsonify, request
+
+def create_access_token(identity):
+    """Create an access token with the same claims Flask-JWT-Extended issues"""
+    now = datetime.now(timezone.utc)
+    payload = {
+        'fresh': False,
+        'iat': now,
+        'jti': str(uuid.uuid4()),
+        'type': 'access',
+        'sub': identity,
+        'nbf': now,
+        'exp': now + current_app.config['JWT_ACCESS_TOKEN_EXPIRES']
+    }
+    return jwt.encode(
+        payload,
+        current_app.config['JWT_SECRET_KEY'],
+        algorithm=current_app.config['JWT_ALGORITHM']
+    )
+
+def jwt_required():
+    """Require a valid `Authorization: Bearer <JWT>` header on an async view"""
+    def wrapper(fn):
+        @wraps(fn)
+        async def decorated(*args, **kwargs):
+            header = request.headers.get('Authorization')
+            if not header:
+                return jsonify({'msg': 'Missing Authorization Header'}), 401
+            parts = header.split()
+            if len(parts) != 2 or parts[0] != 'Bearer':
+                return jsonify({'msg': "Bad Authorization header. Expected 'Authorization: Bearer <JWT>'"}), 422
+            try:
+                claims = jwt.decode(
+                    parts[1],
+                    current_app.config['JWT_SECRET_KEY'],
+                    algorithms=[current_app.config['JWT_ALGORITHM']]
+                )
+            except jwt.ExpiredSignatureError:
+                return jsonify({'msg': 'Token has expired'}), 401
+            except jwt.InvalidTokenError as e:
+                return jsonify({'msg': str(e)}), 422
+            if claims.get('type') != 'access':
+                return jsonify({'msg': 'Only non-refresh tokens are allowed'}), 422
+            g.jwt_identity = claims['sub']
+            return await fn(*args, **kwargs)
+        return decorated
+    return wrapper
+
+def get_jwt_identity():
+    """Identity (user id) of the current request's token"""
+    return g.get('jwt_identity')
@@ -0,0 +1,25 @@
+"""
+Stable user-id hash buckets for splitting background work across workers
+
+Habits store their user's `reminder_bucket`. A worker that owns partition
+`p` of `n` can then select its users with an indexed query on the buckets
+`b % n == p`, instead of reading every user and hashing in Python. The
+bucket count is fixed, so the stored value stays valid for any number of
+workers.
+"""
+
+import zlib
+
+REMINDER_BUCKETS = 1024
+
+def reminder_bucket(user_id):
+    """Bucket of a user (same in every process and run)"""
+    return zlib.crc32(str(user_id).encode('ascii')) % REMINDER_BUCKETS
+
+def partition_buckets(partition, partitions):
+    """Buckets owned by `partition` out of `partitions`"""
+    return [b for b in range(REMINDER_BUCKETS) if b % partitions == partition]
+
+def partition_of(user_id, partitions):
+    """Partition number of a user"""
+    return reminder_bucket(user_id) % partitions
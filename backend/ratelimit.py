@@ -0,0 +1,241 @@
+"""
+Token-bucket rate limiting for the AI endpoints (per user and global)
+"""
+
+import math
+import threading
+import time
+from functools import wraps
+from pymongo import ReturnDocument
+
+PERIODS = {
+    'second': 1,
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400
+}
+
+def parse_limit(value):
+    """Parse '10/minute' (or '10/60' seconds) into (capacity, refill tokens per second)"""
+    count, _, period = value.partition('/')
+    seconds = PERIODS.get(period.strip().lower()) or float(period)
+    capacity = int(count)
+    return capacity, capacity / seconds
+
+class LimitResult:
+    """Outcome of taking one token from a bucket"""
+    __slots__ = ('allowed', 'limit', 'remaining', 'reset', 'retry_after')
+
+    def __init__(self, allowed, limit, tokens, rate):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = max(0, int(tokens))
+        # Seconds until the bucket is full again, and until the next token
+        self.reset = math.ceil((limit - tokens) / rate) if tokens < limit else 0
+        self.retry_after = 0 if allowed else max(1, math.ceil((1 - tokens) / rate))
+
+# Backends
+class MemoryBackend:
+    """Buckets in process memory; limits hold per worker process only"""
+
+    # Seconds between sweeps of buckets that have refilled completely
+    SWEEP_INTERVAL = 60
+
+    def __init__(self):
+        self._buckets = {}  # key -> (tokens, last update, time it is full again)
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + self.SWEEP_INTERVAL
+
+    def consume(self, key, capacity, rate):
+        now = time.monotonic()
+        with self._lock:
+            tokens, last, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - last) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            if now >= self._next_sweep:
+                self._sweep(now)
+        return LimitResult(allowed, capacity, tokens, rate)
+
+    def refund(self, key, capacity, rate):
+        """Give back a token taken by consume()"""
+        now = time.monotonic()
+        with self._lock:
+            if key in self._buckets:
+                tokens, last, _ = self._buckets[key]
+                tokens = min(capacity, tokens + (now - last) * rate + 1)
+                self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+
+    def _sweep(self, now):
+        # A full bucket is the same as a missing one, so idle users do not pile up
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[2] > now}
+        self._next_sweep = now + self.SWEEP_INTERVAL
+
+def _bucket_pipeline(capacity, rate):
+    """Update pipeline that refills and takes a token atomically, using the server clock"""
+    elapsed = {'$divide': [{'$subtract': ['$$NOW', {'$ifNull': ['$ts', '$$NOW']}]}, 1000]}
+    return [
+        {'$set': {
+            'tokens': {'$min': [capacity, {'$add': [
+                {'$ifNull': ['$tokens', capacity]},
+                {'$multiply': [elapsed, rate]}
+            ]}]},
+            'ts': '$$NOW'
+        }},
+        {'$set': {'allowed': {'$gte': ['$tokens', 1]}}},
+        {'$set': {'tokens': {'$cond': ['$allowed', {'$subtract': ['$tokens', 1]}, '$tokens']}}}
+    ]
+
+def _refund_pipeline(capacity):
+    """Update pipeline that gives back one token"""
+    return [{'$set': {'tokens': {'$min': [capacity, {'$add': ['$tokens', 1]}]}}}]
+
+class MongoBackend:
+    """Buckets in a MongoDB collection so limits hold across workers"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def consume(self, key, capacity, rate):
+        doc = self.collection.find_one_and_update(
+            {'_id': key},
+            _bucket_pipeline(capacity, rate),
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return LimitResult(doc['allowed'], capacity, doc['tokens'], rate)
+
+    def refund(self, key, capacity, rate):
+        """Give back a token taken by consume()"""
+        self.collection.update_one({'_id': key}, _refund_pipeline(capacity))
+
+class AsyncMongoBackend(MongoBackend):
+    """MongoBackend over a Motor collection"""
+
+    async def consume(self, key, capacity, rate):
+        doc = await self.collection.find_one_and_update(
+            {'_id': key},
+            _bucket_pipeline(capacity, rate),
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return LimitResult(doc['allowed'], capacity, doc['tokens'], rate)
+
+    async def refund(self, key, capacity, rate):
+        await self.collection.update_one({'_id': key}, _refund_pipeline(capacity))
+
+class RateLimiter:
+    """Per-user and global token buckets sharing one backend"""
+
+    def __init__(self, backend, user_limit, global_limit, enabled=True):
+        self.backend = backend
+        self.user_limit = parse_limit(user_limit)
+        self.global_limit = parse_limit(global_limit)
+        self.enabled = enabled
+
+    def _keys(self, scope, user_id):
+        return (f'{scope}:user:{user_id}', self.user_limit), (f'{scope}:global', self.global_limit)
+
+    def hit(self, scope, user_id):
+        """Take a token from the user's bucket, then the global one; returns the deciding result.
+
+        A user who is over their own limit never touches the global bucket.
+        If the global bucket is empty, the user's token is given back, so
+        requests rejected globally do not count against the user.
+        """
+        (user_key, user_limit), (global_key, global_limit) = self._keys(scope, user_id)
+        result = self.backend.consume(user_key, *user_limit)
+        if not result.allowed:
+            return result
+        global_result = self.backend.consume(global_key, *global_limit)
+        if not global_result.allowed:
+            self.backend.refund(user_key, *user_limit)
+            return global_result
+        return result
+
+    async def hit_async(self, scope, user_id):
+        """hit() for async backends"""
+        (user_key, user_limit), (global_key, global_limit) = self._keys(scope, user_id)
+        consume = self.backend.consume
+        result = await _maybe_await(consume(user_key, *user_limit))
+        if not result.allowed:
+            return result
+        global_result = await _maybe_await(consume(global_key, *global_limit))
+        if not global_result.allowed:
+            await _maybe_await(self.backend.refund(user_key, *user_limit))
+            return global_result
+        return result
+
+async def _maybe_await(value):
+    if hasattr(value, '__await__'):
+        return await value
+    return value
+
+def create_rate_limiter(config, collection=None, use_async=False):
+    """Build a RateLimiter from app config; `collection` backs the shared (mongo) backend"""
+    backend_name = config.get('RATE_LIMIT_BACKEND', 'memory')
+    if backend_name == 'mongo':
+        backend = AsyncMongoBackend(collection) if use_async else MongoBackend(collection)
+    elif backend_name == 'memory':
+        backend = MemoryBackend()
+    else:
+        raise ValueError(f"Unknown rate limit backend: {backend_name}")
+    return RateLimiter(
+        backend,
+        config.get('AI_USER_RATE_LIMIT', '10/minute'),
+        config.get('AI_GLOBAL_RATE_LIMIT', '300/minute'),
+        enabled=config.get('RATE_LIMIT_ENABLED', True)
+    )
+
+def rate_limit_headers(result):
+    """Standard RateLimit-* headers (plus Retry-After when rejected)"""
+    headers = {
+        'RateLimit-Limit': str(result.limit),
+        'RateLimit-Remaining': str(result.remaining),
+        'RateLimit-Reset': str(result.reset)
+    }
+    if not result.allowed:
+        headers['Retry-After'] = str(result.retry_after)
+    return headers
+
+RATE_LIMITED_BODY = {'error': 'Too many AI requests. Please slow down and try again shortly.'}
+
+def rate_limited(scope='ai'):
+    """Limit a Flask view (placed under @jwt_required()) with the app's RateLimiter"""
+    def wrapper(fn):
+        @wraps(fn)
+        def decorated(*args, **kwargs):
+            from flask import current_app, jsonify, make_response
+            from flask_jwt_extended import get_jwt_identity
+            limiter = current_app.extensions.get('rate_limiter')
+            if not limiter or not limiter.enabled:
+                return fn(*args, **kwargs)
+            result = limiter.hit(scope, get_jwt_identity())
+            if not result.allowed:
+                return jsonify(RATE_LIMITED_BODY), 429, rate_limit_headers(result)
+            response = make_response(fn(*args, **kwargs))
+            response.headers.extend(rate_limit_headers(result))
+            return response
+        return decorated
+    return wrapper
+
+def rate_limited_async(scope='ai'):
+    """Limit a Quart view (placed under @jwt_required()) with the app's RateLimiter"""
+    def wrapper(fn):
+        @wraps(fn)
+        async def decorated(*args, **kwargs):
+            from quart import current_app, jsonify, make_response
+            from jwt_async import get_jwt_identity
+            limiter = current_app.extensions.get('rate_limiter')
+            if not limiter or not limiter.enabled:
+                return await fn(*args, **kwargs)
+            result = await limiter.hit_async(scope, get_jwt_identity())
+            if not result.allowed:
+                return jsonify(RATE_LIMITED_BODY), 429, rate_limit_headers(result)
+            response = await make_response(await fn(*args, **kwargs))
+            response.headers.extend(rate_limit_headers(result))
+            return response
+        return decorated
+    return wrapper
@@ -0,0 +1,371 @@
+"""
+Local habit recommendations: a curated catalog with an inverted keyword index
+and fuzzy matching, consulted before Gemini
+
+Habits Gemini generates are remembered for the user they were generated
+for. They join the shared catalog only after PROMOTE_AFTER_USERS different
+users were given the same title, so one user's prompts cannot shape what
+everyone else is recommended.
+"""
+
+import difflib
+import re
+import threading
+from collections import OrderedDict
+
+# (title, description, target_count, keywords)
+CATALOG = [
+    ('Drink Water', 'Drink a glass of water regularly through the day', 8,
+     'water hydrate hydration drink thirst health'),
+    ('Morning Walk', 'Take a 20 minute walk after waking up', 1,
+     'walk walking morning steps outside fitness exercise'),
+    ('10,000 Steps', 'Reach 10,000 steps before the end of the day', 1,
+     'steps walk walking pedometer active fitness exercise'),
+    ('Go for a Run', 'Run for at least 20 minutes at an easy pace', 1,
+     'run running jog jogging cardio fitness exercise endurance marathon'),
+    ('Strength Workout', 'Do a 30 minute bodyweight or weights session', 1,
+     'strength workout gym weights lift lifting muscle fitness exercise'),
+    ('Push-ups', 'Do sets of 10 push-ups spread through the day', 3,
+     'pushups pushup strength upper body fitness exercise'),
+    ('Stretch', 'Stretch for 10 minutes to stay flexible', 1,
+     'stretch stretching flexibility mobility back posture yoga'),
+    ('Yoga Session', 'Follow a 15 minute yoga flow', 1,
+     'yoga flexibility mindfulness stretch calm balance'),
+    ('Cycle', 'Ride a bike for 30 minutes or commute by bike', 1,
+     'cycle cycling bike biking cardio fitness exercise commute'),
+    ('Swim', 'Swim laps for 20 minutes', 1,
+     'swim swimming pool cardio fitness exercise'),
+    ('Take the Stairs', 'Use the stairs instead of the elevator', 3,
+     'stairs active movement fitness exercise office'),
+    ('Eat Vegetables', 'Include a serving of vegetables with each meal', 3,
+     'vegetables veggies diet nutrition eat healthy food greens'),
+    ('Eat Fruit', 'Eat two pieces of fruit a day', 2,
+     'fruit diet nutrition eat healthy food snack'),
+    ('Cook at Home', 'Cook one meal at home instead of eating out', 1,
+     'cook cooking meal home food diet nutrition money save'),
+    ('No Sugary Drinks', 'Replace soda and sweet drinks with water or tea', 1,
+     'sugar soda drinks diet nutrition weight healthy'),
+    ('Healthy Breakfast', 'Start the day with a balanced breakfast', 1,
+     'breakfast morning diet nutrition eat healthy food'),
+    ('Limit Caffeine', 'No coffee after 2 pm', 1,
+     'caffeine coffee sleep energy diet'),
+    ('Sleep 8 Hours', 'Get at least 8 hours of sleep', 1,
+     'sleep rest bedtime tired energy health recovery'),
+    ('Consistent Bedtime', 'Go to bed at the same time every night', 1,
+     'sleep bedtime night routine rest evening'),
+    ('No Screens Before Bed', 'Put away screens 30 minutes before sleeping', 1,
+     'screens phone sleep bedtime evening digital detox'),
+    ('Meditate', 'Meditate for 10 minutes', 1,
+     'meditate meditation mindfulness calm stress anxiety focus breathe mental health'),
+    ('Breathing Exercise', 'Do 5 minutes of slow, deep breathing', 2,
+     'breathe breathing stress anxiety calm relax mental health'),
+    ('Gratitude Journal', 'Write down three things you are grateful for', 1,
+     'gratitude journal journaling write happiness positive mental health mood'),
+    ('Journal', 'Write a short journal entry about your day', 1,
+     'journal journaling write writing reflect reflection mental health evening'),
+    ('Walk Outside Without Phone', 'Spend 15 minutes outdoors without your phone', 1,
+     'outside nature outdoors phone digital detox mental health stress'),
+    ('Read', 'Read for 20 minutes', 1,
+     'read reading books book learn learning knowledge evening'),
+    ('Read 10 Pages', 'Read at least 10 pages of a book', 1,
+     'read reading books book pages learn'),
+    ('Learn a Language', 'Practice a new language for 15 minutes', 1,
+     'language languages learn learning study spanish french german vocabulary duolingo'),
+    ('Study Session', 'Do a focused 45 minute study session', 1,
+     'study studying learn learning exam school university focus homework'),
+    ('Practice an Instrument', 'Practice your instrument for 20 minutes', 1,
+     'music instrument guitar piano practice learn creative'),
+    ('Write 500 Words', 'Write 500 words on any project', 1,
+     'write writing blog novel creative words author'),
+    ('Draw or Sketch', 'Spend 15 minutes drawing or sketching', 1,
+     'draw drawing sketch art creative creativity'),
+    ('Code Practice', 'Solve one coding problem or build something small', 1,
+     'code coding programming learn developer practice leetcode software'),
+    ('Plan Tomorrow', 'Write tomorrow\'s top three tasks before finishing work', 1,
+     'plan planning tasks productivity todo organize work focus'),
+    ('Deep Work Block', 'Do one 90 minute block of distraction-free work', 1,
+     'focus deep work productivity concentration distraction career'),
+    ('Inbox Zero', 'Clear your email inbox once a day', 1,
+     'email inbox productivity work organize'),
+    ('Single-Tasking', 'Work on one task at a time for an hour', 1,
+     'focus productivity multitasking concentration work'),
+    ('Limit Social Media', 'Keep social media under 30 minutes a day', 1,
+     'social media phone screen time distraction digital detox focus'),
+    ('Track Expenses', 'Record every purchase you make today', 1,
+     'money finance finances budget spending expenses track save saving'),
+    ('Save Money', 'Move a small amount into savings', 1,
+     'money save saving savings finance budget invest'),
+    ('No Impulse Purchases', 'Wait 24 hours before any non-essential purchase', 1,
+     'money spending shopping finance budget save impulse'),
+    ('Tidy Up', 'Spend 10 minutes tidying your space', 1,
+     'tidy clean cleaning declutter home organize room chores'),
+    ('Make Your Bed', 'Make your bed right after getting up', 1,
+     'bed morning routine tidy home discipline'),
+    ('Do the Dishes', 'Wash the dishes before going to bed', 1,
+     'dishes kitchen clean cleaning chores home evening'),
+    ('Call a Friend or Family Member', 'Reach out to someone you care about', 1,
+     'friends family call social relationships connect loneliness'),
+    ('Compliment Someone', 'Give one sincere compliment', 1,
+     'kindness social relationships positive kind'),
+    ('Floss', 'Floss your teeth before bed', 1,
+     'floss teeth dental hygiene health evening'),
+    ('Take Vitamins', 'Take your daily vitamins or medication', 1,
+     'vitamins supplements medication pills health'),
+    ('Skincare Routine', 'Follow your skincare routine morning and night', 2,
+     'skin skincare selfcare routine morning evening'),
+    ('Wake Up Early', 'Get up at your target time without snoozing', 1,
+     'wake early morning routine alarm discipline productivity'),
+    ('Stand Up Every Hour', 'Stand and move for a few minutes every hour', 8,
+     'stand sitting posture desk office movement health back'),
+    ('Quit Smoking', 'Go the day without smoking', 1,
+     'smoking quit cigarettes nicotine vape health addiction'),
+    ('No Alcohol', 'Have an alcohol-free day', 1,
+     'alcohol drinking sober quit health'),
+]
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'at', 'be', 'better', 'can', 'do', 'day', 'daily', 'for',
+    'get', 'habit', 'habits', 'help', 'how', 'i', 'im', 'in', 'into', 'is', 'it', 'me',
+    'more', 'my', 'of', 'on', 'or', 'some', 'something', 'start', 'the', 'to', 'want',
+    'with', 'would', 'like', 'make', 'every', 'improve', 'good', 'new', 'build', 'less',
+}
+
+# Recommendations returned per query
+MAX_RESULTS = 5
+# Learned entries kept in the shared catalog; the oldest are evicted first
+MAX_LEARNED_ENTRIES = 500
+# Learned entries kept per user, and users whose entries are kept (least recent evicted)
+MAX_LEARNED_PER_USER = 50
+MAX_LEARNING_USERS = 1000
+# Distinct users that must be given a generated title before it is shared
+PROMOTE_AFTER_USERS = 3
+# Generated titles waiting for promotion
+MAX_CANDIDATES = 2000
+# Minimum difflib ratio for a query word to match a misspelled keyword, and
+# misspelled words whose closest keyword is remembered
+FUZZY_CUTOFF = 0.8
+MAX_FUZZY_CACHE = 4096
+# A recommendation needs at least this score (one keyword shared by many
+# entries scores less), and the query at least this share of its words
+# matched, or the request goes to Gemini instead
+MIN_SCORE = 0.5
+MIN_COVERAGE = 0.5
+
+_WORD = re.compile(r'[a-z0-9]+')
+_UNSAFE = re.compile(r'<[^>]*>|[\x00-\x1f\x7f<>]')
+
+def tokenize(text):
+    """Lowercase word stems of `text`, without stopwords"""
+    tokens = []
+    for word in _WORD.findall(str(text).lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 4 and word.endswith('ies'):
+            word = word[:-3] + 'y'
+        elif len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+def _title_key(title):
+    return ' '.join(_WORD.findall(str(title).lower()))
+
+def _clean(text, limit):
+    """Single-line text without control characters or markup, at most `limit` characters"""
+    return ' '.join(_UNSAFE.sub(' ', str(text)).split())[:limit]
+
+def sanitize_habit(habit):
+    """Generated habit reduced to what is safe to recommend again, or None"""
+    title = _clean(habit.get('title', ''), 50)
+    if not _title_key(title):
+        return None
+    try:
+        target_count = max(1, min(10, int(habit.get('target_count', 1))))
+    except (TypeError, ValueError):
+        target_count = 1
+    return {'title': title, 'description': _clean(habit.get('description', ''), 100), 'target_count': target_count}
+
+def rank(tokens, scored, existing=(), limit=MAX_RESULTS):
+    """Top entries from (scores, matched tokens) pairs of one or more catalogs"""
+    matched = set().union(*(m for _, m in scored)) if scored else set()
+    if not tokens or len(matched) < MIN_COVERAGE * len(tokens):
+        # Words the catalog does not know are probably what the user is asking about
+        return []
+    best = {}
+    for scores, _ in scored:
+        for key, (score, entry) in scores.items():
+            if score >= MIN_SCORE and key not in existing and score > best.get(key, (0, None))[0]:
+                best[key] = (score, entry)
+    ranked = sorted(best, key=lambda key: (-best[key][0], key))
+    return [dict(best[key][1], id=f'local-{i + 1}') for i, key in enumerate(ranked[:limit])]
+
+class HabitCatalog:
+    """Habit entries indexed by keyword; safe to share between request threads"""
+
+    def __init__(self, entries=(), max_learned=MAX_LEARNED_ENTRIES):
+        self._lock = threading.Lock()
+        self._entries = {}  # title key -> entry
+        self._index = {}  # token -> {title key: weight}
+        self._learned = OrderedDict()  # title keys added by learn(), oldest first
+        self._max_learned = max_learned
+        self._fuzzy_cache = OrderedDict()  # misspelled token -> closest keyword, least recent first
+        for title, description, target_count, keywords in entries:
+            self._add(title, description, target_count, keywords)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _add(self, title, description, target_count, keywords):
+        key = _title_key(title)
+        if not key or key in self._entries:
+            return None
+        self._entries[key] = {
+            'title': title,
+            'description': description,
+            'frequency': 'daily',
+            'target_count': target_count
+        }
+        # Title words count double so "Read" beats an entry that merely mentions reading
+        weights = {}
+        for token in tokenize(keywords) + tokenize(description):
+            weights[token] = max(weights.get(token, 0), 1)
+        for token in tokenize(title):
+            weights[token] = 2
+        for token, weight in weights.items():
+            self._index.setdefault(token, {})[key] = weight
+        return key
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        for token in list(self._index):
+            postings = self._index[token]
+            postings.pop(key, None)
+            if not postings:
+                del self._index[token]
+
+    def _lookup(self, token):
+        postings = self._index.get(token)
+        if postings is not None:
+            return postings, 1.0
+        # Misspellings and unseen inflections fall back to the closest keyword
+        match = self._fuzzy_cache.get(token)
+        if match is None:
+            # Typos rarely touch the first letter, which keeps difflib's candidate list short
+            candidates = [
+                t for t in self._index
+                if t[0] == token[0] and abs(len(t) - len(token)) <= 2
+            ]
+            close = difflib.get_close_matches(token, candidates, n=1, cutoff=FUZZY_CUTOFF)
+            match = close[0] if close else ''
+            self._fuzzy_cache[token] = match
+            if len(self._fuzzy_cache) > MAX_FUZZY_CACHE:
+                self._fuzzy_cache.popitem(last=False)
+        else:
+            self._fuzzy_cache.move_to_end(token)
+        if not match:
+            return None, 0
+        return self._index.get(match), 0.5
+
+    def score(self, tokens):
+        """({title key: (score, entry)}, matched tokens) for a query's tokens"""
+        with self._lock:
+            scores = {}
+            matched = set()
+            for token in tokens:
+                postings, factor = self._lookup(token)
+                if not postings:
+                    continue
+                matched.add(token)
+                # Rare keywords say more about the query than ones shared by many entries
+                specificity = 1 / len(postings) ** 0.5
+                for key, weight in postings.items():
+                    scores[key] = scores.get(key, 0) + weight * factor * specificity
+            return {key: (score, self._entries[key]) for key, score in scores.items() if key in self._entries}, matched
+
+    def recommend(self, query, existing_titles=(), limit=MAX_RESULTS):
+        """Best-matching catalog habits for `query`, skipping titles the user already has"""
+        tokens = set(tokenize(query))
+        return rank(tokens, [self.score(tokens)], {_title_key(t) for t in existing_titles}, limit)
+
+    def learn(self, query, habits):
+        """Add generated habits, keyed by the query that produced them"""
+        with self._lock:
+            added = 0
+            for habit in filter(None, map(sanitize_habit, habits)):
+                key = self._add(
+                    habit['title'], habit['description'], habit['target_count'],
+                    f"{query} {habit['title']}"
+                )
+                if key is None:
+                    continue
+                added += 1
+                self._learned[key] = True
+                if len(self._learned) > self._max_learned:
+                    oldest, _ = self._learned.popitem(last=False)
+                    self._remove(oldest)
+            if added:
+                self._fuzzy_cache.clear()
+            return added
+
+class HabitRecommender:
+    """The shared catalog plus the habits Gemini generated for each user"""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._lock = threading.Lock()
+        self._personal = OrderedDict()  # user id -> HabitCatalog, least recently used first
+        self._candidates = OrderedDict()  # title key -> {'habit', 'users', 'queries'}
+
+    def _personal_catalog(self, user_id, create=False):
+        with self._lock:
+            personal = self._personal.get(user_id)
+            if personal is None and create:
+                personal = self._personal[user_id] = HabitCatalog(max_learned=MAX_LEARNED_PER_USER)
+                if len(self._personal) > MAX_LEARNING_USERS:
+                    self._personal.popitem(last=False)
+            if personal is not None:
+                self._personal.move_to_end(user_id)
+            return personal
+
+    def recommend(self, query, user_id=None, existing_titles=(), limit=MAX_RESULTS):
+        """Best matches from the shared catalog and what was generated for `user_id`"""
+        tokens = set(tokenize(query))
+        scored = [self.catalog.score(tokens)]
+        personal = self._personal_catalog(str(user_id)) if user_id else None
+        if personal is not None:
+            scored.append(personal.score(tokens))
+        return rank(tokens, scored, {_title_key(t) for t in existing_titles}, limit)
+
+    def learn(self, user_id, query, habits):
+        """Remember habits generated for a user; share titles other users were given too"""
+        habits = list(filter(None, map(sanitize_habit, habits)))
+        user_id = str(user_id)
+        added = self._personal_catalog(user_id, create=True).learn(query, habits)
+        promoted = []
+        with self._lock:
+            for habit in habits:
+                key = _title_key(habit['title'])
+                candidate = self._candidates.pop(key, None) or {'habit': habit, 'users': set(), 'queries': []}
+                if user_id not in candidate['users']:
+                    candidate['users'].add(user_id)
+                    candidate['queries'].append(query)
+                if len(candidate['users']) >= PROMOTE_AFTER_USERS:
+                    promoted.append(candidate)
+                    continue
+                self._candidates[key] = candidate
+                if len(self._candidates) > MAX_CANDIDATES:
+                    self._candidates.popitem(last=False)
+        for candidate in promoted:
+            self.catalog.learn(' '.join(candidate['queries']), [candidate['habit']])
+        return added
+
+catalog = HabitCatalog(CATALOG)
+recommender = HabitRecommender(catalog)
+
+def recommend_habits(query, user_id=None, existing_titles=(), limit=MAX_RESULTS):
+    """Recommendations from the shared catalog and the user's generated habits"""
+    return recommender.recommend(query, user_id, existing_titles, limit)
+
+def learn_habits(user_id, query, habits):
+    """Remember habits Gemini generated for `user_id` and `query`"""
+    return recommender.learn(user_id, query, habits)
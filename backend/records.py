@@ -0,0 +1,62 @@
+"""
+Compact read models for projected queries
+
+A query that only needs a few fields asks Mongo for just those fields and
+wraps each result in a `__slots__` record instead of keeping the full dict.
+Records are read with attributes (`habit.title`) or, so helpers shared with
+dict-returning code keep working, with `habit['title']` / `habit.get(...)`.
+"""
+
+class Record:
+    """Base class for projection records; subclasses set __slots__ to the fields"""
+    __slots__ = ()
+
+    def __init__(self, doc):
+        for field in self.__slots__:
+            setattr(self, field, doc.get(field))
+
+    def __getitem__(self, field):
+        try:
+            return getattr(self, field)
+        except AttributeError:
+            raise KeyError(field)
+
+    def get(self, field, default=None):
+        return getattr(self, field, default)
+
+    def __repr__(self):
+        values = ', '.join(f'{f}={getattr(self, f)!r}' for f in self.__slots__)
+        return f'{type(self).__name__}({values})'
+
+_record_types = {}
+
+def record_type(fields):
+    """The record class for a projection (one class per distinct field tuple)"""
+    fields = tuple(fields)
+    cls = _record_types.get(fields)
+    if cls is None:
+        cls = type('Record', (Record,), {'__slots__': fields})
+        _record_types[fields] = cls
+    return cls
+
+def projection(fields):
+    """Mongo projection for `fields` (leaves out _id unless asked for)"""
+    spec = {field: 1 for field in fields}
+    if '_id' not in spec:
+        spec['_id'] = 0
+    return spec
+
+def find_records(collection, query, fields):
+    """Run `query` with a projection of `fields` and return a list of records"""
+    cls = record_type(fields)
+    return [cls(doc) for doc in collection.find(query, projection(fields))]
+
+# Field sets used by the routes: only what each one serializes
+HABIT_LIST_FIELDS = (
+    '_id', 'title', 'description', 'frequency', 'target_count',
+    'current_streak', 'longest_streak', 'created_at'
+)
+HABIT_TITLE_FIELDS = ('title',)
+HABIT_INSIGHT_FIELDS = ('_id', 'title', 'frequency', 'current_streak', 'longest_streak')
+HABIT_HISTORY_FIELDS = ('_id', 'created_at')
+HABIT_ID_FIELDS = ('_id',)
@@ -0,0 +1,144 @@
+"""
+Evening reminders for daily habits that have not reached their target yet
+"""
+
+import json
+import os
+import multiprocessing
+import urllib.request
+from datetime import datetime
+from database import (
+    iter_daily_habits, get_rollups_for_day, get_claimed_reminders,
+    claim_reminders, mark_reminders_sent, release_reminders, backfill_reminder_buckets
+)
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_WEBHOOK_URL = 'http://localhost:5055/reminders'
+
+# Notification sinks
+class LogSink:
+    """Print notifications to stdout (default, for development)"""
+
+    def send_batch(self, notifications):
+        for n in notifications:
+            print(f"Reminder for user {n['user_id']}: {', '.join(h['title'] for h in n['habits'])}")
+
+class WebhookSink:
+    """POST notification batches as JSON to a webhook"""
+
+    def __init__(self, url=None, timeout=5):
+        self.url = url or os.getenv('REMINDER_WEBHOOK_URL', DEFAULT_WEBHOOK_URL)
+        self.timeout = timeout
+
+    def send_batch(self, notifications):
+        body = json.dumps({'notifications': notifications}).encode('utf-8')
+        req = urllib.request.Request(
+            self.url, data=body, method='POST',
+            headers={'Content-Type': 'application/json'}
+        )
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            resp.read()
+
+SINKS = {
+    'log': LogSink,
+    'webhook': WebhookSink
+}
+
+def get_sink(name=None):
+    """Build the sink named by `name` or the REMINDER_SINK env var"""
+    name = name or os.getenv('REMINDER_SINK', 'log')
+    if name not in SINKS:
+        raise ValueError(f"Unknown reminder sink: {name}")
+    return SINKS[name]()
+
+def find_pending_reminders(day, partition=0, partitions=1, chunk_size=DEFAULT_BATCH_SIZE):
+    """Yield lists of pending {user_id, habit_id, title, done, target} for one partition.
+
+    The partition's daily habits are streamed grouped by user, selected in
+    the query by their stored `reminder_bucket` (see partitions.py). For
+    each chunk of users the day's rollups and reminder claims are read with
+    one indexed query each.
+    """
+    chunk = {}
+
+    def flush(chunk):
+        counts = get_rollups_for_day(chunk.keys(), day)
+        claimed = get_claimed_reminders(chunk.keys(), day)
+        pending = []
+        for uid, habits in chunk.items():
+            user_counts = counts.get(uid, {})
+            for hid, title, target in habits:
+                done = user_counts.get(str(hid), 0)
+                if done < target and (uid, hid) not in claimed:
+                    pending.append({'user_id': uid, 'habit_id': hid, 'title': title,
+                                    'done': done, 'target': target})
+        return pending
+
+    for uid, hid, title, target in iter_daily_habits(partition, partitions):
+        if uid not in chunk and len(chunk) >= chunk_size:
+            yield flush(chunk)
+            chunk = {}
+        chunk.setdefault(uid, []).append((hid, title, target))
+    if chunk:
+        yield flush(chunk)
+
+def send_partition_reminders(partition, partitions, sink, day=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Claim and send all pending reminders of one partition; returns the number of users notified"""
+    day = day or datetime.utcnow().date()
+    notified = 0
+    for pending in find_pending_reminders(day, partition, partitions, batch_size):
+        claimed = claim_reminders([(p['user_id'], p['habit_id']) for p in pending], day)
+        if not claimed:
+            continue
+        won = set(claimed)
+
+        # One notification per user listing all their unfinished habits
+        by_user = {}
+        for p in pending:
+            if (p['user_id'], p['habit_id']) in won:
+                by_user.setdefault(p['user_id'], []).append({
+                    'habit_id': str(p['habit_id']),
+                    'title': p['title'],
+                    'done': p['done'],
+                    'target': p['target']
+                })
+        notifications = [
+            {'user_id': str(uid), 'day': day.isoformat(), 'habits': habits}
+            for uid, habits in by_user.items()
+        ]
+        try:
+            sink.send_batch(notifications)
+        except Exception as e:
+            # Nothing was delivered, so the claims are released for the next run to send
+            print(f"Reminder batch failed for partition {partition}: {e}")
+            release_reminders(claimed, day)
+            continue
+        mark_reminders_sent(claimed, day)
+        notified += len(notifications)
+    return notified
+
+def _run_worker(partition, partitions, sink_name, day, batch_size):
+    """Worker process entry point: import the app (and its Mongo client) fresh and send one partition"""
+    from app import app
+    with app.app_context():
+        return send_partition_reminders(partition, partitions, get_sink(sink_name), day, batch_size)
+
+def run_reminders(workers=1, sink_name=None, day=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Send today's reminders, split across `workers` processes by user-id hash"""
+    day = day or datetime.utcnow().date()
+    backfilled = backfill_reminder_buckets()
+    if backfilled:
+        print(f"Stored reminder buckets for the habits of {backfilled} users")
+    if workers <= 1:
+        notified = send_partition_reminders(0, 1, get_sink(sink_name), day, batch_size)
+    else:
+        # Spawned workers open their own Mongo connections instead of sharing a forked client
+        ctx = multiprocessing.get_context('spawn')
+        with ctx.Pool(workers) as pool:
+            results = pool.starmap(
+                _run_worker,
+                [(i, workers, sink_name, day, batch_size) for i in range(workers)]
+            )
+        notified = sum(results)
+    print(f"Sent reminders to {notified} users")
+    return notified
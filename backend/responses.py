@@ -0,0 +1,126 @@
+"""
+Response encoding: a fast JSON provider and negotiated gzip/brotli compression
+
+`FastJSONProvider` is the Flask app's JSON provider, so `jsonify`, returned
+dicts and `request.get_json()` all go through it. It serializes ObjectId
+(as its hex string), datetime and date (ISO 8601, as `.isoformat()` gives)
+natively. Views can therefore return documents without converting each
+field. It uses orjson when installed and the stdlib json module otherwise.
+
+`configure_compression` compresses finished responses above
+COMPRESS_MIN_SIZE bytes. It uses brotli when the client accepts it and the
+`brotli` package is installed, otherwise gzip. Streamed responses (exports,
+the event stream) are left alone.
+"""
+
+import gzip
+import json
+from datetime import date, datetime
+from bson import ObjectId
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional: falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only
+    brotli = None
+
+JSON_MIMETYPE = 'application/json'
+
+def _default(value):
+    """Encode the types the stdlib (and orjson, for ObjectId) cannot"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj):
+        """Serialize to UTF-8 JSON bytes"""
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+    def loads(data):
+        return orjson.loads(data)
+else:
+    _encoder = json.JSONEncoder(default=_default, ensure_ascii=False, separators=(',', ':'))
+
+    def dumps_bytes(obj):
+        """Serialize to UTF-8 JSON bytes"""
+        return _encoder.encode(obj).encode('utf-8')
+
+    def loads(data):
+        return json.loads(data)
+
+def dumps(obj):
+    """Serialize to a JSON string"""
+    return dumps_bytes(obj).decode('utf-8')
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider backed by dumps_bytes/loads"""
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        # Build the body as bytes directly instead of str -> bytes
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj) + b'\n', mimetype=JSON_MIMETYPE)
+
+# Content types worth compressing
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+def choose_encoding(accept_encodings):
+    """Best supported Content-Encoding from a parsed Accept-Encoding header, or None"""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+def compress(data, encoding, gzip_level=6, brotli_quality=4):
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+def configure_compression(app):
+    """Compress eligible responses per the request's Accept-Encoding (COMPRESS_* config)"""
+    if not app.config.get('COMPRESS_ENABLED', True):
+        return
+    min_size = int(app.config.get('COMPRESS_MIN_SIZE', 1024))
+    gzip_level = int(app.config.get('COMPRESS_GZIP_LEVEL', 6))
+    brotli_quality = int(app.config.get('COMPRESS_BROTLI_QUALITY', 4))
+
+    @app.after_request
+    def compress_response(response):
+        from flask import request
+        if (
+            response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or not (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)
+            or response.status_code < 200
+            or response.status_code in (204, 304)
+        ):
+            return response
+        response.vary.add('Accept-Encoding')
+        if response.content_length is not None and response.content_length < min_size:
+            return response
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        response.set_data(compress(data, encoding, gzip_level, brotli_quality))
+        response.headers['Content-Encoding'] = encoding
+        return response
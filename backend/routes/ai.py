@@ -5,10 +5,14 @@ AI-powered features including suggestions, habit generation, chat, and insights
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import google.generativeai as genai
+import json
 import os
+from ratelimit import rate_limited
+from records import HABIT_TITLE_FIELDS, HABIT_INSIGHT_FIELDS
+from recommendations import recommend_habits, learn_habits
 from database import (
     get_user_habits, create_ai_chat_message, get_ai_chat_history,
-    get_collections
+    get_user_habit_totals, causal_session, causal_context
 )
 
 ai_bp = Blueprint('ai', __name__)
@@ -16,8 +20,118 @@ ai_bp = Blueprint('ai', __name__)
 # Configure Gemini AI
 gemini_api_key = os.getenv('GEMINI_API_KEY')
 
+# Baseline habits for when AI is not available
+BASELINE_HABITS = [
+    {
+        'id': 'baseline-1',
+        'title': 'Drink Water',
+        'description': 'Stay hydrated throughout the day',
+        'frequency': 'daily',
+        'target_count': 8
+    },
+    {
+        'id': 'baseline-2', 
+        'title': 'Exercise',
+        'description': 'Get your body moving with physical activity',
+        'frequency': 'daily',
+        'target_count': 1
+    },
+    {
+        'id': 'baseline-3',
+        'title': 'Read',
+        'description': 'Spend time reading books or articles',
+        'frequency': 'daily',
+        'target_count': 1
+    }
+]
+
+BASELINE_CHAT_REPLY = (
+    "Thanks for sharing! Here's a quick suggestion: pick one small, high-impact habit "
+    "you can complete today to build momentum. If you'd like, ask me for a "
+    "personalized plan based on your habits."
+)
+
+def ai_enabled():
+    """Whether a usable Gemini API key is configured"""
+    return bool(gemini_api_key) and gemini_api_key != 'your_gemini_api_key_here'
+
+def build_generate_habits_prompt(query, existing_titles):
+    """Prompt asking Gemini for 3-5 habits as a JSON array"""
+    return f"""
+        Generate 3-5 specific, actionable habits based on this request: "{query}"
+        
+        User's existing habits: {', '.join(existing_titles) if existing_titles else 'None'}
+        
+        Return ONLY a valid JSON array with this exact format:
+        [
+          {{
+            "id": "habit-1",
+            "title": "Short habit name (max 50 chars)",
+            "description": "Brief description (max 100 chars)", 
+            "frequency": "daily",
+            "target_count": 1
+          }}
+        ]
+        
+        Rules:
+        - Make habits specific and measurable
+        - Avoid duplicating existing habits
+        - Use realistic target_count (1-10)
+        - Keep titles and descriptions concise
+        - Only use "daily" frequency
+        - Return valid JSON only, no extra text
+        """
+
+def parse_generated_habits(ai_text):
+    """Parse and validate Gemini's habit JSON; returns a list of habits or None"""
+    try:
+        # Clean up the response (remove markdown code blocks if present)
+        if '```json' in ai_text:
+            ai_text = ai_text.split('```json')[1].split('```')[0].strip()
+        elif '```' in ai_text:
+            ai_text = ai_text.split('```')[1].strip()
+        
+        habits = json.loads(ai_text)
+        
+        # Validate the structure
+        if isinstance(habits, list) and len(habits) > 0:
+            valid_habits = []
+            for i, habit in enumerate(habits[:5]):  # Max 5 habits
+                if isinstance(habit, dict) and all(k in habit for k in ['title', 'description', 'frequency', 'target_count']):
+                    valid_habits.append({
+                        'id': f'ai-{i+1}',
+                        'title': str(habit['title'])[:50],
+                        'description': str(habit['description'])[:100],
+                        'frequency': 'daily',  # Force daily
+                        'target_count': max(1, min(10, int(habit.get('target_count', 1))))
+                    })
+            
+            if valid_habits:
+                return valid_habits
+    
+    except (json.JSONDecodeError, ValueError, KeyError):
+        pass
+    return None
+
+def build_baseline_insight(habits):
+    """Non-AI insight summarizing a user's habits"""
+    total_habits = len(habits)
+    total_streak = sum(h['current_streak'] for h in habits)
+    longest_streak = max((h['longest_streak'] for h in habits), default=0)
+    daily_count = sum(1 for h in habits if h['frequency'] == 'daily')
+    weekly_count = sum(1 for h in habits if h['frequency'] == 'weekly')
+    monthly_count = sum(1 for h in habits if h['frequency'] == 'monthly')
+
+    return (
+        f"You are tracking {total_habits} habits. Your combined current streaks total {total_streak} "
+        f"with a longest streak of {longest_streak}. Mix: {daily_count} daily, {weekly_count} weekly, {monthly_count} monthly.\n\n"
+        "Suggestions: Focus on keeping streaks alive by completing at least one small daily habit. "
+        "Consider reducing rarely-completed habits or simplifying them. Celebrate your longest streak and try to beat it!"
+    )
+
 @ai_bp.route('/suggestions', methods=['POST'])
 @jwt_required()
+@rate_limited()
 def get_ai_suggestions():
     user_id = get_jwt_identity()
     data = request.get_json()
@@ -25,14 +139,14 @@ def get_ai_suggestions():
     if not data or not data.get('query'):
         return jsonify({'error': 'Query is required'}), 400
     
-    if not gemini_api_key or gemini_api_key == 'your_gemini_api_key_here':
+    if not ai_enabled():
         return jsonify({'error': 'AI features are not configured. Please set up your Gemini API key.'}), 503
     
     try:
         model = genai.GenerativeModel('gemini-2.0-flash')
         
-        habits = get_user_habits(user_id)
-        habit_titles = [habit['title'] for habit in habits]
+        habits = get_user_habits(user_id, HABIT_TITLE_FIELDS)
+        habit_titles = [habit.title for habit in habits]
         
         prompt = f"""
         User's current habits: {', '.join(habit_titles)}
@@ -54,6 +168,7 @@ def get_ai_suggestions():
 
 @ai_bp.route('/generate-habits', methods=['POST'])
 @jwt_required()
+@rate_limited()
 def generate_habits():
     user_id = get_jwt_identity()
     data = request.get_json()
@@ -63,122 +178,51 @@ def generate_habits():
     
     query = data['query'].strip()
     
-    # Baseline habits for when AI is not available
-    baseline_habits = [
-        {
-            'id': 'baseline-1',
-            'title': 'Drink Water',
-            'description': 'Stay hydrated throughout the day',
-            'frequency': 'daily',
-            'target_count': 8
-        },
-        {
-            'id': 'baseline-2', 
-            'title': 'Exercise',
-            'description': 'Get your body moving with physical activity',
-            'frequency': 'daily',
-            'target_count': 1
-        },
-        {
-            'id': 'baseline-3',
-            'title': 'Read',
-            'description': 'Spend time reading books or articles',
-            'frequency': 'daily',
-            'target_count': 1
-        }
-    ]
+    # Get user's existing habits for context
+    existing_habits = get_user_habits(user_id, HABIT_TITLE_FIELDS)
+    existing_titles = [h.title for h in existing_habits]
+    
+    # Common requests are answered from the local catalog without calling Gemini
+    local_habits = recommend_habits(query, user_id, existing_titles)
+    if local_habits:
+        return jsonify({'habits': local_habits})
     
-    if not gemini_api_key or gemini_api_key == 'your_gemini_api_key_here':
-        return jsonify({'habits': baseline_habits})
+    if not ai_enabled():
+        return jsonify({'habits': BASELINE_HABITS})
     
     try:
         model = genai.GenerativeModel('gemini-2.0-flash')
         
-        # Get user's existing habits for context
-        existing_habits = get_user_habits(user_id)
-        existing_titles = [h['title'] for h in existing_habits]
-        
-        prompt = f"""
-        Generate 3-5 specific, actionable habits based on this request: "{query}"
-        
-        User's existing habits: {', '.join(existing_titles) if existing_titles else 'None'}
-        
-        Return ONLY a valid JSON array with this exact format:
-        [
-          {{
-            "id": "habit-1",
-            "title": "Short habit name (max 50 chars)",
-            "description": "Brief description (max 100 chars)", 
-            "frequency": "daily",
-            "target_count": 1
-          }}
-        ]
-        
-        Rules:
-        - Make habits specific and measurable
-        - Avoid duplicating existing habits
-        - Use realistic target_count (1-10)
-        - Keep titles and descriptions concise
-        - Only use "daily" frequency
-        - Return valid JSON only, no extra text
-        """
+        prompt = build_generate_habits_prompt(query, existing_titles)
         
         response = model.generate_content(prompt)
-        ai_text = response.text.strip()
-        
-        # Try to parse JSON response
-        import json
-        try:
-            # Clean up the response (remove markdown code blocks if present)
-            if '```json' in ai_text:
-                ai_text = ai_text.split('```json')[1].split('```')[0].strip()
-            elif '```' in ai_text:
-                ai_text = ai_text.split('```')[1].strip()
-            
-            habits = json.loads(ai_text)
-            
-            # Validate the structure
-            if isinstance(habits, list) and len(habits) > 0:
-                valid_habits = []
-                for i, habit in enumerate(habits[:5]):  # Max 5 habits
-                    if isinstance(habit, dict) and all(k in habit for k in ['title', 'description', 'frequency', 'target_count']):
-                        valid_habits.append({
-                            'id': f'ai-{i+1}',
-                            'title': str(habit['title'])[:50],
-                            'description': str(habit['description'])[:100],
-                            'frequency': 'daily',  # Force daily
-                            'target_count': max(1, min(10, int(habit.get('target_count', 1))))
-                        })
-                
-                if valid_habits:
-                    return jsonify({'habits': valid_habits})
-        
-        except (json.JSONDecodeError, ValueError, KeyError):
-            pass
+        valid_habits = parse_generated_habits(response.text.strip())
+        if valid_habits:
+            learn_habits(user_id, query, valid_habits)
+            return jsonify({'habits': valid_habits})
         
         # Fallback to baseline if AI response is invalid
-        return jsonify({'habits': baseline_habits})
+        return jsonify({'habits': BASELINE_HABITS})
         
     except Exception:
-        return jsonify({'habits': baseline_habits})
+        return jsonify({'habits': BASELINE_HABITS})
 
 @ai_bp.route('/chat/history', methods=['GET'])
 @jwt_required()
+@causal_session(analytics=True)
 def get_ai_chat_history_route():
     user_id = get_jwt_identity()
-    messages = get_ai_chat_history(user_id)
+    limit = request.args.get('limit', type=int)
+    messages = get_ai_chat_history(user_id, limit=limit if limit and limit > 0 else None)
+    # The JSON provider encodes the ObjectId and datetime fields itself
     return jsonify([
-        {
-            'id': str(m['_id']),
-            'role': m['role'],
-            'text': m['text'],
-            'created_at': m['created_at'].isoformat()
-        }
+        {'id': m['_id'], 'role': m['role'], 'text': m['text'], 'created_at': m['created_at']}
         for m in messages
     ])
 
 @ai_bp.route('/chat', methods=['POST'])
 @jwt_required()
+@rate_limited()
 def ai_chat():
     user_id = get_jwt_identity()
     data = request.get_json() or {}
@@ -186,19 +230,18 @@ def ai_chat():
     if not user_message:
         return jsonify({'error': 'Message is required'}), 400
 
-    # Save user message
-    user_msg = create_ai_chat_message(user_id, 'user', user_message)
+    # Save user message. Each write gets its own short causal session, so none
+    # stays checked out while Gemini answers.
+    with causal_context(user_id):
+        create_ai_chat_message(user_id, 'user', user_message)
 
     # Prepare baseline reply
-    baseline_reply = (
-        "Thanks for sharing! Here's a quick suggestion: pick one small, high-impact habit "
-        "you can complete today to build momentum. If you'd like, ask me for a "
-        "personalized plan based on your habits."
-    )
+    baseline_reply = BASELINE_CHAT_REPLY
 
     # If no AI configured, return baseline reply and store it
-    if not gemini_api_key or gemini_api_key == 'your_gemini_api_key_here':
-        assistant_msg = create_ai_chat_message(user_id, 'assistant', baseline_reply)
+    if not ai_enabled():
+        with causal_context(user_id):
+            assistant_msg = create_ai_chat_message(user_id, 'assistant', baseline_reply)
         return jsonify({'assistant': {
             'id': str(assistant_msg['_id']),
             'role': 'assistant',
@@ -209,8 +252,8 @@ def ai_chat():
     # Try AI response; on failure, fall back to baseline
     try:
         model = genai.GenerativeModel('gemini-2.0-flash')
-        habits = get_user_habits(user_id)
-        habit_titles = [h['title'] for h in habits]
+        habits = get_user_habits(user_id, HABIT_TITLE_FIELDS)
+        habit_titles = [h.title for h in habits]
         prompt = (
             f"User's current habits: {', '.join(habit_titles)}\n"
             f"User message: {user_message}\n"
@@ -221,7 +264,8 @@ def ai_chat():
     except Exception:
         ai_text = baseline_reply
 
-    assistant_msg = create_ai_chat_message(user_id, 'assistant', ai_text)
+    with causal_context(user_id):
+        assistant_msg = create_ai_chat_message(user_id, 'assistant', ai_text)
 
     return jsonify({'assistant': {
         'id': str(assistant_msg['_id']),
@@ -232,45 +276,36 @@ def ai_chat():
 
 @ai_bp.route('/insights', methods=['GET'])
 @jwt_required()
+@rate_limited()
 def get_ai_insights():
     user_id = get_jwt_identity()
     
-    # Always compute a safe, non-AI baseline insight
-    habits = get_user_habits(user_id)
+    # Always compute a safe, non-AI baseline insight. Reads get their own short
+    # causal sessions, so none stays checked out while Gemini answers.
+    with causal_context(user_id, analytics=True):
+        habits = get_user_habits(user_id, HABIT_INSIGHT_FIELDS)
     if not habits:
         baseline_insight = 'Start by creating your first habit to get personalized insights!'
         return jsonify({'insight': baseline_insight})
 
-    total_habits = len(habits)
-    total_streak = sum(h['current_streak'] for h in habits)
-    longest_streak = max((h['longest_streak'] for h in habits), default=0)
-    daily_count = sum(1 for h in habits if h['frequency'] == 'daily')
-    weekly_count = sum(1 for h in habits if h['frequency'] == 'weekly')
-    monthly_count = sum(1 for h in habits if h['frequency'] == 'monthly')
-
-    baseline_insight = (
-        f"You are tracking {total_habits} habits. Your combined current streaks total {total_streak} "
-        f"with a longest streak of {longest_streak}. Mix: {daily_count} daily, {weekly_count} weekly, {monthly_count} monthly.\n\n"
-        "Suggestions: Focus on keeping streaks alive by completing at least one small daily habit. "
-        "Consider reducing rarely-completed habits or simplifying them. Celebrate your longest streak and try to beat it!"
-    )
+    baseline_insight = build_baseline_insight(habits)
 
     # If AI not configured, return baseline without error
-    if not gemini_api_key or gemini_api_key == 'your_gemini_api_key_here':
+    if not ai_enabled():
         return jsonify({'insight': baseline_insight})
 
     # Try AI enrichment, but fall back to baseline on any error
     try:
         model = genai.GenerativeModel('gemini-2.0-flash')
         habit_data = []
-        collections = get_collections()
+        with causal_context(user_id, analytics=True):
+            totals = get_user_habit_totals(user_id)
         for habit in habits:
-            completions_count = collections['habit_completions'].count_documents({'habit_id': habit['_id']})
             habit_data.append({
                 'title': habit['title'],
                 'current_streak': habit['current_streak'],
                 'longest_streak': habit['longest_streak'],
-                'total_completions': completions_count,
+                'total_completions': totals.get(str(habit['_id']), 0),
                 'frequency': habit['frequency']
             })
 
@@ -0,0 +1,58 @@
+"""
+Composite dashboard route: habits, current streak and stats in one request
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from database import (
+    get_user_habits, get_user_daily_rollups, get_user_activity_dates,
+    get_or_create_user_stats, raise_longest_daily_streak
+)
+from routes.habits import rollup_window, serialize_habits
+from streaks import current_daily_streak
+from records import HABIT_LIST_FIELDS
+
+dashboard_bp = Blueprint('dashboard', __name__)
+
+# The dashboard's reads are independent, so they run side by side on a small
+# shared pool (PyMongo clients are thread-safe and pool their connections)
+_read_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='dashboard-read')
+
+def dashboard_payload(habits, rollups, completed_dates, stats, today):
+    """Assemble the dashboard response from its independent reads"""
+    return {
+        'habits': serialize_habits(habits, rollups, today),
+        'current_streak': current_daily_streak(completed_dates, today),
+        'stats': {
+            'total_habits_created': stats.get('total_habits_created', 0),
+            'total_completions': stats.get('total_completions', 0),
+            'longest_daily_streak': stats.get('longest_daily_streak', 0)
+        }
+    }
+
+@dashboard_bp.route('/', methods=['GET'])
+@jwt_required()
+def get_dashboard():
+    try:
+        user_id = get_jwt_identity()
+        today = datetime.utcnow().date()
+
+        habits = _read_pool.submit(get_user_habits, user_id, HABIT_LIST_FIELDS)
+        rollups = _read_pool.submit(get_user_daily_rollups, user_id, *rollup_window(today))
+        completed_dates = _read_pool.submit(get_user_activity_dates, user_id)
+        stats = _read_pool.submit(get_or_create_user_stats, user_id)
+
+        payload = dashboard_payload(
+            habits.result(), rollups.result(), completed_dates.result(), stats.result(), today
+        )
+
+        # Also ensure longest_daily_streak in stored stats never decreases
+        if payload['current_streak'] > payload['stats']['longest_daily_streak']:
+            raise_longest_daily_streak(user_id, payload['current_streak'])
+            payload['stats']['longest_daily_streak'] = payload['current_streak']
+
+        return jsonify(payload)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,66 @@
+"""
+Server-sent live change events for the current user
+"""
+
+import time
+from flask import Blueprint, Response, current_app, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from database import subscribe_events, unsubscribe_events
+from events import StreamLimitError, create_stream_token, read_stream_token
+from responses import dumps
+
+events_bp = Blueprint('events', __name__)
+
+def format_event(event):
+    """One SSE message; the event type travels inside the JSON payload"""
+    return f"data: {dumps(event)}\n\n"
+
+def stream_token_response(user_id, config):
+    """Body of POST /api/events/token"""
+    return {
+        'token': create_stream_token(config['SECRET_KEY'], user_id),
+        'expires_in': int(config.get('EVENTS_TOKEN_TTL_SECONDS', 60))
+    }
+
+def stream_user(config, token):
+    """User id of a stream token from ?token=, or None"""
+    return read_stream_token(config['SECRET_KEY'], token, int(config.get('EVENTS_TOKEN_TTL_SECONDS', 60)))
+
+STREAM_LIMIT_HEADERS = {'Retry-After': '30'}
+
+@events_bp.route('/token', methods=['POST'])
+@jwt_required()
+def create_events_token():
+    """Short-lived token for opening the stream (EventSource cannot set headers)"""
+    return jsonify(stream_token_response(get_jwt_identity(), current_app.config))
+
+@events_bp.route('/', methods=['GET'])
+def stream_events():
+    user_id = stream_user(current_app.config, request.args.get('token', ''))
+    if user_id is None:
+        return jsonify({'error': 'Invalid or expired stream token'}), 401
+    heartbeat = float(current_app.config.get('EVENTS_HEARTBEAT', 15))
+    max_seconds = float(current_app.config.get('EVENTS_MAX_STREAM_SECONDS', 300))
+    try:
+        subscription = subscribe_events(user_id)
+    except StreamLimitError as e:
+        return jsonify({'error': str(e)}), 429, STREAM_LIMIT_HEADERS
+
+    def generate():
+        # Each open stream holds a worker thread, so streams end after max_seconds
+        # and EventSource reconnects on its own (after `retry` milliseconds)
+        deadline = time.monotonic() + max_seconds
+        try:
+            yield 'retry: 3000\n\n'
+            yield format_event({'type': 'ready'})
+            while time.monotonic() < deadline:
+                event = subscription.get(timeout=heartbeat)
+                # A comment line keeps proxies from closing an idle stream
+                yield format_event(event) if event is not None else ': keepalive\n\n'
+        finally:
+            unsubscribe_events(subscription)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
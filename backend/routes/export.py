@@ -0,0 +1,143 @@
+"""
+Full-account export streamed as NDJSON or CSV
+"""
+
+import csv
+import io
+import zlib
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from database import (
+    get_user_by_id, get_or_create_user_stats, iter_user_habits, iter_habit_completions,
+    iter_user_daily_activities, iter_ai_chat_messages
+)
+from responses import dumps_bytes
+
+export_bp = Blueprint('export', __name__)
+
+# Output is handed to the client in chunks of about this many bytes
+CHUNK_SIZE = 64 * 1024
+
+CSV_COLUMNS = {
+    'habit': ['id', 'title', 'description', 'frequency', 'target_count',
+              'current_streak', 'longest_streak', 'created_at'],
+    'completion': ['id', 'habit_id', 'completed_at', 'notes'],
+    'activity': ['activity_date'],
+    'stats': ['total_habits_created', 'total_completions', 'longest_daily_streak'],
+    'chat': ['id', 'role', 'text', 'created_at']
+}
+
+def iter_export_records(user_id):
+    """Yield (type, record) pairs for everything stored about a user"""
+    habit_ids = []
+    for habit in iter_user_habits(user_id):
+        habit_ids.append(habit['_id'])
+        yield 'habit', {
+            'id': str(habit['_id']),
+            'title': habit['title'],
+            'description': habit.get('description', ''),
+            'frequency': habit['frequency'],
+            'target_count': habit['target_count'],
+            'current_streak': habit.get('current_streak', 0),
+            'longest_streak': habit.get('longest_streak', 0),
+            'created_at': habit['created_at'].isoformat()
+        }
+
+    if habit_ids:
+        for completion in iter_habit_completions(habit_ids):
+            yield 'completion', {
+                'id': str(completion['_id']),
+                'habit_id': str(completion['habit_id']),
+                'completed_at': completion['completed_at'].isoformat(),
+                'notes': completion.get('notes', '')
+            }
+
+    for row in iter_user_daily_activities(user_id):
+        yield 'activity', {'activity_date': row['activity_date'].date().isoformat()}
+
+    stats = get_or_create_user_stats(user_id) or {}
+    yield 'stats', {
+        'total_habits_created': stats.get('total_habits_created', 0),
+        'total_completions': stats.get('total_completions', 0),
+        'longest_daily_streak': stats.get('longest_daily_streak', 0)
+    }
+
+    for message in iter_ai_chat_messages(user_id):
+        yield 'chat', {
+            'id': str(message['_id']),
+            'role': message['role'],
+            'text': message['text'],
+            'created_at': message['created_at'].isoformat()
+        }
+
+def ndjson_chunks(records):
+    """Encode records as NDJSON, one `{"type": ..., ...}` object per line"""
+    buf = []
+    size = 0
+    for record_type, record in records:
+        line = dumps_bytes({'type': record_type, **record}) + b'\n'
+        buf.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield b''.join(buf)
+            buf = []
+            size = 0
+    if buf:
+        yield b''.join(buf)
+
+def csv_chunks(records):
+    """Encode records as CSV; each section starts with its own header row, first column is `type`"""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    current_type = None
+    for record_type, record in records:
+        columns = CSV_COLUMNS[record_type]
+        if record_type != current_type:
+            writer.writerow(['type'] + columns)
+            current_type = record_type
+        writer.writerow([record_type] + [record[c] for c in columns])
+        if out.tell() >= CHUNK_SIZE:
+            yield out.getvalue().encode('utf-8')
+            out.seek(0)
+            out.truncate()
+    if out.tell():
+        yield out.getvalue().encode('utf-8')
+
+def gzip_chunks(chunks, level=6):
+    """Gzip a stream of byte chunks on the fly"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+@export_bp.route('/', methods=['GET'])
+@jwt_required()
+def export_account():
+    user_id = get_jwt_identity()
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'error': 'Format must be ndjson or csv'}), 400
+
+    user = get_user_by_id(user_id)
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+
+    records = iter_export_records(user_id)
+    if export_format == 'csv':
+        chunks, mimetype = csv_chunks(records), 'text/csv'
+    else:
+        chunks, mimetype = ndjson_chunks(records), 'application/x-ndjson'
+
+    headers = {
+        'Content-Disposition': f'attachment; filename="habit-tracker-{user["username"]}.{export_format}"',
+        'Cache-Control': 'no-store',
+        'Vary': 'Accept-Encoding'
+    }
+    # Parsed with q-values, so `gzip;q=0` opts out
+    if request.accept_encodings['gzip'] > 0:
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
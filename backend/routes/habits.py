@@ -8,75 +8,70 @@ from datetime import datetime, timedelta
 from database import (
     get_user_habits, create_habit, get_habit_by_id, update_habit, delete_habit,
     create_habit_completion, get_habit_completions_today, get_habit_completions_period,
-    get_habit_completions_yesterday, record_user_daily_activity, update_user_stats,
-    get_user_daily_activities, get_or_create_user_stats, get_collections
+    record_user_daily_activity, update_user_stats, get_user_activity_dates, raise_longest_daily_streak,
+    record_completion_rollup, get_user_daily_rollups, sum_rollup_counts, causal_session
 )
-from bson import ObjectId
+from streaks import period_bounds, previous_period_bounds, count_daily_streak
+from records import HABIT_LIST_FIELDS
+from idempotency import idempotent
 
 habits_bp = Blueprint('habits', __name__)
 
+def rollup_window(today):
+    """Day range [start, end) whose rollups cover today and every habit's current period"""
+    # The widest window is the current month or the current ISO week
+    window_start = min(
+        datetime.combine(today.replace(day=1), datetime.min.time()),
+        datetime.combine(today - timedelta(days=today.weekday()), datetime.min.time())
+    )
+    return window_start, datetime.combine(today, datetime.min.time()) + timedelta(days=1)
+
+def serialize_habits(habits, rollups, today):
+    """Habit payloads with today's and this period's completion counts from the rollups"""
+    today_start = datetime.combine(today, datetime.min.time())
+    tomorrow_start = today_start + timedelta(days=1)
+    habits_data = []
+    for habit in habits:
+        today_completions = sum_rollup_counts(rollups, habit['_id'], today_start, tomorrow_start)
+
+        # Determine period window based on frequency
+        period_start, period_end = period_bounds(habit['frequency'], today)
+        period_completions = sum_rollup_counts(rollups, habit['_id'], period_start, period_end)
+
+        habits_data.append({
+            'id': str(habit['_id']),
+            'title': habit['title'],
+            'description': habit['description'],
+            'frequency': habit['frequency'],
+            'target_count': habit['target_count'],
+            'current_streak': habit['current_streak'],
+            'longest_streak': habit['longest_streak'],
+            'created_at': habit['created_at'].isoformat(),
+            'today_completions': today_completions,
+            'is_completed_today': today_completions >= habit['target_count'],
+            'period_completions': period_completions,
+            'is_completed_period': period_completions >= habit['target_count']
+        })
+    return habits_data
+
 @habits_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_habits():
     try:
         user_id = get_jwt_identity()
-        habits = get_user_habits(user_id)
-        
-        habits_data = []
-        now = datetime.utcnow()
-        today = now.date()
-        
-        for habit in habits:
-            today_completions = get_habit_completions_today(habit['_id'])
-            
-            # Determine period window based on frequency
-            period_start = None
-            period_end = None
-            if habit['frequency'] == 'daily':
-                period_start = datetime.combine(today, datetime.min.time())
-                period_end = period_start + timedelta(days=1)
-            elif habit['frequency'] == 'weekly':
-                # ISO week: Monday start
-                weekday = today.weekday()  # Monday=0
-                week_start_date = today - timedelta(days=weekday)
-                period_start = datetime.combine(week_start_date, datetime.min.time())
-                period_end = period_start + timedelta(days=7)
-            elif habit['frequency'] == 'monthly':
-                month_start_date = today.replace(day=1)
-                if month_start_date.month == 12:
-                    next_month_start = month_start_date.replace(year=month_start_date.year + 1, month=1)
-                else:
-                    next_month_start = month_start_date.replace(month=month_start_date.month + 1)
-                period_start = datetime.combine(month_start_date, datetime.min.time())
-                period_end = datetime.combine(next_month_start, datetime.min.time())
-            else:
-                # Default to daily if unknown
-                period_start = datetime.combine(today, datetime.min.time())
-                period_end = period_start + timedelta(days=1)
-
-            period_completions = get_habit_completions_period(habit['_id'], period_start, period_end)
-            
-            habits_data.append({
-                'id': str(habit['_id']),
-                'title': habit['title'],
-                'description': habit['description'],
-                'frequency': habit['frequency'],
-                'target_count': habit['target_count'],
-                'current_streak': habit['current_streak'],
-                'longest_streak': habit['longest_streak'],
-                'created_at': habit['created_at'].isoformat(),
-                'today_completions': today_completions,
-                'is_completed_today': today_completions >= habit['target_count'],
-                'period_completions': period_completions,
-                'is_completed_period': period_completions >= habit['target_count']
-            })
-        
-        return jsonify(habits_data)
+        habits = get_user_habits(user_id, HABIT_LIST_FIELDS)
+        today = datetime.utcnow().date()
+
+        # One read of the (user, day) rollups covers every habit's window
+        rollups = get_user_daily_rollups(user_id, *rollup_window(today)) if habits else []
+        return jsonify(serialize_habits(habits, rollups, today))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @habits_bp.route('/', methods=['POST'])
 @jwt_required()
+@causal_session()
+@idempotent()
 def create_habit_route():
     user_id = get_jwt_identity()
     data = request.get_json()
@@ -108,6 +103,7 @@ def create_habit_route():
 
 @habits_bp.route('/<habit_id>', methods=['PUT'])
 @jwt_required()
+@causal_session()
 def update_habit_route(habit_id):
     user_id = get_jwt_identity()
     habit = get_habit_by_id(habit_id, user_id)
@@ -144,6 +140,7 @@ def update_habit_route(habit_id):
 
 @habits_bp.route('/<habit_id>', methods=['DELETE'])
 @jwt_required()
+@causal_session()
 def delete_habit_route(habit_id):
     user_id = get_jwt_identity()
     
@@ -157,6 +154,8 @@ def delete_habit_route(habit_id):
 
 @habits_bp.route('/<habit_id>/complete', methods=['POST'])
 @jwt_required()
+@causal_session()
+@idempotent()
 def complete_habit(habit_id):
     user_id = get_jwt_identity()
     habit = get_habit_by_id(habit_id, user_id)
@@ -179,16 +178,24 @@ def complete_habit(habit_id):
     
     # Get updated completion count
     new_completions = current_completions + 1
+
+    # Keep the (user, day) rollup in step with the raw completion
+    record_completion_rollup(user_id, habit_id, today, met=new_completions >= habit['target_count'])
     
-    # Update streak only if habit is fully completed
+    # Update streak only once the period (day, week or month) reaches its
+    # target; this happens exactly once per period as completions go up by one
     current_streak = habit['current_streak']
     longest_streak = habit['longest_streak']
-    
-    if new_completions >= habit['target_count']:
-        # Check if habit was completed yesterday for streak calculation
-        yesterday_completion = get_habit_completions_yesterday(habit_id)
-        
-        if yesterday_completion:
+    frequency = habit['frequency']
+    if frequency == 'daily':
+        period_completions = new_completions
+    else:
+        period_start, period_end = period_bounds(frequency, today)
+        period_completions = get_habit_completions_period(habit_id, period_start, period_end)
+
+    if period_completions == habit['target_count']:
+        prev_start, prev_end = previous_period_bounds(frequency, today)
+        if get_habit_completions_period(habit_id, prev_start, prev_end) >= habit['target_count']:
             current_streak += 1
         else:
             current_streak = 1
@@ -200,7 +207,8 @@ def complete_habit(habit_id):
             'current_streak': current_streak,
             'longest_streak': longest_streak
         })
-
+    
+    if new_completions >= habit['target_count']:
         # Record user-wide daily activity for streaks (idempotent per day)
         record_user_daily_activity(user_id, today)
 
@@ -208,26 +216,13 @@ def complete_habit(habit_id):
         update_user_stats(user_id, {'total_completions': 1})
 
         # Calculate current daily streak and update longest if needed
-        activity_rows = get_user_daily_activities(user_id)
-        completed_dates = {row['activity_date'].date() if hasattr(row['activity_date'], 'date') else row['activity_date'] for row in activity_rows}
+        completed_dates = get_user_activity_dates(user_id)
         
         # Calculate current daily streak
-        current_daily_streak = 0
-        if today in completed_dates:
-            anchor = today
-            d = anchor
-            while d in completed_dates:
-                current_daily_streak += 1
-                d = d - timedelta(days=1)
+        current_daily_streak = count_daily_streak(completed_dates, today)
         
         # Update longest streak only if current streak is higher
-        stats = get_or_create_user_stats(user_id)
-        if current_daily_streak > stats['longest_daily_streak']:
-            collections = get_collections()
-            collections['user_stats'].update_one(
-                {'user_id': ObjectId(user_id)},
-                {'$set': {'longest_daily_streak': current_daily_streak}}
-            )
+        raise_longest_daily_streak(user_id, current_daily_streak)
     
     # Return updated habit data
     updated_habit = get_habit_by_id(habit_id, user_id)
@@ -0,0 +1,230 @@
+"""
+Bulk import of habits and historical completions from NDJSON or CSV
+"""
+
+import csv
+import gzip
+import io
+import json
+import time
+import zlib
+from datetime import datetime
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import BulkWriteError
+from database import (
+    get_user_habits, bulk_insert_habits, bulk_insert_completions,
+    update_user_stats, refresh_user_aggregates, backdate_habits
+)
+from records import HABIT_ID_FIELDS
+
+import_bp = Blueprint('import', __name__)
+
+# Rows buffered before each bulk_write
+CHUNK_SIZE = 1000
+# Per-row errors listed in the report (the total is always counted)
+MAX_REPORTED_ERRORS = 100
+
+FREQUENCIES = ('daily', 'weekly', 'monthly')
+
+class RowError(ValueError):
+    """A row that fails validation"""
+
+def parse_habit(row, user_id, now):
+    title = str(row.get('title') or '').strip()
+    if not title:
+        raise RowError('title is required')
+    frequency = row.get('frequency') or 'daily'
+    if frequency not in FREQUENCIES:
+        raise RowError(f'frequency must be one of {", ".join(FREQUENCIES)}')
+    try:
+        target_count = int(row.get('target_count') or 1)
+    except (TypeError, ValueError):
+        raise RowError('target_count must be an integer')
+    if not 1 <= target_count <= 100:
+        raise RowError('target_count must be between 1 and 100')
+    created_at = parse_datetime(row['created_at'], 'created_at') if row.get('created_at') else now
+    return {
+        '_id': ObjectId(),
+        'title': title[:100],
+        'description': str(row.get('description') or '')[:500],
+        'frequency': frequency,
+        'target_count': target_count,
+        'current_streak': 0,
+        'longest_streak': 0,
+        'created_at': created_at,
+        'user_id': ObjectId(user_id)
+    }
+
+def parse_completion(row, habit_id, now):
+    if not row.get('completed_at'):
+        raise RowError('completed_at is required')
+    completed_at = parse_datetime(row['completed_at'], 'completed_at')
+    if completed_at > now:
+        raise RowError('completed_at is in the future')
+    return {
+        'habit_id': habit_id,
+        'completed_at': completed_at,
+        'notes': str(row.get('notes') or '')[:500]
+    }
+
+def parse_datetime(value, field):
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        raise RowError(f'{field} must be an ISO 8601 date or datetime')
+    if parsed.tzinfo is not None:
+        # Stored datetimes are naive UTC
+        try:
+            parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)
+        except (OverflowError, ValueError):
+            raise RowError(f'{field} is out of range')
+    return parsed
+
+def iter_ndjson_rows(text):
+    """Yield (line_number, row) from NDJSON text"""
+    for line_number, line in enumerate(text, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, RowError(f'invalid JSON: {e.msg}')
+            continue
+        if not isinstance(row, dict):
+            yield line_number, RowError('each line must be a JSON object')
+            continue
+        yield line_number, row
+
+def iter_csv_rows(text):
+    """Yield (line_number, row) from CSV text.
+
+    A row whose first cell is `type` starts a new section header (the export
+    layout). Without a `type` column, a header with `completed_at` describes
+    completions and any other header describes habits.
+    """
+    reader = csv.reader(text)
+    columns = None
+    for row in reader:
+        line_number = reader.line_num
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        if columns is None or row[0] == 'type':
+            columns = [c.strip() for c in row]
+            continue
+        record = dict(zip(columns, row))
+        if 'type' not in record:
+            record['type'] = 'completion' if 'completed_at' in columns else 'habit'
+        yield line_number, record
+
+@import_bp.route('/', methods=['POST'])
+@jwt_required()
+def import_data():
+    user_id = get_jwt_identity()
+    started = time.perf_counter()
+
+    import_format = request.args.get('format')
+    if not import_format:
+        import_format = 'csv' if 'csv' in (request.content_type or '') else 'ndjson'
+    if import_format not in ('ndjson', 'csv'):
+        return jsonify({'error': 'Format must be ndjson or csv'}), 400
+
+    # Read the body as a stream (optionally gzip-compressed), never all at once
+    body = request.stream
+    if request.headers.get('Content-Encoding') == 'gzip':
+        body = gzip.GzipFile(fileobj=body)
+    text = io.TextIOWrapper(body, encoding='utf-8', newline='')
+    rows = iter_csv_rows(text) if import_format == 'csv' else iter_ndjson_rows(text)
+
+    now = datetime.utcnow()
+    existing = {str(h['_id']): h['_id'] for h in get_user_habits(user_id, HABIT_ID_FIELDS)}
+    source_ids = {}  # habit ids from the file -> ids of the imported habits
+    undated = []  # imported habits without created_at; backdated to their first completion
+    habit_buffer, completion_buffer = [], []
+    body_error = False
+    report = {
+        'rows': 0,
+        'habits_imported': 0,
+        'completions_imported': 0,
+        'skipped': 0,
+        'error_count': 0,
+        'errors': []
+    }
+
+    def flush():
+        # Habits go first so completions never reference a habit that is not stored yet
+        for key, insert, buffer in (
+            ('habits_imported', bulk_insert_habits, habit_buffer),
+            ('completions_imported', bulk_insert_completions, completion_buffer)
+        ):
+            try:
+                report[key] += insert(buffer)
+            except BulkWriteError as e:
+                report[key] += e.details.get('nInserted', 0)
+                raise
+            finally:
+                buffer.clear()
+
+    try:
+        try:
+            for line_number, row in rows:
+                report['rows'] += 1
+                try:
+                    if isinstance(row, RowError):
+                        raise row
+                    record_type = row.get('type') or ('completion' if 'completed_at' in row else 'habit')
+                    if record_type == 'habit':
+                        habit = parse_habit(row, user_id, now)
+                        if row.get('id'):
+                            source_ids[str(row['id'])] = habit['_id']
+                        if not row.get('created_at'):
+                            undated.append(habit['_id'])
+                        habit_buffer.append(habit)
+                    elif record_type == 'completion':
+                        source_id = str(row.get('habit_id') or '')
+                        habit_id = source_ids.get(source_id) or existing.get(source_id)
+                        if habit_id is None:
+                            raise RowError('habit_id does not match an imported or existing habit')
+                        completion_buffer.append(parse_completion(row, habit_id, now))
+                    else:
+                        # Activity, stats and chat are derived or not importable
+                        report['skipped'] += 1
+                except (RowError, InvalidId) as e:
+                    report['error_count'] += 1
+                    if len(report['errors']) < MAX_REPORTED_ERRORS:
+                        report['errors'].append({'line': line_number, 'error': str(e)})
+                if len(habit_buffer) + len(completion_buffer) >= CHUNK_SIZE:
+                    flush()
+            flush()
+        except (UnicodeDecodeError, OSError, EOFError, zlib.error, csv.Error) as e:
+            # A truncated or corrupt (gzip) body; the rows read before it are still imported
+            body_error = True
+            report['errors'].append({'line': None, 'error': f'could not read body: {e}'})
+            report['error_count'] += 1
+            flush()
+    except BulkWriteError as e:
+        # Later rows may reference what failed to be written, so the import stops here
+        write_errors = e.details.get('writeErrors', [])
+        report['error_count'] += len(write_errors) or 1
+        reason = write_errors[0].get('errmsg') if write_errors else str(e)
+        report['errors'].append({'line': None, 'error': f'import stopped, a chunk could not be written: {reason}'})
+
+    # Aggregates are recomputed once for the whole import, not per row
+    if report['habits_imported'] or report['completions_imported']:
+        backdate_habits(undated)
+        # total_completions counts met habit-days, like completing habits one by one does
+        met_added = refresh_user_aggregates(user_id)
+        update_user_stats(user_id, {
+            'total_habits_created': report['habits_imported'],
+            'total_completions': met_added
+        })
+
+    elapsed = time.perf_counter() - started
+    report['seconds'] = round(elapsed, 3)
+    report['rows_per_second'] = round(report['rows'] / elapsed) if elapsed > 0 else report['rows']
+    imported = report['habits_imported'] or report['completions_imported']
+    status = 400 if body_error or (report['error_count'] and not imported) else 200
+    return jsonify(report), status
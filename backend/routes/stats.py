@@ -2,13 +2,16 @@
 Statistics and analytics routes
 """
 
-from flask import Blueprint, jsonify
+from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
 from database import (
-    get_user_daily_activities, get_collections, get_or_create_user_stats
+    get_user_activity_dates, get_or_create_user_stats, raise_longest_daily_streak,
+    get_habit_by_id, get_user_habits, get_completion_timestamps, causal_session
 )
-from bson import ObjectId
+from analytics import parse_range, history_start, history_summary
+from streaks import current_daily_streak
+from records import HABIT_HISTORY_FIELDS
 
 stats_bp = Blueprint('stats', __name__)
 
@@ -35,39 +38,58 @@ def get_global_streak():
         today = datetime.utcnow().date()
         
         # Get activity dates for this user
-        activity_rows = get_user_daily_activities(user_id)
-        completed_dates = {row['activity_date'].date() if hasattr(row['activity_date'], 'date') else row['activity_date'] for row in activity_rows}
+        completed_dates = get_user_activity_dates(user_id)
 
-        if not completed_dates:
+        # Anchored at today if completed, else at yesterday if completed, else 0
+        current_streak = current_daily_streak(completed_dates, today)
+        if not current_streak:
             return jsonify({'current_streak': 0})
 
-        # Anchor at today if completed, else at yesterday if completed, else 0
-        anchor = None
-        if today in completed_dates:
-            anchor = today
-        elif (today - timedelta(days=1)) in completed_dates:
-            anchor = today - timedelta(days=1)
-        else:
-            return jsonify({'current_streak': 0})
-
-        # Count consecutive days backwards from anchor
-        current_streak = 0
-        d = anchor
-        while d in completed_dates:
-            current_streak += 1
-            d = d - timedelta(days=1)
-
         # Also ensure longest_daily_streak in stored stats never decreases
-        collections = get_collections()
-        existing = collections['user_stats'].find_one({'user_id': ObjectId(user_id)}) or {}
-        longest_existing = existing.get('longest_daily_streak', 0)
-        if current_streak > longest_existing:
-            collections['user_stats'].update_one(
-                {'user_id': ObjectId(user_id)},
-                {'$set': {'longest_daily_streak': current_streak}},
-                upsert=True
-            )
+        raise_longest_daily_streak(user_id, current_streak)
 
         return jsonify({'current_streak': current_streak})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@stats_bp.route('/history', methods=['GET'])
+@jwt_required()
+@causal_session(analytics=True)
+def get_history():
+    try:
+        user_id = get_jwt_identity()
+        days = parse_range(request.args.get('range'))
+        if days is None:
+            return jsonify({'error': 'Invalid range'}), 400
+
+        today = datetime.utcnow().date()
+        start = datetime.combine(today - timedelta(days=days - 1), datetime.min.time())
+        end = datetime.combine(today + timedelta(days=1), datetime.min.time())
+
+        # A single habit is measured against its target per period; all habits against any completion
+        habit_id = request.args.get('habit_id')
+        if habit_id:
+            habit = get_habit_by_id(habit_id, user_id)
+            if not habit:
+                return jsonify({'error': 'Habit not found'}), 404
+            habits = [habit]
+            target_count = habit['target_count']
+            frequency = habit.get('frequency', 'daily')
+        else:
+            habits = get_user_habits(user_id, HABIT_HISTORY_FIELDS)
+            target_count = 1
+            frequency = 'daily'
+
+        active_from = None
+        if habits:
+            first_created = min(h['created_at'] for h in habits)
+            active_from = datetime.combine(first_created.date(), datetime.min.time())
+
+        query_start = history_start(start, frequency)
+        timestamps = get_completion_timestamps([h['_id'] for h in habits], query_start, end) if habits else []
+        summary = history_summary(timestamps, start, days, target_count, active_from, frequency)
+        summary['habit_id'] = habit_id
+        summary['range'] = request.args.get('range') or 'year'
+        return jsonify(summary)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1 @@
+# Async routes package (ASGI app)
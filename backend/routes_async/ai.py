@@ -0,0 +1,179 @@
+"""
+AI-powered features (async): suggestions, habit generation, chat, and insights
+"""
+
+from quart import Blueprint, request, jsonify
+from jwt_async import jwt_required, get_jwt_identity
+import google.generativeai as genai
+from ratelimit import rate_limited_async
+from recommendations import recommend_habits, learn_habits
+from database_async import (
+    get_user_habits, create_ai_chat_message, get_ai_chat_history,
+    get_user_habit_totals
+)
+from routes.ai import (
+    BASELINE_HABITS, BASELINE_CHAT_REPLY, ai_enabled,
+    build_generate_habits_prompt, parse_generated_habits, build_baseline_insight
+)
+
+ai_bp = Blueprint('ai', __name__)
+
+def _message_json(message):
+    return {
+        'id': str(message['_id']),
+        'role': message['role'],
+        'text': message['text'],
+        'created_at': message['created_at'].isoformat()
+    }
+
+@ai_bp.route('/suggestions', methods=['POST'])
+@jwt_required()
+@rate_limited_async()
+async def get_ai_suggestions():
+    user_id = get_jwt_identity()
+    data = await request.get_json()
+    
+    if not data or not data.get('query'):
+        return jsonify({'error': 'Query is required'}), 400
+    
+    if not ai_enabled():
+        return jsonify({'error': 'AI features are not configured. Please set up your Gemini API key.'}), 503
+    
+    try:
+        model = genai.GenerativeModel('gemini-2.0-flash')
+        habits = await get_user_habits(user_id)
+        habit_titles = [habit['title'] for habit in habits]
+        
+        prompt = f"""
+        User's current habits: {', '.join(habit_titles)}
+        
+        User query: {data['query']}
+        
+        Please provide helpful suggestions for habit tracking, improvement, or new habits.
+        Keep the response concise and actionable.
+        """
+        
+        response = await model.generate_content_async(prompt)
+        return jsonify({'suggestion': response.text})
+    except Exception:
+        return jsonify({'error': 'Failed to generate AI suggestion'}), 500
+
+@ai_bp.route('/generate-habits', methods=['POST'])
+@jwt_required()
+@rate_limited_async()
+async def generate_habits():
+    user_id = get_jwt_identity()
+    data = await request.get_json()
+    
+    if not data or not data.get('query'):
+        return jsonify({'error': 'Query is required'}), 400
+    
+    query = data['query'].strip()
+    existing_titles = [h['title'] for h in await get_user_habits(user_id)]
+    
+    # Common requests are answered from the local catalog without calling Gemini
+    local_habits = recommend_habits(query, user_id, existing_titles)
+    if local_habits:
+        return jsonify({'habits': local_habits})
+    
+    if not ai_enabled():
+        return jsonify({'habits': BASELINE_HABITS})
+    
+    try:
+        model = genai.GenerativeModel('gemini-2.0-flash')
+        prompt = build_generate_habits_prompt(query, existing_titles)
+        response = await model.generate_content_async(prompt)
+        valid_habits = parse_generated_habits(response.text.strip())
+        if valid_habits:
+            learn_habits(user_id, query, valid_habits)
+        # Fallback to baseline if AI response is invalid
+        return jsonify({'habits': valid_habits or BASELINE_HABITS})
+    except Exception:
+        return jsonify({'habits': BASELINE_HABITS})
+
+@ai_bp.route('/chat/history', methods=['GET'])
+@jwt_required()
+async def get_ai_chat_history_route():
+    user_id = get_jwt_identity()
+    limit = request.args.get('limit', type=int)
+    messages = await get_ai_chat_history(user_id, limit=limit if limit and limit > 0 else None)
+    return jsonify([_message_json(m) for m in messages])
+
+@ai_bp.route('/chat', methods=['POST'])
+@jwt_required()
+@rate_limited_async()
+async def ai_chat():
+    user_id = get_jwt_identity()
+    data = await request.get_json(silent=True) or {}
+    user_message = (data.get('message') or '').strip()
+    if not user_message:
+        return jsonify({'error': 'Message is required'}), 400
+
+    # Save user message
+    await create_ai_chat_message(user_id, 'user', user_message)
+
+    # If no AI configured, return baseline reply and store it
+    ai_text = BASELINE_CHAT_REPLY
+    if ai_enabled():
+        # Try AI response; on failure, fall back to baseline
+        try:
+            model = genai.GenerativeModel('gemini-2.0-flash')
+            habits = await get_user_habits(user_id)
+            habit_titles = [h['title'] for h in habits]
+            prompt = (
+                f"User's current habits: {', '.join(habit_titles)}\n"
+                f"User message: {user_message}\n"
+                "Respond as a concise, encouraging habit coach. Keep it under 120 words."
+            )
+            response = await model.generate_content_async(prompt)
+            ai_text = (response.text or BASELINE_CHAT_REPLY).strip()
+        except Exception:
+            ai_text = BASELINE_CHAT_REPLY
+
+    assistant_msg = await create_ai_chat_message(user_id, 'assistant', ai_text)
+    return jsonify({'assistant': _message_json(assistant_msg)})
+
+@ai_bp.route('/insights', methods=['GET'])
+@jwt_required()
+@rate_limited_async()
+async def get_ai_insights():
+    user_id = get_jwt_identity()
+    
+    # Always compute a safe, non-AI baseline insight
+    habits = await get_user_habits(user_id)
+    if not habits:
+        return jsonify({'insight': 'Start by creating your first habit to get personalized insights!'})
+
+    baseline_insight = build_baseline_insight(habits)
+
+    # If AI not configured, return baseline without error
+    if not ai_enabled():
+        return jsonify({'insight': baseline_insight})
+
+    # Try AI enrichment, but fall back to baseline on any error
+    try:
+        model = genai.GenerativeModel('gemini-2.0-flash')
+        totals = await get_user_habit_totals(user_id)
+        habit_data = [
+            {
+                'title': habit['title'],
+                'current_streak': habit['current_streak'],
+                'longest_streak': habit['longest_streak'],
+                'total_completions': totals.get(str(habit['_id']), 0),
+                'frequency': habit['frequency']
+            }
+            for habit in habits
+        ]
+
+        prompt = f"""
+        Analyze this user's habit tracking data and provide personalized insights:
+        Habits: {habit_data}
+        Please provide a short, encouraging paragraph with strengths and 2-3 actionable suggestions.
+        Keep it under 120 words.
+        """
+
+        response = await model.generate_content_async(prompt)
+        ai_text = (response.text or '').strip()
+        return jsonify({'insight': ai_text or baseline_insight})
+    except Exception:
+        return jsonify({'insight': baseline_insight})
@@ -0,0 +1,42 @@
+"""
+Composite dashboard route (async): habits, current streak and stats in one request
+"""
+
+import asyncio
+from datetime import datetime
+from quart import Blueprint, jsonify
+from jwt_async import jwt_required, get_jwt_identity
+from database_async import (
+    get_user_habits, get_user_daily_rollups, get_user_daily_activities,
+    get_or_create_user_stats, raise_longest_daily_streak
+)
+from routes.habits import rollup_window
+from routes.dashboard import dashboard_payload
+
+dashboard_bp = Blueprint('dashboard', __name__)
+
+@dashboard_bp.route('/', methods=['GET'])
+@jwt_required()
+async def get_dashboard():
+    try:
+        user_id = get_jwt_identity()
+        today = datetime.utcnow().date()
+
+        # The reads are independent, so they run concurrently on the loop
+        habits, rollups, activity_rows, stats = await asyncio.gather(
+            get_user_habits(user_id),
+            get_user_daily_rollups(user_id, *rollup_window(today)),
+            get_user_daily_activities(user_id),
+            get_or_create_user_stats(user_id)
+        )
+        completed_dates = {row['activity_date'].date() for row in activity_rows}
+        payload = dashboard_payload(habits, rollups, completed_dates, stats, today)
+
+        # Also ensure longest_daily_streak in stored stats never decreases
+        if payload['current_streak'] > payload['stats']['longest_daily_streak']:
+            await raise_longest_daily_streak(user_id, payload['current_streak'])
+            payload['stats']['longest_daily_streak'] = payload['current_streak']
+
+        return jsonify(payload)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,51 @@
+"""
+Server-sent live change events for the current user (async)
+
+Each open stream is a coroutine waiting on its queue, not a worker thread.
+"""
+
+import time
+from quart import Blueprint, Response, current_app, jsonify, request
+from jwt_async import jwt_required, get_jwt_identity
+from database_async import subscribe_events, unsubscribe_events
+from events import StreamLimitError
+from routes.events import format_event, stream_token_response, stream_user, STREAM_LIMIT_HEADERS
+
+events_bp = Blueprint('events', __name__)
+
+@events_bp.route('/token', methods=['POST'])
+@jwt_required()
+async def create_events_token():
+    """Short-lived token for opening the stream (EventSource cannot set headers)"""
+    return jsonify(stream_token_response(get_jwt_identity(), current_app.config))
+
+@events_bp.route('/', methods=['GET'])
+async def stream_events():
+    user_id = stream_user(current_app.config, request.args.get('token', ''))
+    if user_id is None:
+        return jsonify({'error': 'Invalid or expired stream token'}), 401
+    heartbeat = float(current_app.config.get('EVENTS_HEARTBEAT', 15))
+    max_seconds = float(current_app.config.get('EVENTS_MAX_STREAM_SECONDS', 300))
+    try:
+        subscription = subscribe_events(user_id)
+    except StreamLimitError as e:
+        return jsonify({'error': str(e)}), 429, STREAM_LIMIT_HEADERS
+
+    async def generate():
+        # Streams still end after max_seconds so clients pick up a fresh token
+        deadline = time.monotonic() + max_seconds
+        try:
+            yield 'retry: 3000\n\n'.encode()
+            yield format_event({'type': 'ready'}).encode()
+            while time.monotonic() < deadline:
+                event = await subscription.get(timeout=heartbeat)
+                yield (format_event(event) if event is not None else ': keepalive\n\n').encode()
+        finally:
+            unsubscribe_events(subscription)
+
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    response.timeout = None  # Quart's RESPONSE_TIMEOUT would cut the stream short
+    return response
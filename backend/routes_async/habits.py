@@ -0,0 +1,188 @@
+"""
+Habit management routes (async)
+"""
+
+from quart import Blueprint, request, jsonify
+from datetime import datetime
+from jwt_async import jwt_required, get_jwt_identity
+from database_async import (
+    get_user_habits, create_habit, get_habit_by_id, update_habit, delete_habit,
+    create_habit_completion, get_habit_completions_today, get_habit_completions_period,
+    record_user_daily_activity, update_user_stats, get_user_daily_activities,
+    raise_longest_daily_streak,
+    record_completion_rollup, get_user_daily_rollups
+)
+from streaks import period_bounds, previous_period_bounds, count_daily_streak
+from routes.habits import rollup_window, serialize_habits
+from idempotency_async import idempotent
+
+habits_bp = Blueprint('habits', __name__)
+
+@habits_bp.route('/', methods=['GET'])
+@jwt_required()
+async def get_habits():
+    try:
+        user_id = get_jwt_identity()
+        habits = await get_user_habits(user_id)
+        today = datetime.utcnow().date()
+
+        # One read of the (user, day) rollups covers every habit's window
+        rollups = await get_user_daily_rollups(user_id, *rollup_window(today)) if habits else []
+        return jsonify(serialize_habits(habits, rollups, today))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@habits_bp.route('/', methods=['POST'])
+@jwt_required()
+@idempotent()
+async def create_habit_route():
+    user_id = get_jwt_identity()
+    data = await request.get_json()
+    
+    if not data or not data.get('title'):
+        return jsonify({'error': 'Title is required'}), 400
+    
+    habit = await create_habit(
+        user_id,
+        data['title'],
+        data.get('description', ''),
+        data.get('frequency', 'daily'),
+        data.get('target_count', 1)
+    )
+    
+    # Update stats: increment total habits ever created by 1 (never decreases)
+    await update_user_stats(user_id, {'total_habits_created': 1})
+    
+    return jsonify({
+        'id': str(habit['_id']),
+        'title': habit['title'],
+        'description': habit['description'],
+        'frequency': habit['frequency'],
+        'target_count': habit['target_count'],
+        'current_streak': habit['current_streak'],
+        'longest_streak': habit['longest_streak'],
+        'created_at': habit['created_at'].isoformat()
+    }), 201
+
+@habits_bp.route('/<habit_id>', methods=['PUT'])
+@jwt_required()
+async def update_habit_route(habit_id):
+    user_id = get_jwt_identity()
+    habit = await get_habit_by_id(habit_id, user_id)
+    
+    if not habit:
+        return jsonify({'error': 'Habit not found'}), 404
+    
+    data = await request.get_json()
+    updates = {}
+    
+    if data.get('title'):
+        updates['title'] = data['title']
+    if data.get('description') is not None:
+        updates['description'] = data['description']
+    if data.get('frequency'):
+        updates['frequency'] = data['frequency']
+    if data.get('target_count') is not None:
+        updates['target_count'] = data['target_count']
+    
+    if updates:
+        await update_habit(habit_id, user_id, updates)
+        # Get updated habit
+        habit = await get_habit_by_id(habit_id, user_id)
+    
+    return jsonify({
+        'id': str(habit['_id']),
+        'title': habit['title'],
+        'description': habit['description'],
+        'frequency': habit['frequency'],
+        'target_count': habit['target_count'],
+        'current_streak': habit['current_streak'],
+        'longest_streak': habit['longest_streak']
+    })
+
+@habits_bp.route('/<habit_id>', methods=['DELETE'])
+@jwt_required()
+async def delete_habit_route(habit_id):
+    user_id = get_jwt_identity()
+    
+    if not await get_habit_by_id(habit_id, user_id):
+        return jsonify({'error': 'Habit not found'}), 404
+    
+    if await delete_habit(habit_id, user_id):
+        return jsonify({'message': 'Habit deleted successfully'})
+    else:
+        return jsonify({'error': 'Failed to delete habit'}), 500
+
+@habits_bp.route('/<habit_id>/complete', methods=['POST'])
+@jwt_required()
+@idempotent()
+async def complete_habit(habit_id):
+    user_id = get_jwt_identity()
+    habit = await get_habit_by_id(habit_id, user_id)
+    
+    if not habit:
+        return jsonify({'error': 'Habit not found'}), 404
+    
+    data = await request.get_json(silent=True) or {}
+    today = datetime.utcnow().date()
+    
+    # Check current completions before adding new one
+    current_completions = await get_habit_completions_today(habit_id)
+    
+    # Don't allow more completions than target
+    if current_completions >= habit['target_count']:
+        return jsonify({'error': 'Habit already completed for today'}), 400
+    
+    # Create one completion record regardless of target_count; totals increment by 1
+    await create_habit_completion(habit_id, data.get('notes', ''))
+    new_completions = current_completions + 1
+
+    # Keep the (user, day) rollup in step with the raw completion
+    await record_completion_rollup(user_id, habit_id, today, met=new_completions >= habit['target_count'])
+    
+    # Update streak only once the period (day, week or month) reaches its target
+    current_streak = habit['current_streak']
+    longest_streak = habit['longest_streak']
+    frequency = habit['frequency']
+    if frequency == 'daily':
+        period_completions = new_completions
+    else:
+        period_start, period_end = period_bounds(frequency, today)
+        period_completions = await get_habit_completions_period(habit_id, period_start, period_end)
+
+    if period_completions == habit['target_count']:
+        prev_start, prev_end = previous_period_bounds(frequency, today)
+        if await get_habit_completions_period(habit_id, prev_start, prev_end) >= habit['target_count']:
+            current_streak += 1
+        else:
+            current_streak = 1
+        longest_streak = max(current_streak, longest_streak)
+        await update_habit(habit_id, user_id, {
+            'current_streak': current_streak,
+            'longest_streak': longest_streak
+        })
+    
+    if new_completions >= habit['target_count']:
+        # Record user-wide daily activity for streaks (idempotent per day)
+        await record_user_daily_activity(user_id, today)
+
+        # Update stats: increment total completions by 1 (never decreases)
+        await update_user_stats(user_id, {'total_completions': 1})
+
+        # Calculate current daily streak and update longest if needed
+        activity_rows = await get_user_daily_activities(user_id)
+        completed_dates = {row['activity_date'].date() for row in activity_rows}
+        await raise_longest_daily_streak(user_id, count_daily_streak(completed_dates, today))
+    
+    # Return updated habit data
+    today_completions = new_completions
+    return jsonify({
+        'message': 'Habit completed successfully',
+        'habit': {
+            'id': str(habit['_id']),
+            'current_streak': current_streak,
+            'longest_streak': longest_streak,
+            'today_completions': today_completions,
+            'is_completed_today': today_completions >= habit['target_count']
+        }
+    })
@@ -0,0 +1,95 @@
+"""
+Statistics and analytics routes (async)
+"""
+
+from quart import Blueprint, request, jsonify
+from datetime import datetime, timedelta
+from jwt_async import jwt_required, get_jwt_identity
+from database_async import (
+    get_user_daily_activities, get_or_create_user_stats, raise_longest_daily_streak,
+    get_habit_by_id, get_user_habits, get_completion_timestamps
+)
+from analytics import parse_range, history_start, history_summary
+from streaks import current_daily_streak
+
+stats_bp = Blueprint('stats', __name__)
+
+@stats_bp.route('/', methods=['GET'])
+@jwt_required()
+async def get_user_stats():
+    try:
+        user_id = get_jwt_identity()
+        # Return cumulative stats as stored; do not recompute or decrease
+        stats = await get_or_create_user_stats(user_id)
+        return jsonify({
+            'total_habits_created': stats.get('total_habits_created', 0),
+            'total_completions': stats.get('total_completions', 0),
+            'longest_daily_streak': stats.get('longest_daily_streak', 0)
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@stats_bp.route('/streak', methods=['GET'])
+@jwt_required()
+async def get_global_streak():
+    try:
+        user_id = get_jwt_identity()
+        today = datetime.utcnow().date()
+        
+        # Get activity dates for this user
+        activity_rows = await get_user_daily_activities(user_id)
+        completed_dates = {row['activity_date'].date() for row in activity_rows}
+
+        # Anchored at today if completed, else at yesterday if completed, else 0
+        current_streak = current_daily_streak(completed_dates, today)
+        if not current_streak:
+            return jsonify({'current_streak': 0})
+
+        # Also ensure longest_daily_streak in stored stats never decreases
+        await get_or_create_user_stats(user_id)
+        await raise_longest_daily_streak(user_id, current_streak)
+
+        return jsonify({'current_streak': current_streak})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@stats_bp.route('/history', methods=['GET'])
+@jwt_required()
+async def get_history():
+    try:
+        user_id = get_jwt_identity()
+        days = parse_range(request.args.get('range'))
+        if days is None:
+            return jsonify({'error': 'Invalid range'}), 400
+
+        today = datetime.utcnow().date()
+        start = datetime.combine(today - timedelta(days=days - 1), datetime.min.time())
+        end = datetime.combine(today + timedelta(days=1), datetime.min.time())
+
+        # A single habit is measured against its target per period; all habits against any completion
+        habit_id = request.args.get('habit_id')
+        if habit_id:
+            habit = await get_habit_by_id(habit_id, user_id)
+            if not habit:
+                return jsonify({'error': 'Habit not found'}), 404
+            habits = [habit]
+            target_count = habit['target_count']
+            frequency = habit.get('frequency', 'daily')
+        else:
+            habits = await get_user_habits(user_id)
+            target_count = 1
+            frequency = 'daily'
+
+        active_from = None
+        if habits:
+            first_created = min(h['created_at'] for h in habits)
+            active_from = datetime.combine(first_created.date(), datetime.min.time())
+
+        query_start = history_start(start, frequency)
+        timestamps = await get_completion_timestamps([h['_id'] for h in habits], query_start, end) if habits else []
+        summary = history_summary(timestamps, start, days, target_count, active_from, frequency)
+        summary['habit_id'] = habit_id
+        summary['range'] = request.args.get('range') or 'year'
+        return jsonify(summary)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
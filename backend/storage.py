@@ -0,0 +1,834 @@
+"""
+Embedded storage backends for the helpers in database.py
+
+database.py is the MongoDB implementation. With STORAGE_BACKEND set to
+`sqlite` (a file) or `memory` (an in-process database that is gone on
+exit), each helper decorated with `@storage_backed` calls the method of the
+same name here instead. Tests, benchmarks and single-node deployments can
+then run without a MongoDB server.
+
+Documents come back in the same shape as the Mongo helpers return them:
+ObjectId ids and naive UTC datetimes. The routes cannot tell the backends
+apart. Times are stored as epoch milliseconds, which is Mongo's date
+precision.
+
+There are no archive tables. Archival exists to keep Mongo's hot
+collections small, and a single-node database has no separate tier, so
+`archive_old_records` is a no-op here.
+"""
+
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from functools import wraps
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import BulkWriteError
+from werkzeug.security import generate_password_hash
+from records import record_type
+from partitions import reminder_bucket
+from streaks import compute_streaks, longest_daily_run
+
+STORAGE_BACKENDS = ('mongo', 'sqlite', 'memory')
+
+EPOCH = datetime(1970, 1, 1)
+MS_PER_DAY = 86400000
+
+# SQLite caps bound parameters per statement; IN lists are chunked below it
+MAX_IN_PARAMS = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL UNIQUE,
+    email TEXT NOT NULL UNIQUE,
+    password_hash TEXT NOT NULL,
+    created_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS habits (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    frequency TEXT NOT NULL DEFAULT 'daily',
+    target_count INTEGER NOT NULL DEFAULT 1,
+    current_streak INTEGER NOT NULL DEFAULT 0,
+    longest_streak INTEGER NOT NULL DEFAULT 0,
+    created_at INTEGER NOT NULL,
+    deleted_at INTEGER
+);
+CREATE INDEX IF NOT EXISTS habits_user ON habits (user_id, deleted_at);
+CREATE INDEX IF NOT EXISTS habits_frequency_user ON habits (frequency, user_id);
+CREATE TABLE IF NOT EXISTS habit_completions (
+    id TEXT PRIMARY KEY,
+    habit_id TEXT NOT NULL,
+    completed_at INTEGER NOT NULL,
+    notes TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS habit_completions_habit_time ON habit_completions (habit_id, completed_at);
+CREATE TABLE IF NOT EXISTS user_daily_activity (
+    user_id TEXT NOT NULL,
+    activity_date INTEGER NOT NULL,
+    created_at INTEGER NOT NULL,
+    PRIMARY KEY (user_id, activity_date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS user_daily_rollups (
+    user_id TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    habit_id TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    met INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day, habit_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS user_daily_rollups_day ON user_daily_rollups (day, user_id);
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id TEXT PRIMARY KEY,
+    total_habits_created INTEGER NOT NULL DEFAULT 0,
+    total_completions INTEGER NOT NULL DEFAULT 0,
+    longest_daily_streak INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS ai_chat_messages (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ai_chat_messages_user_time ON ai_chat_messages (user_id, created_at);
+CREATE TABLE IF NOT EXISTS reminder_log (
+    user_id TEXT NOT NULL,
+    habit_id TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    sent_at INTEGER,
+    PRIMARY KEY (user_id, habit_id, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    claim TEXT NOT NULL,
+    status INTEGER,
+    body TEXT,
+    content_type TEXT,
+    created_at INTEGER NOT NULL,
+    expires_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idempotency_keys_expiry ON idempotency_keys (expires_at);
+"""
+
+HABIT_COLUMNS = (
+    'id', 'user_id', 'title', 'description', 'frequency', 'target_count',
+    'current_streak', 'longest_streak', 'created_at', 'deleted_at'
+)
+HABIT_UPDATABLE = {'title', 'description', 'frequency', 'target_count', 'current_streak', 'longest_streak'}
+STATS_COUNTERS = {'total_habits_created', 'total_completions', 'longest_daily_streak'}
+
+def _ms(value):
+    """Epoch milliseconds for a naive UTC datetime"""
+    return (value - EPOCH) // timedelta(milliseconds=1)
+
+def _dt(ms):
+    return None if ms is None else EPOCH + timedelta(milliseconds=ms)
+
+def _day_ms(value):
+    """Epoch milliseconds of the (UTC) midnight starting the day of a date or datetime"""
+    if isinstance(value, datetime):
+        value = value.date()
+    return _ms(datetime.combine(value, datetime.min.time()))
+
+def _id(value):
+    """Canonical text id; raises InvalidId like the Mongo helpers"""
+    return str(ObjectId(value))
+
+def _invalid_id_returns(default):
+    """Return `default` (called if it is a type) for malformed ids, as the Mongo helpers do"""
+    def wrapper(fn):
+        @wraps(fn)
+        def decorated(*args, **kwargs):
+            try:
+                return fn(*args, **kwargs)
+            except InvalidId:
+                return default() if isinstance(default, type) else default
+        return decorated
+    return wrapper
+
+def _chunks(values, size=MAX_IN_PARAMS):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+def _placeholders(values):
+    return ', '.join('?' * len(values))
+
+# Row -> document conversion (same shapes as the Mongo helpers return)
+def _user_doc(row):
+    return {
+        '_id': ObjectId(row['id']),
+        'username': row['username'],
+        'email': row['email'],
+        'password_hash': row['password_hash'],
+        'created_at': _dt(row['created_at'])
+    }
+
+def _habit_doc(row):
+    doc = {}
+    for column in row.keys():
+        value = row[column]
+        if column == 'id':
+            doc['_id'] = ObjectId(value)
+        elif column == 'user_id':
+            doc['user_id'] = ObjectId(value)
+        elif column in ('created_at', 'deleted_at'):
+            doc[column] = _dt(value)
+        else:
+            doc[column] = value
+    return doc
+
+def _completion_doc(row):
+    return {
+        '_id': ObjectId(row['id']),
+        'habit_id': ObjectId(row['habit_id']),
+        'completed_at': _dt(row['completed_at']),
+        'notes': row['notes']
+    }
+
+def _message_doc(row):
+    return {
+        '_id': ObjectId(row['id']),
+        'user_id': ObjectId(row['user_id']),
+        'role': row['role'],
+        'text': row['text'],
+        'created_at': _dt(row['created_at'])
+    }
+
+def _stats_doc(row):
+    return {
+        'user_id': ObjectId(row['user_id']),
+        'total_habits_created': row['total_habits_created'],
+        'total_completions': row['total_completions'],
+        'longest_daily_streak': row['longest_daily_streak']
+    }
+
+class SQLiteStorage:
+    """The database.py helpers over one SQLite connection (a file or `:memory:`).
+
+    Statements are serialized by a lock. Streaming reads (the export
+    iterators) fetch keyset-paginated batches, so they never hold the lock
+    while the caller works on a batch.
+    """
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.create_function('reminder_bucket', 1, reminder_bucket, deterministic=True)
+        self.lock = threading.RLock()
+        if path != ':memory:':
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    # Plumbing
+    def _all(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def _one(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchone()
+
+    def _run(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).rowcount
+
+    def _transaction(self, statements):
+        """Run (sql, params) pairs (params may be a list for executemany) atomically"""
+        with self.lock:
+            self.conn.execute('BEGIN')
+            try:
+                for sql, params in statements:
+                    if isinstance(params, list):
+                        self.conn.executemany(sql, params)
+                    else:
+                        self.conn.execute(sql, params)
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    # Users
+    def create_user(self, username, email, password):
+        user_doc = {
+            '_id': ObjectId(),
+            'username': username,
+            'email': email,
+            'password_hash': generate_password_hash(password),
+            'created_at': datetime.utcnow()
+        }
+        self._run(
+            'INSERT INTO users (id, username, email, password_hash, created_at) VALUES (?, ?, ?, ?, ?)',
+            (str(user_doc['_id']), username, email, user_doc['password_hash'], _ms(user_doc['created_at']))
+        )
+        return user_doc
+
+    def get_user_by_username(self, username):
+        row = self._one('SELECT * FROM users WHERE username = ?', (username,))
+        return _user_doc(row) if row else None
+
+    def get_user_by_email(self, email):
+        row = self._one('SELECT * FROM users WHERE email = ?', (email,))
+        return _user_doc(row) if row else None
+
+    @_invalid_id_returns(None)
+    def get_user_by_id(self, user_id):
+        row = self._one('SELECT * FROM users WHERE id = ?', (_id(user_id),))
+        return _user_doc(row) if row else None
+
+    # Habits
+    def create_habit(self, user_id, title, description, frequency, target_count):
+        habit_doc = {
+            'title': title,
+            'description': description,
+            'frequency': frequency,
+            'target_count': target_count,
+            'current_streak': 0,
+            'longest_streak': 0,
+            'created_at': datetime.utcnow(),
+            'user_id': ObjectId(user_id),
+            '_id': ObjectId()
+        }
+        self.bulk_insert_habits([habit_doc])
+        return habit_doc
+
+    @_invalid_id_returns(list)
+    def get_user_habits(self, user_id, fields=None):
+        uid = _id(user_id)
+        if not fields:
+            rows = self._all('SELECT * FROM habits WHERE user_id = ? AND deleted_at IS NULL', (uid,))
+            return [_habit_doc(row) for row in rows]
+        columns = ', '.join('id' if f == '_id' else f for f in fields if f == '_id' or f in HABIT_COLUMNS)
+        rows = self._all(f'SELECT {columns} FROM habits WHERE user_id = ? AND deleted_at IS NULL', (uid,))
+        cls = record_type(fields)
+        return [cls(_habit_doc(row)) for row in rows]
+
+    @_invalid_id_returns(None)
+    def get_habit_by_id(self, habit_id, user_id):
+        row = self._one(
+            'SELECT * FROM habits WHERE id = ? AND user_id = ? AND deleted_at IS NULL',
+            (_id(habit_id), _id(user_id))
+        )
+        return _habit_doc(row) if row else None
+
+    @_invalid_id_returns(False)
+    def update_habit(self, habit_id, user_id, updates):
+        updates = {k: v for k, v in updates.items() if k in HABIT_UPDATABLE}
+        if not updates:
+            return False
+        assignments = ', '.join(f'{column} = ?' for column in updates)
+        return self._run(
+            f'UPDATE habits SET {assignments} WHERE id = ? AND user_id = ? AND deleted_at IS NULL',
+            (*updates.values(), _id(habit_id), _id(user_id))
+        ) > 0
+
+    @_invalid_id_returns(False)
+    def delete_habit(self, habit_id, user_id):
+        return self._run(
+            'UPDATE habits SET deleted_at = ? WHERE id = ? AND user_id = ? AND deleted_at IS NULL',
+            (_ms(datetime.utcnow()), _id(habit_id), _id(user_id))
+        ) > 0
+
+    def purge_deleted_habits(self, batch_size=1000, pause=0.05):
+        purged = 0
+        for row in self._all('SELECT id, user_id FROM habits WHERE deleted_at IS NOT NULL'):
+            while self._run(
+                'DELETE FROM habit_completions WHERE id IN '
+                '(SELECT id FROM habit_completions WHERE habit_id = ? LIMIT ?)',
+                (row['id'], batch_size)
+            ):
+                if pause:
+                    time.sleep(pause)
+            self._transaction([
+                ('DELETE FROM user_daily_rollups WHERE user_id = ? AND habit_id = ?', (row['user_id'], row['id'])),
+                ('DELETE FROM reminder_log WHERE habit_id = ?', (row['id'],)),
+                ('DELETE FROM habits WHERE id = ?', (row['id'],))
+            ])
+            purged += 1
+        if purged:
+            print(f"Purged {purged} deleted habits")
+        return purged
+
+    # Completions
+    def create_habit_completion(self, habit_id, notes):
+        completion_id = ObjectId()
+        self._run(
+            'INSERT INTO habit_completions (id, habit_id, completed_at, notes) VALUES (?, ?, ?, ?)',
+            (str(completion_id), _id(habit_id), _ms(datetime.utcnow()), notes or '')
+        )
+        return completion_id
+
+    def _count_completions(self, habit_id, start_ms, end_ms):
+        return self._one(
+            'SELECT COUNT(*) FROM habit_completions WHERE habit_id = ? AND completed_at >= ? AND completed_at < ?',
+            (_id(habit_id), start_ms, end_ms)
+        )[0]
+
+    def get_habit_completions_today(self, habit_id):
+        start = _day_ms(datetime.utcnow())
+        return self._count_completions(habit_id, start, start + MS_PER_DAY)
+
+    def get_habit_completions_period(self, habit_id, start_date, end_date):
+        return self._count_completions(habit_id, _ms(start_date), _ms(end_date))
+
+    def get_habit_completions_yesterday(self, habit_id):
+        start = _day_ms(datetime.utcnow()) - MS_PER_DAY
+        row = self._one(
+            'SELECT * FROM habit_completions WHERE habit_id = ? AND completed_at >= ? AND completed_at < ? LIMIT 1',
+            (_id(habit_id), start, start + MS_PER_DAY)
+        )
+        return _completion_doc(row) if row else None
+
+    def get_completion_timestamps(self, habit_ids, start_date, end_date):
+        timestamps = []
+        for chunk in _chunks(_id(h) for h in habit_ids):
+            timestamps.extend(row[0] for row in self._all(
+                f'SELECT completed_at FROM habit_completions WHERE habit_id IN ({_placeholders(chunk)}) '
+                'AND completed_at >= ? AND completed_at < ?',
+                (*chunk, _ms(start_date), _ms(end_date))
+            ))
+        return timestamps
+
+    # Daily activity
+    def record_user_daily_activity(self, user_id, activity_date):
+        try:
+            self._run(
+                'INSERT INTO user_daily_activity (user_id, activity_date, created_at) VALUES (?, ?, ?) '
+                'ON CONFLICT (user_id, activity_date) DO UPDATE SET created_at = excluded.created_at',
+                (_id(user_id), _day_ms(activity_date), _ms(datetime.utcnow()))
+            )
+        except Exception as e:
+            print(f"Error recording daily activity: {e}")
+
+    @_invalid_id_returns(set)
+    def get_user_activity_dates(self, user_id):
+        rows = self._all('SELECT activity_date FROM user_daily_activity WHERE user_id = ?', (_id(user_id),))
+        return {_dt(row[0]).date() for row in rows}
+
+    @_invalid_id_returns(list)
+    def get_user_daily_activities(self, user_id):
+        uid = _id(user_id)
+        rows = self._all('SELECT * FROM user_daily_activity WHERE user_id = ?', (uid,))
+        return [
+            {'user_id': ObjectId(uid), 'activity_date': _dt(row['activity_date']), 'created_at': _dt(row['created_at'])}
+            for row in rows
+        ]
+
+    # Daily rollups
+    @_invalid_id_returns(None)
+    def record_completion_rollup(self, user_id, habit_id, completed_at, met=False):
+        return self._all(
+            'INSERT INTO user_daily_rollups (user_id, day, habit_id, count, met) VALUES (?, ?, ?, 1, ?) '
+            'ON CONFLICT (user_id, day, habit_id) DO UPDATE SET count = count + 1, met = max(met, excluded.met) '
+            'RETURNING count',
+            (_id(user_id), _day_ms(completed_at), _id(habit_id), int(bool(met)))
+        )[0][0]
+
+    @_invalid_id_returns(list)
+    def get_user_daily_rollups(self, user_id, start_date, end_date):
+        rows = self._all(
+            'SELECT day, habit_id, count, met FROM user_daily_rollups '
+            'WHERE user_id = ? AND day >= ? AND day < ? ORDER BY day',
+            (_id(user_id), _day_ms(start_date), _day_ms(end_date))
+        )
+        days = {}
+        for row in rows:
+            doc = days.setdefault(row['day'], {'day': _dt(row['day']), 'counts': {}, 'met': {}})
+            doc['counts'][row['habit_id']] = row['count']
+            if row['met']:
+                doc['met'][row['habit_id']] = True
+        return list(days.values())
+
+    @_invalid_id_returns(dict)
+    def get_user_habit_totals(self, user_id):
+        rows = self._all(
+            'SELECT habit_id, SUM(count) FROM user_daily_rollups WHERE user_id = ? GROUP BY habit_id',
+            (_id(user_id),)
+        )
+        return {row[0]: row[1] for row in rows}
+
+    def remove_habit_from_rollups(self, habit_id, user_id):
+        self._run(
+            'DELETE FROM user_daily_rollups WHERE user_id = ? AND habit_id = ?',
+            (_id(user_id), _id(habit_id))
+        )
+
+    def rebuild_daily_rollups(self, user_id=None):
+        user_filter, params = ('AND h.user_id = ?', (_id(user_id),)) if user_id else ('', ())
+        delete = ('DELETE FROM user_daily_rollups WHERE user_id = ?', params) if user_id \
+            else ('DELETE FROM user_daily_rollups', ())
+        self._transaction([
+            delete,
+            (
+                'INSERT INTO user_daily_rollups (user_id, day, habit_id, count, met) '
+                f'SELECT h.user_id, c.completed_at / {MS_PER_DAY} * {MS_PER_DAY} AS day, c.habit_id, '
+                'COUNT(*), COUNT(*) >= h.target_count '
+                'FROM habit_completions c JOIN habits h ON h.id = c.habit_id '
+                f'WHERE h.deleted_at IS NULL {user_filter} '
+                'GROUP BY c.habit_id, day',
+                params
+            )
+        ])
+        rebuilt = self._one(
+            'SELECT COUNT(DISTINCT user_id || day) FROM user_daily_rollups' + (' WHERE user_id = ?' if user_id else ''),
+            params
+        )[0]
+        print(f"Rebuilt {rebuilt} daily rollups")
+        return rebuilt
+
+    # Streak maintenance
+    def recompute_habit_streaks(self, batch_size=500, user_id=None):
+        user_filter, params = ('AND user_id = ?', (_id(user_id),)) if user_id else ('', ())
+        today = datetime.utcnow().date()
+        updated = 0
+        last_id = ''
+        while True:
+            batch = self._all(
+                f'SELECT id, frequency, target_count FROM habits WHERE deleted_at IS NULL {user_filter} '
+                'AND id > ? ORDER BY id LIMIT ?',
+                (*params, last_id, batch_size)
+            )
+            if not batch:
+                break
+            last_id = batch[-1]['id']
+            timestamps = {row['id']: [] for row in batch}
+            for chunk in _chunks(timestamps):
+                for row in self._all(
+                    f'SELECT habit_id, completed_at FROM habit_completions WHERE habit_id IN ({_placeholders(chunk)}) '
+                    'ORDER BY habit_id, completed_at',
+                    chunk
+                ):
+                    timestamps[row[0]].append(_dt(row[1]))
+            updates = []
+            for row in batch:
+                current, longest = compute_streaks(
+                    timestamps[row['id']], row['frequency'] or 'daily', row['target_count'] or 1, today
+                )
+                updates.append((current, longest, row['id']))
+            self._transaction([
+                ('UPDATE habits SET current_streak = ?, longest_streak = ? WHERE id = ?', updates)
+            ])
+            updated += len(updates)
+        print(f"Recomputed streaks for {updated} habits")
+        return updated
+
+    # Reminders
+    def iter_daily_habits(self, partition=0, partitions=1):
+        # Buckets are computed by a SQL function, so other partitions' rows are never returned
+        rows = self._all(
+            "SELECT user_id, id, title, target_count FROM habits "
+            "WHERE frequency = 'daily' AND deleted_at IS NULL AND reminder_bucket(user_id) % ? = ? "
+            "ORDER BY user_id",
+            (partitions, partition)
+        )
+        for row in rows:
+            yield ObjectId(row['user_id']), ObjectId(row['id']), row['title'], row['target_count'] or 1
+
+    def backfill_reminder_buckets(self, batch_size=1000):
+        # Nothing is stored; the bucket is computed in the query
+        return 0
+
+    def get_rollups_for_day(self, user_ids, day):
+        counts = {}
+        for chunk in _chunks(str(u) for u in user_ids):
+            for row in self._all(
+                f'SELECT user_id, habit_id, count FROM user_daily_rollups '
+                f'WHERE day = ? AND user_id IN ({_placeholders(chunk)})',
+                (_day_ms(day), *chunk)
+            ):
+                counts.setdefault(ObjectId(row['user_id']), {})[row['habit_id']] = row['count']
+        return counts
+
+    def get_claimed_reminders(self, user_ids, day):
+        claimed = set()
+        for chunk in _chunks(str(u) for u in user_ids):
+            for row in self._all(
+                f'SELECT user_id, habit_id FROM reminder_log WHERE day = ? AND user_id IN ({_placeholders(chunk)})',
+                (_day_ms(day), *chunk)
+            ):
+                claimed.add((ObjectId(row['user_id']), ObjectId(row['habit_id'])))
+        return claimed
+
+    def claim_reminders(self, pairs, day):
+        won = []
+        now = _ms(datetime.utcnow())
+        with self.lock:
+            for uid, hid in pairs:
+                if self.conn.execute(
+                    "INSERT OR IGNORE INTO reminder_log (user_id, habit_id, day, status, created_at) "
+                    "VALUES (?, ?, ?, 'claimed', ?)",
+                    (str(uid), str(hid), _day_ms(day), now)
+                ).rowcount:
+                    won.append((uid, hid))
+        return won
+
+    def mark_reminders_sent(self, pairs, day):
+        if not pairs:
+            return
+        now = _ms(datetime.utcnow())
+        self._transaction([(
+            "UPDATE reminder_log SET status = 'sent', sent_at = ? WHERE user_id = ? AND habit_id = ? AND day = ?",
+            [(now, str(uid), str(hid), _day_ms(day)) for uid, hid in pairs]
+        )])
+
+    def release_reminders(self, pairs, day):
+        if not pairs:
+            return
+        self._transaction([(
+            "DELETE FROM reminder_log WHERE user_id = ? AND habit_id = ? AND day = ? AND status = 'claimed'",
+            [(str(uid), str(hid), _day_ms(day)) for uid, hid in pairs]
+        )])
+
+    # User stats
+    @_invalid_id_returns(None)
+    def get_or_create_user_stats(self, user_id):
+        uid = _id(user_id)
+        with self.lock:
+            self.conn.execute('INSERT OR IGNORE INTO user_stats (user_id) VALUES (?)', (uid,))
+            return _stats_doc(self.conn.execute('SELECT * FROM user_stats WHERE user_id = ?', (uid,)).fetchone())
+
+    @_invalid_id_returns(None)
+    def update_user_stats(self, user_id, updates):
+        updates = {k: v for k, v in updates.items() if k in STATS_COUNTERS}
+        if not updates:
+            return
+        columns = ', '.join(updates)
+        assignments = ', '.join(f'{column} = {column} + excluded.{column}' for column in updates)
+        self._run(
+            f'INSERT INTO user_stats (user_id, {columns}) VALUES (?, {_placeholders(updates)}) '
+            f'ON CONFLICT (user_id) DO UPDATE SET {assignments}',
+            (_id(user_id), *updates.values())
+        )
+
+    @_invalid_id_returns(None)
+    def raise_longest_daily_streak(self, user_id, streak):
+        self._run(
+            'INSERT INTO user_stats (user_id, longest_daily_streak) VALUES (?, ?) '
+            'ON CONFLICT (user_id) DO UPDATE SET longest_daily_streak = max(longest_daily_streak, excluded.longest_daily_streak)',
+            (_id(user_id), streak)
+        )
+
+    # Idempotency keys
+    def get_idempotency_record(self, key):
+        row = self._one(
+            'SELECT * FROM idempotency_keys WHERE key = ? AND expires_at > ?',
+            (key, _ms(datetime.utcnow()))
+        )
+        if row is None:
+            return None
+        return {
+            '_id': row['key'],
+            'fingerprint': row['fingerprint'],
+            'claim': row['claim'],
+            'status': row['status'],
+            'body': row['body'],
+            'content_type': row['content_type'],
+            'created_at': _dt(row['created_at']),
+            'expires_at': _dt(row['expires_at'])
+        }
+
+    def claim_idempotency_key(self, key, fingerprint, lease_seconds):
+        now = _ms(datetime.utcnow())
+        with self.lock:
+            # Expired keys are dropped here, standing in for Mongo's TTL index
+            self.conn.execute('DELETE FROM idempotency_keys WHERE expires_at <= ?', (now,))
+            claim = uuid.uuid4().hex
+            inserted = self.conn.execute(
+                'INSERT OR IGNORE INTO idempotency_keys (key, fingerprint, claim, created_at, expires_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, fingerprint, claim, now, now + int(lease_seconds * 1000))
+            ).rowcount > 0
+            return claim if inserted else None
+
+    def save_idempotent_response(self, key, claim, status, body, content_type, ttl_seconds):
+        self._run(
+            'UPDATE idempotency_keys SET status = ?, body = ?, content_type = ?, expires_at = ? '
+            'WHERE key = ? AND claim = ?',
+            (status, body, content_type, _ms(datetime.utcnow()) + int(ttl_seconds * 1000), key, claim)
+        )
+
+    def release_idempotency_key(self, key, claim):
+        self._run('DELETE FROM idempotency_keys WHERE key = ? AND claim = ? AND status IS NULL', (key, claim))
+
+    # AI chat
+    def create_ai_chat_message(self, user_id, role, text):
+        message_doc = {
+            'user_id': ObjectId(user_id),
+            'role': role,
+            'text': text,
+            'created_at': datetime.utcnow(),
+            '_id': ObjectId()
+        }
+        self._run(
+            'INSERT INTO ai_chat_messages (id, user_id, role, text, created_at) VALUES (?, ?, ?, ?, ?)',
+            (str(message_doc['_id']), str(message_doc['user_id']), role, text, _ms(message_doc['created_at']))
+        )
+        return message_doc
+
+    @_invalid_id_returns(list)
+    def get_ai_chat_history(self, user_id, limit=None):
+        rows = self._all(
+            'SELECT * FROM ai_chat_messages WHERE user_id = ? ORDER BY created_at DESC, id DESC LIMIT ?',
+            (_id(user_id), -1 if limit is None else limit)
+        )
+        return [_message_doc(row) for row in reversed(rows)]
+
+    # Export (keyset-paginated so no lock is held between batches)
+    def _iter_pages(self, sql, params, key_columns, start, batch_size):
+        """Yield rows of `sql` page by page; it must filter on `(key_columns) > (?, ...)`,
+        order by the key columns and end in `LIMIT ?`"""
+        last = start
+        while True:
+            rows = self._all(sql, (*params, *last, batch_size))
+            if not rows:
+                return
+            yield from rows
+            last = tuple(rows[-1][column] for column in key_columns)
+
+    def iter_user_habits(self, user_id, batch_size=1000):
+        rows = self._iter_pages(
+            'SELECT * FROM habits WHERE user_id = ? AND deleted_at IS NULL AND id > ? ORDER BY id LIMIT ?',
+            (_id(user_id),), ('id',), ('',), batch_size
+        )
+        return (_habit_doc(row) for row in rows)
+
+    def iter_habit_completions(self, habit_ids, batch_size=1000):
+        for hid in sorted(_id(h) for h in habit_ids):
+            rows = self._iter_pages(
+                'SELECT * FROM habit_completions WHERE habit_id = ? AND (completed_at, id) > (?, ?) '
+                'ORDER BY completed_at, id LIMIT ?',
+                (hid,), ('completed_at', 'id'), (-2 ** 62, ''), batch_size
+            )
+            yield from (_completion_doc(row) for row in rows)
+
+    def iter_user_daily_activities(self, user_id, batch_size=1000):
+        rows = self._iter_pages(
+            'SELECT activity_date FROM user_daily_activity WHERE user_id = ? AND activity_date > ? '
+            'ORDER BY activity_date LIMIT ?',
+            (_id(user_id),), ('activity_date',), (-2 ** 62,), batch_size
+        )
+        return ({'activity_date': _dt(row['activity_date'])} for row in rows)
+
+    def iter_ai_chat_messages(self, user_id, batch_size=1000):
+        rows = self._iter_pages(
+            'SELECT * FROM ai_chat_messages WHERE user_id = ? AND (created_at, id) > (?, ?) '
+            'ORDER BY created_at, id LIMIT ?',
+            (_id(user_id),), ('created_at', 'id'), (-2 ** 62, ''), batch_size
+        )
+        return (_message_doc(row) for row in rows)
+
+    # Import
+    def _bulk_insert(self, sql, rows):
+        # Raised like Mongo's so callers handle one error; the transaction wrote nothing
+        try:
+            self._transaction([(sql, rows)])
+        except sqlite3.IntegrityError as e:
+            raise BulkWriteError({'nInserted': 0, 'writeErrors': [{'errmsg': str(e)}]})
+        return len(rows)
+
+    def bulk_insert_habits(self, habit_docs):
+        if not habit_docs:
+            return 0
+        return self._bulk_insert(
+            'INSERT INTO habits (id, user_id, title, description, frequency, target_count, '
+            'current_streak, longest_streak, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [(
+                str(doc['_id']), str(doc['user_id']), doc['title'], doc.get('description', ''),
+                doc.get('frequency', 'daily'), doc.get('target_count', 1), doc.get('current_streak', 0),
+                doc.get('longest_streak', 0), _ms(doc['created_at'])
+            ) for doc in habit_docs]
+        )
+
+    def bulk_insert_completions(self, completion_docs):
+        if not completion_docs:
+            return 0
+        return self._bulk_insert(
+            'INSERT INTO habit_completions (id, habit_id, completed_at, notes) VALUES (?, ?, ?, ?)',
+            [(
+                str(doc.get('_id') or ObjectId()), str(doc['habit_id']), _ms(doc['completed_at']), doc.get('notes', '')
+            ) for doc in completion_docs]
+        )
+
+    def backdate_habits(self, habit_ids):
+        updated = 0
+        for chunk in _chunks(str(h) for h in habit_ids):
+            updated += self._run(
+                'UPDATE habits SET created_at = MIN(created_at, COALESCE('
+                '(SELECT MIN(completed_at) FROM habit_completions WHERE habit_id = habits.id), created_at)) '
+                f'WHERE id IN ({_placeholders(chunk)})',
+                chunk
+            )
+        return updated
+
+    def _count_met_habit_days(self, uid):
+        # Rollups of habits awaiting purge are dropped by a rebuild, so they never count
+        return self._one(
+            'SELECT COUNT(*) FROM user_daily_rollups r JOIN habits h ON h.id = r.habit_id '
+            'WHERE r.user_id = ? AND r.met AND h.deleted_at IS NULL',
+            (uid,)
+        )[0]
+
+    def refresh_user_aggregates(self, user_id):
+        uid = _id(user_id)
+        met_before = self._count_met_habit_days(uid)
+        self.rebuild_daily_rollups(uid)
+        met_added = max(0, self._count_met_habit_days(uid) - met_before)
+        self.recompute_habit_streaks(user_id=uid)
+        # A day counts as active once any habit met its target on it
+        self._run(
+            'INSERT OR IGNORE INTO user_daily_activity (user_id, activity_date, created_at) '
+            'SELECT DISTINCT user_id, day, ? FROM user_daily_rollups WHERE user_id = ? AND met',
+            (_ms(datetime.utcnow()), uid)
+        )
+        self.raise_longest_daily_streak(uid, longest_daily_run(sorted(self.get_user_activity_dates(uid))))
+        return met_added
+
+    # Archival, indexes and migration
+    def archive_old_records(self, batch_size=1000):
+        print("Archiving is not used with the embedded storage backend")
+        return 0, 0
+
+    def create_indexes(self):
+        # The schema (tables and indexes) is created with the connection
+        self.conn.executescript(SCHEMA)
+        print("Database indexes created successfully")
+
+    def migrate_user_stats(self):
+        users = [row[0] for row in self._all(
+            'SELECT id FROM users WHERE id NOT IN (SELECT user_id FROM user_stats)'
+        )]
+        for uid in users:
+            total_habits = self._one('SELECT COUNT(*) FROM habits WHERE user_id = ?', (uid,))[0]
+            total_completions = self._one(
+                'SELECT COUNT(*) FROM habit_completions c JOIN habits h ON h.id = c.habit_id WHERE h.user_id = ?',
+                (uid,)
+            )[0]
+            longest = longest_daily_run(sorted(self.get_user_activity_dates(uid)))
+            self._run(
+                'INSERT OR IGNORE INTO user_stats (user_id, total_habits_created, total_completions, '
+                'longest_daily_streak) VALUES (?, ?, ?, ?)',
+                (uid, total_habits, total_completions, longest)
+            )
+        print(f"Migrated stats for {len(users)} users")
+
+def create_storage(config):
+    """Build the embedded storage from app config, or return None for MongoDB"""
+    backend = config.get('STORAGE_BACKEND', 'mongo')
+    if backend == 'mongo':
+        return None
+    if backend == 'sqlite':
+        return SQLiteStorage(config.get('SQLITE_PATH', 'habit_tracker.db'))
+    if backend == 'memory':
+        return SQLiteStorage(':memory:')
+    raise ValueError(f"Unknown storage backend: {backend}")
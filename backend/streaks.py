@@ -0,0 +1,107 @@
+"""
+Frequency-aware streak engine for daily, weekly and monthly habits
+"""
+
+from datetime import datetime, timedelta
+
+def period_index(value, frequency):
+    """Map a date/datetime to an integer period number; consecutive periods differ by 1"""
+    if isinstance(value, datetime):
+        value = value.date()
+    if frequency == 'weekly':
+        # ISO weeks start on Monday; date.toordinal() of 0001-01-01 is a Monday
+        return (value.toordinal() - 1) // 7
+    if frequency == 'monthly':
+        return value.year * 12 + value.month - 1
+    # Default to daily if unknown
+    return value.toordinal()
+
+def period_bounds(frequency, day):
+    """Get the [start, end) datetimes of the period containing `day`"""
+    if isinstance(day, datetime):
+        day = day.date()
+    if frequency == 'weekly':
+        # ISO week: Monday start
+        start = datetime.combine(day - timedelta(days=day.weekday()), datetime.min.time())
+        return start, start + timedelta(days=7)
+    if frequency == 'monthly':
+        month_start = day.replace(day=1)
+        if month_start.month == 12:
+            next_month_start = month_start.replace(year=month_start.year + 1, month=1)
+        else:
+            next_month_start = month_start.replace(month=month_start.month + 1)
+        return (datetime.combine(month_start, datetime.min.time()),
+                datetime.combine(next_month_start, datetime.min.time()))
+    # Default to daily if unknown
+    start = datetime.combine(day, datetime.min.time())
+    return start, start + timedelta(days=1)
+
+def previous_period_bounds(frequency, day):
+    """Get the [start, end) datetimes of the period just before the one containing `day`"""
+    start, _ = period_bounds(frequency, day)
+    return period_bounds(frequency, start - timedelta(days=1))
+
+def compute_streaks(completed_at, frequency='daily', target_count=1, today=None):
+    """Compute (current_streak, longest_streak) from completion timestamps sorted ascending.
+
+    A period counts once it has at least `target_count` completions. The
+    current streak stays alive while the period in progress is not over, so
+    it ends at this period if met, else at the previous one. Runs in O(n).
+    """
+    today = today or datetime.utcnow().date()
+    target_count = max(1, target_count or 1)
+
+    longest = 0
+    run = 0
+    last_met = None
+    period = None
+    count = 0
+
+    def close(period, count):
+        nonlocal longest, run, last_met
+        if count < target_count:
+            return
+        run = run + 1 if last_met is not None and period == last_met + 1 else 1
+        last_met = period
+        longest = max(longest, run)
+
+    for ts in completed_at:
+        p = period_index(ts, frequency)
+        if p != period:
+            if period is not None:
+                close(period, count)
+            period = p
+            count = 0
+        count += 1
+    if period is not None:
+        close(period, count)
+
+    current_period = period_index(today, frequency)
+    current = run if last_met is not None and last_met >= current_period - 1 else 0
+    return current, longest
+
+def count_daily_streak(completed_dates, anchor):
+    """Count consecutive dates in `completed_dates` going back from `anchor`"""
+    streak = 0
+    d = anchor
+    while d in completed_dates:
+        streak += 1
+        d = d - timedelta(days=1)
+    return streak
+
+def current_daily_streak(completed_dates, today):
+    """Daily streak anchored at today if completed, else at yesterday if completed, else 0"""
+    if today in completed_dates:
+        return count_daily_streak(completed_dates, today)
+    yesterday = today - timedelta(days=1)
+    if yesterday in completed_dates:
+        return count_daily_streak(completed_dates, yesterday)
+    return 0
+
+def longest_daily_run(sorted_dates):
+    """Longest run of consecutive days in ascending, distinct `sorted_dates`"""
+    longest = run = 0
+    for i, d in enumerate(sorted_dates):
+        run = run + 1 if i and (d - sorted_dates[i - 1]).days == 1 else 1
+        longest = max(longest, run)
+    return longest
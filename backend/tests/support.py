@@ -0,0 +1,40 @@
+"""
+Shared setup for tests that drive the Flask routes
+
+AppTestCase builds a fresh app per test on the in-memory SQLite storage
+backend (STORAGE_BACKEND=memory), so the routes and every @storage_backed
+helper run in-process without MongoDB. It registers one user and exposes
+`call` for authenticated requests.
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+class AppTestCase(unittest.TestCase):
+    def setUp(self):
+        environ = {'STORAGE_BACKEND': 'memory', 'RATE_LIMIT_ENABLED': 'false', 'GEMINI_API_KEY': ''}
+        with mock.patch.dict(os.environ, environ), mock.patch('builtins.print'):
+            from app import create_app
+            self.app = create_app()
+        self.app.testing = True
+        self.client = self.app.test_client()
+        self.addCleanup(setattr, database, 'storage', None)
+        self.token = self.register('alice')
+
+    def register(self, username):
+        response = self.client.post('/api/register', json={
+            'username': username, 'email': f'{username}@example.com', 'password': 'secret123'
+        })
+        self.assertEqual(response.status_code, 201, response.get_json())
+        return response.get_json()['access_token']
+
+    def call(self, method, path, token=None, **kwargs):
+        headers = {'Authorization': f'Bearer {token or self.token}'}
+        headers.update(kwargs.pop('headers', {}))
+        return getattr(self.client, method)(path, headers=headers, **kwargs)
@@ -0,0 +1,32 @@
+"""
+Tests for the streamed export route (routes/export.py), on the in-memory storage backend
+"""
+
+import gzip
+import json
+import unittest
+
+from support import AppTestCase
+
+class ExportEncodingTest(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.call('post', '/api/habits/', json={'title': 'Run'})
+
+    def export(self, accept_encoding):
+        return self.call('get', '/api/export?format=ndjson', headers={'Accept-Encoding': accept_encoding})
+
+    def test_gzip_when_accepted(self):
+        response = self.export('gzip, deflate')
+        self.assertEqual(response.headers.get('Content-Encoding'), 'gzip')
+        rows = [json.loads(line) for line in gzip.decompress(response.get_data()).splitlines()]
+        self.assertIn('Run', [row.get('title') for row in rows])
+
+    def test_gzip_with_zero_quality_is_refused(self):
+        for accept_encoding in ('gzip;q=0', 'identity', ''):
+            response = self.export(accept_encoding)
+            self.assertNotIn('Content-Encoding', response.headers, accept_encoding)
+            self.assertIn(b'"Run"', response.get_data())
+
+if __name__ == '__main__':
+    unittest.main()
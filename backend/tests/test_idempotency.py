@@ -0,0 +1,52 @@
+"""
+Tests for Idempotency-Key handling (idempotency.py), on the in-memory storage backend
+"""
+
+import time
+import unittest
+
+import database
+from support import AppTestCase
+
+class IdempotentRouteTest(AppTestCase):
+    def create(self, title, key):
+        return self.call('post', '/api/habits/', json={'title': title}, headers={'Idempotency-Key': key})
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.create('Run', 'k1')
+        retry = self.create('Run', 'k1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.get_json(), first.get_json())
+        self.assertEqual(retry.headers.get('Idempotent-Replayed'), 'true')
+        self.assertEqual(len(self.call('get', '/api/habits').get_json()), 1)
+
+    def test_same_key_for_a_different_request_is_rejected(self):
+        self.create('Run', 'k1')
+        self.assertEqual(self.create('Swim', 'k1').status_code, 422)
+
+class ClaimTest(AppTestCase):
+    def test_expired_claim_cannot_overwrite_or_release_the_retry(self):
+        stale = database.claim_idempotency_key('u:k', 'fp', 0.01)
+        time.sleep(0.02)
+        retry = database.claim_idempotency_key('u:k', 'fp', 60)
+        self.assertIsNotNone(retry)
+        self.assertNotEqual(stale, retry)
+
+        # The first request finishes late: neither its save nor its release touches the retry's claim
+        database.save_idempotent_response('u:k', stale, 201, '{"stale": true}', 'application/json', 3600)
+        database.release_idempotency_key('u:k', stale)
+        record = database.get_idempotency_record('u:k')
+        self.assertEqual(record['claim'], retry)
+        self.assertIsNone(record['status'])
+
+        database.save_idempotent_response('u:k', retry, 201, '{"retry": true}', 'application/json', 3600)
+        self.assertEqual(database.get_idempotency_record('u:k')['body'], '{"retry": true}')
+
+    def test_held_key_cannot_be_claimed(self):
+        self.assertIsNotNone(database.claim_idempotency_key('u:k', 'fp', 60))
+        self.assertIsNone(database.claim_idempotency_key('u:k', 'fp', 60))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Tests for the bulk import route (routes/importer.py), on the in-memory storage backend
+"""
+
+import gzip
+import json
+import unittest
+from datetime import datetime, timedelta
+
+from support import AppTestCase
+
+def ndjson(*rows):
+    return '\n'.join(json.dumps(row) for row in rows) + '\n'
+
+def days_ago(days):
+    return (datetime.utcnow() - timedelta(days=days)).replace(hour=12).isoformat()
+
+class ImportTestCase(AppTestCase):
+    def import_rows(self, *rows, **kwargs):
+        return self.call('post', '/api/import?format=ndjson', data=ndjson(*rows), **kwargs)
+
+    def total_completions(self):
+        return self.call('get', '/api/stats').get_json()['total_completions']
+
+class MetHabitDaysTest(ImportTestCase):
+    def test_counts_met_days_of_imported_habits(self):
+        response = self.import_rows(
+            {'type': 'habit', 'id': 'h1', 'title': 'Read', 'target_count': 2},
+            *[{'type': 'completion', 'habit_id': 'h1', 'completed_at': days_ago(1)} for _ in range(2)],
+            {'type': 'completion', 'habit_id': 'h1', 'completed_at': days_ago(2)}
+        )
+        self.assertEqual(response.status_code, 200, response.get_json())
+        # Only the day that reached target_count counts
+        self.assertEqual(self.total_completions(), 1)
+
+    def test_deleted_habit_awaiting_purge_does_not_hide_new_met_days(self):
+        self.import_rows(
+            {'type': 'habit', 'id': 'old', 'title': 'Run'},
+            *[{'type': 'completion', 'habit_id': 'old', 'completed_at': days_ago(d)} for d in range(1, 5)]
+        )
+        self.assertEqual(self.total_completions(), 4)
+        old_id = next(h['id'] for h in self.call('get', '/api/habits').get_json() if h['title'] == 'Run')
+        self.assertEqual(self.call('delete', f'/api/habits/{old_id}').status_code, 200)
+
+        self.import_rows(
+            {'type': 'habit', 'id': 'new', 'title': 'Swim'},
+            *[{'type': 'completion', 'habit_id': 'new', 'completed_at': days_ago(d)} for d in range(1, 3)]
+        )
+
+        self.assertEqual(self.total_completions(), 6)
+
+class RowErrorTest(ImportTestCase):
+    def test_offset_past_the_minimum_date_is_a_row_error(self):
+        response = self.import_rows(
+            {'type': 'habit', 'title': 'Early', 'created_at': '0001-01-01T00:00:00+05:00'},
+            {'type': 'habit', 'title': 'Fine'}
+        )
+        report = response.get_json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(report['habits_imported'], 1)
+        self.assertEqual(report['errors'], [{'line': 1, 'error': 'created_at is out of range'}])
+
+    def test_truncated_gzip_body_is_a_bad_request(self):
+        body = gzip.compress(ndjson(*[{'type': 'habit', 'title': f'Habit {i}'} for i in range(50)]).encode())
+        response = self.import_rows_raw(body[:len(body) // 2])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('could not read body', response.get_json()['errors'][-1]['error'])
+
+    def import_rows_raw(self, body):
+        return self.call(
+            'post', '/api/import?format=ndjson', data=body, headers={'Content-Encoding': 'gzip'}
+        )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+Tests for the reminder run (reminders.py), on the in-memory storage backend
+"""
+
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import database
+from reminders import send_partition_reminders
+from support import AppTestCase
+
+class RecordingSink:
+    def __init__(self, error=None):
+        self.error = error
+        self.batches = []
+
+    def send_batch(self, notifications):
+        self.batches.append(notifications)
+        if self.error is not None:
+            raise self.error
+
+class SendRemindersTest(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.call('post', '/api/habits/', json={'title': 'Run', 'target_count': 2})
+        self.call('post', '/api/habits/', json={'title': 'Read'})
+        self.day = datetime.utcnow().date()
+        self.user_ids = [row[0] for row in database.iter_daily_habits(0, 1)]
+
+    def send(self, sink):
+        with mock.patch('builtins.print'):
+            return send_partition_reminders(0, 1, sink, self.day)
+
+    def test_sends_each_unfinished_habit_once(self):
+        sink = RecordingSink()
+        self.assertEqual(self.send(sink), 1)
+        self.assertEqual(self.send(sink), 0)
+        self.assertEqual(len(sink.batches), 1)
+        self.assertEqual({h['title'] for h in sink.batches[0][0]['habits']}, {'Run', 'Read'})
+
+    def test_failed_batch_is_released_and_sent_by_the_next_run(self):
+        failing = RecordingSink(error=ConnectionError('webhook down'))
+        self.assertEqual(self.send(failing), 0)
+        self.assertEqual(len(failing.batches), 1)
+        self.assertEqual(database.get_claimed_reminders(self.user_ids, self.day), set())
+
+        sink = RecordingSink()
+        self.assertEqual(self.send(sink), 1)
+        self.assertEqual({h['title'] for h in sink.batches[0][0]['habits']}, {'Run', 'Read'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+"""
+Route flows on the in-memory storage backend (storage.py)
+
+These exercise the @storage_backed helpers end to end: each request goes
+through the Flask routes and is dispatched to SQLiteStorage(':memory:').
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import database
+from storage import SQLiteStorage, create_storage
+from support import AppTestCase
+
+class AuthTest(AppTestCase):
+    def test_login_returns_a_working_token(self):
+        response = self.client.post('/api/login', json={'username': 'alice', 'password': 'secret123'})
+        self.assertEqual(response.status_code, 200)
+        token = response.get_json()['access_token']
+        self.assertEqual(self.call('get', '/api/test-auth', token=token).status_code, 200)
+
+    def test_wrong_password_is_rejected(self):
+        response = self.client.post('/api/login', json={'username': 'alice', 'password': 'nope'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_duplicate_username_and_email_are_rejected(self):
+        for body in (
+            {'username': 'alice', 'email': 'other@example.com', 'password': 'x'},
+            {'username': 'bob', 'email': 'alice@example.com', 'password': 'x'}
+        ):
+            self.assertEqual(self.client.post('/api/register', json=body).status_code, 400)
+
+    def test_routes_require_a_token(self):
+        self.assertEqual(self.client.get('/api/habits').status_code, 401)
+
+class HabitFlowTest(AppTestCase):
+    def create(self, **fields):
+        response = self.call('post', '/api/habits/', json=dict({'title': 'Run'}, **fields))
+        self.assertEqual(response.status_code, 201, response.get_json())
+        return response.get_json()
+
+    def complete(self, habit_id):
+        return self.call('post', f'/api/habits/{habit_id}/complete', json={})
+
+    def test_create_list_update_and_delete(self):
+        habit = self.create(description='5k', target_count=2)
+        listed = self.call('get', '/api/habits').get_json()
+        self.assertEqual([(h['id'], h['title'], h['target_count']) for h in listed], [(habit['id'], 'Run', 2)])
+
+        updated = self.call('put', f"/api/habits/{habit['id']}", json={'title': 'Run far'}).get_json()
+        self.assertEqual(updated['title'], 'Run far')
+
+        self.assertEqual(self.call('delete', f"/api/habits/{habit['id']}").status_code, 200)
+        self.assertEqual(self.call('get', '/api/habits').get_json(), [])
+        self.assertEqual(self.call('delete', f"/api/habits/{habit['id']}").status_code, 404)
+
+    def test_complete_counts_up_to_the_target(self):
+        habit = self.create(target_count=2)
+
+        first = self.complete(habit['id']).get_json()['habit']
+        self.assertEqual((first['today_completions'], first['is_completed_today']), (1, False))
+        second = self.complete(habit['id']).get_json()['habit']
+        self.assertEqual((second['today_completions'], second['is_completed_today']), (2, True))
+        self.assertEqual(second['current_streak'], 1)
+        self.assertEqual(self.complete(habit['id']).status_code, 400)
+
+    def test_habits_are_private_to_their_user(self):
+        habit = self.create()
+        other = self.register('bob')
+        self.assertEqual(self.call('get', '/api/habits', token=other).get_json(), [])
+        self.assertEqual(self.call('post', f"/api/habits/{habit['id']}/complete", token=other, json={}).status_code, 404)
+        self.assertEqual(self.call('delete', f"/api/habits/{habit['id']}", token=other).status_code, 404)
+
+    def test_invalid_habit_id_is_not_found(self):
+        self.assertEqual(self.complete('not-an-id').status_code, 404)
+
+class StatsTest(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        habits = [self.call('post', '/api/habits/', json={'title': t}).get_json() for t in ('Run', 'Read')]
+        for habit in habits:
+            self.call('post', f"/api/habits/{habit['id']}/complete", json={})
+
+    def test_stats_and_streak(self):
+        stats = self.call('get', '/api/stats').get_json()
+        self.assertEqual(stats['total_habits_created'], 2)
+        self.assertEqual(stats['total_completions'], 2)
+        self.assertEqual(self.call('get', '/api/streak').get_json()['current_streak'], 1)
+
+    def test_dashboard_matches_the_separate_routes(self):
+        dashboard = self.call('get', '/api/dashboard').get_json()
+        self.assertEqual(len(dashboard['habits']), 2)
+        self.assertTrue(all(h['is_completed_today'] for h in dashboard['habits']))
+        self.assertEqual(dashboard['current_streak'], 1)
+        self.assertEqual(dashboard['stats']['longest_daily_streak'], 1)
+
+    def test_history_counts_today(self):
+        history = self.call('get', '/api/stats/history?range=week').get_json()
+        self.assertEqual(history['range'], 'week')
+        self.assertEqual(history['frequency'], 'daily')
+        self.assertEqual(history['days'], 7)
+        self.assertEqual(history['heatmap'][-1], 2)
+        self.assertEqual(history['total_completions'], 2)
+
+    def test_rebuilt_rollups_match_the_live_ones(self):
+        before = self.call('get', '/api/habits').get_json()
+        with mock.patch('builtins.print'):
+            database.rebuild_daily_rollups()
+        self.assertEqual(self.call('get', '/api/habits').get_json(), before)
+
+class CreateStorageTest(unittest.TestCase):
+    def test_backends(self):
+        self.assertIsNone(create_storage({}))
+        self.assertIsInstance(create_storage({'STORAGE_BACKEND': 'memory'}), SQLiteStorage)
+        with self.assertRaises(ValueError):
+            create_storage({'STORAGE_BACKEND': 'redis'})
+
+    def test_sqlite_file_keeps_data_across_connections(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'habits.db')
+            first = SQLiteStorage(path)
+            user = first.create_user('carol', 'carol@example.com', 'pw')
+            habit = first.create_habit(user['_id'], 'Stretch', '', 'daily', 1)
+            first.conn.close()
+
+            second = SQLiteStorage(path)
+            self.assertEqual(second.get_user_by_username('carol')['_id'], user['_id'])
+            self.assertEqual(second.get_habit_by_id(habit['_id'], user['_id'])['title'], 'Stretch')
+            second.conn.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,254 @@
+"""
+Tests for the write-behind buffer (writebehind.py) and its use in database.py
+
+The buffer only ever writes to MongoDB collections, so these run against a
+small in-memory stand-in that records each bulk_write and applies the
+$inc/$max/$set upserts the buffer issues. Run from backend/:
+
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import time
+import types
+import unittest
+from datetime import datetime
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from pymongo.errors import AutoReconnect, BulkWriteError
+import database
+from writebehind import WriteBehindBuffer, create_write_buffer
+
+class FakeCollection:
+    """Just enough of a pymongo collection for the buffer and the stats helpers"""
+
+    def __init__(self, name):
+        self.name = name
+        self.docs = []
+        self.bulk_writes = []  # the operations of each bulk_write call
+        self.failures = []     # exceptions raised by the next bulk_write calls
+
+    def _matches(self, doc, query):
+        return all(doc.get(key) == value for key, value in query.items())
+
+    def _apply(self, op):
+        doc = next((d for d in self.docs if self._matches(d, op._filter)), None)
+        if doc is None:
+            if not op._upsert:
+                return
+            doc = dict(op._filter, _id=ObjectId())
+            self.docs.append(doc)
+        for field, amount in op._doc.get('$inc', {}).items():
+            doc[field] = doc.get(field, 0) + amount
+        for field, value in op._doc.get('$max', {}).items():
+            doc[field] = max(doc.get(field, value), value)
+        doc.update(op._doc.get('$set', {}))
+
+    def bulk_write(self, ops, ordered=True):
+        self.bulk_writes.append(list(ops))
+        error = self.failures.pop(0) if self.failures else None
+        if error is not None and not isinstance(error, BulkWriteError):
+            raise error
+        failed = {err['index'] for err in error.details['writeErrors']} if error else set()
+        for index, op in enumerate(ops):
+            if index not in failed:
+                self._apply(op)
+        if error is not None:
+            raise error
+
+    def find_one(self, query):
+        doc = next((d for d in self.docs if self._matches(d, query)), None)
+        return dict(doc) if doc else None
+
+    def find(self, query, projection=None):
+        return [dict(d) for d in self.docs if self._matches(d, query)]
+
+    def insert_one(self, doc):
+        doc.setdefault('_id', ObjectId())
+        self.docs.append(doc)
+        return types.SimpleNamespace(inserted_id=doc['_id'])
+
+class FakeDatabase:
+    def __init__(self):
+        self._collections = {}
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self._collections.setdefault(name, FakeCollection(name))
+
+def bulk_write_error(*indexes):
+    return BulkWriteError({
+        'writeErrors': [{'index': i, 'code': 121, 'errmsg': 'Document failed validation'} for i in indexes],
+        'nInserted': 0
+    })
+
+class WriteBehindTestCase(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeDatabase()
+        self.collections = {
+            'user_stats': self.db.user_stats,
+            'user_daily_activity': self.db.user_daily_activity
+        }
+        # A long interval so only the tests decide when to flush
+        self.buffer = WriteBehindBuffer(lambda: self.collections, flush_interval=60, max_pending=500)
+
+    def stats(self, user_id):
+        return self.db.user_stats.find_one({'user_id': user_id})
+
+class CoalescingTest(WriteBehindTestCase):
+    def test_repeated_writes_become_one_bulk_write_per_collection(self):
+        alice, bob = ObjectId(), ObjectId()
+        day = datetime(2024, 5, 1)
+        for _ in range(3):
+            self.buffer.add_stats(alice, {'total_completions': 1})
+        self.buffer.add_stats(alice, {'total_habits_created': 1})
+        self.buffer.add_stats(bob, {'total_completions': 1})
+        self.buffer.raise_longest(alice, 2)
+        self.buffer.raise_longest(alice, 5)
+        self.buffer.raise_longest(alice, 3)
+        for _ in range(4):
+            self.buffer.add_activity(alice, day)
+        self.buffer.add_activity(bob, day)
+
+        self.buffer.flush()
+
+        self.assertEqual(len(self.db.user_stats.bulk_writes), 1)
+        ops = {op._filter['user_id']: op._doc for op in self.db.user_stats.bulk_writes[0]}
+        self.assertEqual(ops[alice], {
+            '$inc': {'total_completions': 3, 'total_habits_created': 1},
+            '$max': {'longest_daily_streak': 5}
+        })
+        self.assertEqual(ops[bob], {'$inc': {'total_completions': 1}})
+
+        self.assertEqual(len(self.db.user_daily_activity.bulk_writes), 1)
+        self.assertEqual(len(self.db.user_daily_activity.bulk_writes[0]), 2)
+
+        self.assertEqual(self.stats(alice)['total_completions'], 3)
+        self.assertEqual(self.stats(alice)['longest_daily_streak'], 5)
+
+    def test_flush_with_nothing_pending_writes_nothing(self):
+        self.buffer.flush()
+        self.assertEqual(self.db.user_stats.bulk_writes, [])
+        self.assertEqual(self.db.user_daily_activity.bulk_writes, [])
+
+class ReadYourWritesTest(WriteBehindTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.multiple(
+            database,
+            mongo=types.SimpleNamespace(db=self.db),
+            storage=None,
+            write_buffer=self.buffer
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_stats_read_includes_buffered_increments(self):
+        user_id = str(ObjectId())
+        database.update_user_stats(user_id, {'total_completions': 1})
+        database.update_user_stats(user_id, {'total_completions': 1, 'total_habits_created': 1})
+        database.raise_longest_daily_streak(user_id, 4)
+        self.assertEqual(self.db.user_stats.bulk_writes, [])
+
+        stats = database.get_or_create_user_stats(user_id)
+
+        self.assertEqual(stats['total_completions'], 2)
+        self.assertEqual(stats['total_habits_created'], 1)
+        self.assertEqual(stats['longest_daily_streak'], 4)
+        # Only this user's stats were written; nothing is left to write twice
+        self.buffer.flush()
+        self.assertEqual(len(self.db.user_stats.bulk_writes), 1)
+
+    def test_activity_dates_include_buffered_days(self):
+        user_id = str(ObjectId())
+        self.buffer.add_activity(user_id, datetime(2024, 5, 1))
+        self.buffer.add_activity(str(ObjectId()), datetime(2024, 5, 2))
+
+        dates = database.get_user_activity_dates(user_id)
+
+        self.assertEqual(dates, {datetime(2024, 5, 1).date()})
+        self.assertEqual(self.db.user_daily_activity.bulk_writes, [])
+
+class RequeueTest(WriteBehindTestCase):
+    def test_failed_operations_are_retried_once(self):
+        alice, bob = ObjectId(), ObjectId()
+        self.buffer.add_stats(alice, {'total_completions': 2})
+        self.buffer.add_stats(bob, {'total_completions': 3})
+        self.db.user_stats.failures.append(bulk_write_error(0))
+
+        self.buffer.flush()
+        failed_user = self.db.user_stats.bulk_writes[0][0]._filter['user_id']
+        self.assertIsNone(self.stats(failed_user))
+
+        self.buffer.flush()
+
+        retried = self.db.user_stats.bulk_writes[1]
+        self.assertEqual([op._filter['user_id'] for op in retried], [failed_user])
+        self.assertEqual(self.stats(alice)['total_completions'], 2)
+        self.assertEqual(self.stats(bob)['total_completions'], 3)
+
+    def test_whole_batch_is_retried_after_a_connection_error(self):
+        alice = ObjectId()
+        day = datetime(2024, 5, 1)
+        self.buffer.add_stats(alice, {'total_completions': 1})
+        self.buffer.add_activity(alice, day)
+        self.db.user_stats.failures.append(AutoReconnect('connection reset'))
+        self.db.user_daily_activity.failures.append(AutoReconnect('connection reset'))
+
+        self.buffer.flush()
+        self.assertIsNone(self.stats(alice))
+        # Increments made after the failure merge with the requeued ones
+        self.buffer.add_stats(alice, {'total_completions': 1})
+        self.buffer.flush()
+
+        self.assertEqual(self.stats(alice)['total_completions'], 2)
+        self.assertEqual(len(self.db.user_daily_activity.docs), 1)
+
+class FlushTriggerTest(WriteBehindTestCase):
+    def wait_for_bulk_write(self, collection, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not collection.bulk_writes and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return collection.bulk_writes
+
+    def test_reaching_max_pending_flushes_before_the_interval(self):
+        self.buffer.max_pending = 3
+        users = [ObjectId() for _ in range(3)]
+        for uid in users[:2]:
+            self.buffer.add_stats(uid, {'total_completions': 1})
+        time.sleep(0.05)
+        self.assertEqual(self.db.user_stats.bulk_writes, [])
+
+        self.buffer.add_stats(users[2], {'total_completions': 1})
+
+        writes = self.wait_for_bulk_write(self.db.user_stats)
+        self.assertEqual(len(writes), 1)
+        self.assertEqual({op._filter['user_id'] for op in writes[0]}, set(users))
+
+    def test_pending_writes_are_flushed_at_exit(self):
+        with mock.patch('writebehind.atexit.register') as register:
+            buffer = create_write_buffer(
+                {'WRITE_BEHIND_ENABLED': True, 'WRITE_BEHIND_FLUSH_INTERVAL': 60},
+                lambda: self.collections
+            )
+        register.assert_called_once_with(buffer.flush)
+        alice = ObjectId()
+        buffer.add_stats(alice, {'total_completions': 1})
+        buffer.add_activity(alice, datetime(2024, 5, 1))
+
+        at_exit = register.call_args[0][0]
+        at_exit()
+
+        self.assertEqual(self.stats(alice)['total_completions'], 1)
+        self.assertEqual(len(self.db.user_daily_activity.docs), 1)
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(create_write_buffer({}, lambda: self.collections))
+
+if __name__ == '__main__':
+    unittest.main()
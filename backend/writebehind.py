@@ -0,0 +1,199 @@
+"""
+Write-behind buffer that coalesces user_stats and daily activity writes
+
+Completions under load hit the same few per-user documents over and over.
+With the buffer enabled, `update_user_stats` increments, longest-streak raises
+and `record_user_daily_activity` upserts are merged per user in memory and
+written with one unordered `bulk_write` every `flush_interval` seconds, or
+sooner once `max_pending` users/days are waiting.
+
+Read-your-writes: reads of a user's stats first flush that user's pending
+writes; reads of a user's activity days add the days still in the buffer.
+
+Crash safety:
+- Pending writes live in process memory only. A graceful shutdown flushes
+  them (atexit); a hard crash (SIGKILL, OOM) loses at most one interval's
+  worth of increments and activity days.
+- A failed flush re-queues its writes for the next one. After a
+  BulkWriteError only the failed operations are retried; after any other error
+  (e.g. a dropped connection) the whole batch is retried, so counter
+  increments are at-least-once in that case. Activity upserts and
+  longest-streak raises are idempotent and never over-count.
+- Lost activity days and longest streaks can be rebuilt from the daily
+  rollups (`refresh_user_aggregates`).
+"""
+
+import atexit
+import os
+import threading
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+from bson import ObjectId
+
+class WriteBehindBuffer:
+    """Per-process buffer of coalesced user_stats and user_daily_activity writes"""
+
+    def __init__(self, collections_fn, flush_interval=0.5, max_pending=500):
+        self.collections_fn = collections_fn
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._increments = {}   # user_id -> {field: amount}
+        self._longest = {}      # user_id -> longest_daily_streak candidate
+        self._activity = set()  # (user_id, activity_datetime)
+        self._inflight_activity = set()
+        self._lock = threading.Lock()
+        # Serializes flushes so a per-user flush waits for a batch already in flight
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    # Buffering
+    def add_stats(self, user_id, increments):
+        uid = ObjectId(user_id)
+        with self._lock:
+            pending = self._increments.setdefault(uid, {})
+            for field, amount in increments.items():
+                pending[field] = pending.get(field, 0) + amount
+        self._after_add()
+
+    def raise_longest(self, user_id, streak):
+        uid = ObjectId(user_id)
+        with self._lock:
+            self._longest[uid] = max(streak, self._longest.get(uid, 0))
+        self._after_add()
+
+    def add_activity(self, user_id, activity_datetime):
+        with self._lock:
+            self._activity.add((ObjectId(user_id), activity_datetime))
+        self._after_add()
+
+    def _pending_count(self):
+        return len(self._increments) + len(self._longest) + len(self._activity)
+
+    def _after_add(self):
+        self._ensure_thread()
+        if self._pending_count() >= self.max_pending:
+            self._wakeup.set()
+
+    # Read-your-writes
+    def pending_activity_dates(self, user_id):
+        """Activity datetimes for the user that are buffered or being written"""
+        uid = ObjectId(user_id)
+        with self._lock:
+            return {day for u, day in self._activity | self._inflight_activity if u == uid}
+
+    def flush_user(self, user_id):
+        """Write the user's pending stats now (after any batch already in flight)"""
+        uid = ObjectId(user_id)
+        with self._flush_lock:
+            with self._lock:
+                if uid not in self._increments and uid not in self._longest:
+                    return
+                increments = {uid: self._increments.pop(uid)} if uid in self._increments else {}
+                longest = {uid: self._longest.pop(uid)} if uid in self._longest else {}
+            self._write(increments, longest, set())
+
+    # Flushing
+    def flush(self):
+        """Write everything pending in one bulk_write per collection"""
+        with self._flush_lock:
+            with self._lock:
+                increments, self._increments = self._increments, {}
+                longest, self._longest = self._longest, {}
+                activity, self._activity = self._activity, set()
+                self._inflight_activity = activity
+            try:
+                self._write(increments, longest, activity)
+            finally:
+                with self._lock:
+                    self._inflight_activity = set()
+
+    def _write(self, increments, longest, activity):
+        collections = self.collections_fn()
+        stats_ops, stats_keys = [], []
+        for uid in increments.keys() | longest.keys():
+            update = {}
+            if uid in increments:
+                update['$inc'] = increments[uid]
+            if uid in longest:
+                update['$max'] = {'longest_daily_streak': longest[uid]}
+            stats_ops.append(UpdateOne({'user_id': uid}, update, upsert=True))
+            stats_keys.append(uid)
+        now = datetime.utcnow()
+        activity_keys = list(activity)
+        activity_ops = [
+            UpdateOne(
+                {'user_id': uid, 'activity_date': day},
+                {'$set': {'user_id': uid, 'activity_date': day, 'created_at': now}},
+                upsert=True
+            )
+            for uid, day in activity_keys
+        ]
+
+        failed_stats = self._bulk_write(collections['user_stats'], stats_ops, stats_keys)
+        failed_activity = self._bulk_write(collections['user_daily_activity'], activity_ops, activity_keys)
+        if failed_stats or failed_activity:
+            self._requeue(
+                {uid: increments[uid] for uid in failed_stats if uid in increments},
+                {uid: longest[uid] for uid in failed_stats if uid in longest},
+                set(failed_activity)
+            )
+
+    def _bulk_write(self, collection, ops, keys):
+        """Run an unordered bulk_write; returns the keys whose operations must be retried"""
+        if not ops:
+            return []
+        try:
+            collection.bulk_write(ops, ordered=False)
+            return []
+        except BulkWriteError as e:
+            print(f"Write-behind flush to {collection.name}: {len(e.details.get('writeErrors', []))} writes failed, retrying")
+            return [keys[err['index']] for err in e.details.get('writeErrors', [])]
+        except PyMongoError as e:
+            print(f"Write-behind flush to {collection.name} failed, retrying: {e}")
+            return keys
+
+    def _requeue(self, increments, longest, activity):
+        with self._lock:
+            for uid, fields in increments.items():
+                pending = self._increments.setdefault(uid, {})
+                for field, amount in fields.items():
+                    pending[field] = pending.get(field, 0) + amount
+            for uid, streak in longest.items():
+                self._longest[uid] = max(streak, self._longest.get(uid, 0))
+            self._activity |= activity
+
+    # Background flusher
+    def _ensure_thread(self):
+        # Started lazily (and again in forked workers) so it never runs before a fork
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Write-behind flush error: {e}")
+
+def create_write_buffer(config, collections_fn):
+    """Build the buffer from app config, or return None when write-behind is disabled"""
+    if not config.get('WRITE_BEHIND_ENABLED', False):
+        return None
+    buffer = WriteBehindBuffer(
+        collections_fn,
+        flush_interval=float(config.get('WRITE_BEHIND_FLUSH_INTERVAL', 0.5)),
+        max_pending=int(config.get('WRITE_BEHIND_MAX_PENDING', 500))
+    )
+    atexit.register(buffer.flush)
+    return buffer
@@ -18,8 +18,78 @@ export function setAuthToken(newToken) {
     api.defaults.headers.common['Authorization'] = `Bearer ${newToken}`;
   } else {
     localStorage.removeItem('token');
+    localStorage.removeItem('causalFence');
     delete api.defaults.headers.common['Authorization'];
   }
 }
 
+// With secondary reads enabled, writes return a Causal-Fence header. Sending the
+// latest one back lets any server worker read this browser's own writes.
+api.interceptors.request.use((config) => {
+  const fence = localStorage.getItem('causalFence');
+  if (fence) config.headers['Causal-Fence'] = fence;
+  return config;
+});
+
+api.interceptors.response.use((response) => {
+  const fence = response.headers['causal-fence'];
+  if (fence) localStorage.setItem('causalFence', fence);
+  return response;
+});
+
 
+// Live change events for the signed-in user. EventSource cannot send headers,
+// so each connection uses a short-lived stream token (never the access token)
+// in the query string, fetched again for every reconnect. Returns a function
+// that closes the stream.
+export function openEventStream({ onEvent, onOpen, onError }) {
+  if (!localStorage.getItem('token') || typeof EventSource === 'undefined') return () => {};
+  let source = null;
+  let timer = null;
+  let closed = false;
+  let delay = 1000;
+
+  const reconnect = () => {
+    if (closed) return;
+    timer = setTimeout(connect, delay);
+    delay = Math.min(delay * 2, 30000);
+  };
+
+  const connect = async () => {
+    let streamToken;
+    try {
+      const res = await api.post('/api/events/token');
+      streamToken = res.data.token;
+    } catch {
+      if (onError) onError();
+      reconnect();
+      return;
+    }
+    if (closed) return;
+    source = new EventSource(`${baseURL}/api/events?token=${encodeURIComponent(streamToken)}`);
+    source.onmessage = (message) => {
+      try {
+        onEvent(JSON.parse(message.data));
+      } catch {
+        // Ignore malformed events
+      }
+    };
+    source.onopen = () => {
+      delay = 1000;
+      if (onOpen) onOpen();
+    };
+    // The token may have expired by EventSource's own retry, so reconnect with a new one
+    source.onerror = () => {
+      source.close();
+      if (onError) onError();
+      reconnect();
+    };
+  };
+
+  connect();
+  return () => {
+    closed = true;
+    clearTimeout(timer);
+    if (source) source.close();
+  };
+}
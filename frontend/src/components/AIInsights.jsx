@@ -46,14 +46,12 @@ const AIInsights = () => {
 
   const fetchStats = async () => {
     try {
-      const [statsRes, streakRes] = await Promise.all([
-        api.get("/api/stats", { headers: { Authorization: `Bearer ${token}` } }),
-        api.get("/api/streak", { headers: { Authorization: `Bearer ${token}` } }),
-      ]);
-
+      const response = await api.get("/api/dashboard", {
+        headers: { Authorization: `Bearer ${token}` },
+      });
 
-      const { total_habits_created = 0, total_completions = 0, longest_daily_streak = 0 } = statsRes.data || {};
-      const { current_streak = 0 } = streakRes.data || {};
+      const { current_streak = 0, stats: totals = {} } = response.data || {};
+      const { total_habits_created = 0, total_completions = 0, longest_daily_streak = 0 } = totals;
 
       setStats({
         totalHabits: total_habits_created,
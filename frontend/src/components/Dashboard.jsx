@@ -1,7 +1,7 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
 import { useAuth } from '../contexts/AuthContext';
-import { api } from '../api';
+import { api, openEventStream } from '../api';
 import toast from 'react-hot-toast';
 import HabitGenerator from './HabitGenerator';
 import {
@@ -27,24 +27,106 @@ const Dashboard = () => {
   const { user, logout } = useAuth();
   const navigate = useNavigate();
 
+  // True while the live event stream is connected; mutations then skip refetching
+  const liveRef = useRef(false);
+  const connectedOnceRef = useRef(false);
+  // Latest habits for the stream handler, which is created once on mount
+  const habitsRef = useRef(habits);
+  habitsRef.current = habits;
+
   useEffect(() => {
-    testConnection();
-    fetchHabits();
-    fetchGlobalStreak();
+    fetchDashboard();
   }, []);
 
-  const testConnection = async () => {
-    try {
-      await api.get('/api/test');
-    } catch (error) {
-      console.error('Backend connection failed:', error);
+  useEffect(() => {
+    return openEventStream({
+      onEvent: (event) => {
+        if (event.type === 'ready') {
+          liveRef.current = true;
+          // Events are not replayed, so reload after a reconnect
+          if (connectedOnceRef.current) fetchDashboard();
+          connectedOnceRef.current = true;
+        } else if (event.type === 'resync') {
+          fetchDashboard();
+        } else {
+          applyEvent(event);
+        }
+      },
+      onError: () => {
+        liveRef.current = false;
+      },
+    });
+  }, []);
+
+  // Patch local state with a change made in this or another tab/device
+  const applyEvent = (event) => {
+    const today = new Date().toISOString().slice(0, 10); // server days are UTC
+    switch (event.type) {
+      case 'habit.created':
+        setHabits((prev) =>
+          prev.some((h) => h.id === event.habit_id)
+            ? prev
+            : [
+                ...prev,
+                {
+                  id: event.habit_id,
+                  title: event.title,
+                  description: event.description,
+                  frequency: event.frequency,
+                  target_count: event.target_count,
+                  current_streak: event.current_streak,
+                  longest_streak: event.longest_streak,
+                  created_at: event.created_at,
+                  today_completions: 0,
+                  is_completed_today: false,
+                  period_completions: 0,
+                  is_completed_period: false,
+                },
+              ]
+        );
+        break;
+      case 'habit.updated': {
+        const { type, habit_id, ...fields } = event;
+        setHabits((prev) => prev.map((h) => (h.id === habit_id ? { ...h, ...fields } : h)));
+        break;
+      }
+      case 'habit.deleted':
+        setHabits((prev) => prev.filter((h) => h.id !== event.habit_id));
+        break;
+      case 'habit.completed':
+        if (event.day !== today) break;
+        setHabits((prev) =>
+          prev.map((h) => {
+            if (h.id !== event.habit_id) return h;
+            const patched = {
+              ...h,
+              today_completions: event.today_completions,
+              is_completed_today: event.today_completions >= h.target_count,
+            };
+            if (h.frequency === 'daily') {
+              patched.period_completions = event.today_completions;
+              patched.is_completed_period = patched.is_completed_today;
+            }
+            return patched;
+          })
+        );
+        // Weekly and monthly period totals are not in the event
+        if (habitsRef.current.some((h) => h.id === event.habit_id && h.frequency !== 'daily')) fetchDashboard();
+        break;
+      case 'streak':
+        setGlobalStreak(event.current_streak);
+        break;
+      default:
+        break;
     }
   };
 
-  const fetchHabits = async () => {
+  // Habits and the global streak arrive together in one request
+  const fetchDashboard = async () => {
     try {
-      const response = await api.get('/api/habits');
-      setHabits(response.data);
+      const response = await api.get('/api/dashboard');
+      setHabits(response.data.habits);
+      setGlobalStreak(response.data.current_streak || 0);
     } catch (error) {
       toast.error('Failed to fetch habits');
     } finally {
@@ -107,8 +189,8 @@ const Dashboard = () => {
       }
 
       toast.success('Habit completed! 🎉');
-      // Update global streak display
-      fetchGlobalStreak();
+      // The live stream delivers the new global streak; poll only without it
+      if (!liveRef.current) fetchGlobalStreak();
     } catch (error) {
       // Rollback on error
       setHabits(previousHabits);
@@ -132,9 +214,8 @@ const Dashboard = () => {
       );
       toast.success('Habit deleted');
       setShowDeleteConfirm(false);
+      setHabits((prev) => prev.filter((h) => h.id !== habitToDelete));
       setHabitToDelete(null);
-      fetchHabits();
-      fetchGlobalStreak();
     } catch {
       toast.error('Failed to delete habit');
     }
@@ -352,8 +433,7 @@ const Dashboard = () => {
           {/* AI Habit Generator */}
           <div className="lg:col-span-1 order-1 lg:order-2">
             <HabitGenerator onHabitAdded={() => {
-              fetchHabits();
-              fetchGlobalStreak();
+              if (!liveRef.current) fetchDashboard();
             }} />
           </div>
         </div>